@@ -1,11 +1,12 @@
 # app/__init__.py
-from flask import Flask
-from sqlalchemy import create_engine
+from flask import Flask, jsonify
 from sqlalchemy.orm import sessionmaker, scoped_session
 from config import Config 
 import os
 
-db_session = scoped_session(sessionmaker(autocommit=False, autoflush=False))
+from .database import RoutingSession
+
+db_session = scoped_session(sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False))
 
 def create_app(config_class=Config):
     """
@@ -17,11 +18,64 @@ def create_app(config_class=Config):
     if not app.config.get('DATABASE_URL'):
         raise RuntimeError("DATABASE_URL not set in configuration!")
         
-    engine = create_engine(app.config['DATABASE_URL'])
-    db_session.configure(bind=engine) 
+    from .database import build_engine, build_replica_set, pool_status
+    engine = build_engine(app.config)
+    app.extensions['db_engine'] = engine
+    # Reads inside replica_reads() go to DATABASE_REPLICA_URLS; everything else to the primary
+    replicas = build_replica_set(app.config, engine)
+    app.extensions['db_replicas'] = replicas
+    db_session.configure(bind=engine, info={'replicas': replicas})
+
+    from . import migrations
+    migrations.check_schema(engine, app.config.get('SCHEMA_CHECK', 'upgrade'))
+
+    from .auth.hashing import init_password_hasher
+    init_password_hasher(app.config)
+    from .auth.services import init_tokens
+    init_tokens(app.config)
+
+    from .utils.api_clients import init_weather_client, init_weather_cache
+    weather_client = init_weather_client(app.config)
+    weather_cache = init_weather_cache(app.config, weather_client.get_weather_status)
+    from .jobs import init_weather_jobs
+    weather_jobs = init_weather_jobs(app.config, engine, weather_client.get_weather_status, cache=weather_cache)
+    if weather_jobs is not None and weather_jobs.mode == 'thread':
+        # Started on the first request so the thread lives in the forked worker
+        app.before_request(weather_jobs.start)
+
+    from .tasks.repository import init_statement_cache
+    init_statement_cache(app.config)
+    from .tasks.changes import init_changes
+    init_changes(app.config)
+    from .tasks.cache import init_task_cache
+    task_cache = init_task_cache(app.config)
+
+    from .serialization import init_json_provider
+    init_json_provider(app)
 
-    from . import models 
-    models.Base.metadata.create_all(bind=engine) 
+    if app.config.get('TRUSTED_PROXIES'):
+        # request.remote_addr (per-address rate limits) must be the client, not the proxy
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXIES'],
+                                x_proto=app.config['TRUSTED_PROXIES'])
+
+    from .ratelimit import init_rate_limiter, init_admission
+    rate_limiter = init_rate_limiter(app.config)
+    # Registered before the timing hooks so shed requests cost as little as possible
+    admission = init_admission(app)
+
+    if app.config.get('INSTRUMENTATION', True):
+        from .instrumentation import (init_instrumentation, weather_cache_samples, pool_samples, ratelimit_samples,
+                                      task_cache_samples)
+        metrics = init_instrumentation(app, engine)
+        if replicas is not None:
+            from .instrumentation import instrument_engine
+            for replica in replicas.replicas:
+                instrument_engine(replica)
+        metrics.add_collector(lambda: weather_cache_samples(weather_cache, weather_client))
+        metrics.add_collector(lambda: pool_samples(engine))
+        metrics.add_collector(lambda: ratelimit_samples(rate_limiter, admission))
+        metrics.add_collector(lambda: task_cache_samples(task_cache))
 
     @app.teardown_appcontext
     def shutdown_session(exception=None):
@@ -32,9 +86,26 @@ def create_app(config_class=Config):
  
     from .tasks import tasks_bp as tasks_blueprint # Import the tasks blueprint
     app.register_blueprint(tasks_blueprint)        # Register it
+    from .tasks.stats import rebuild_stats_command
+    app.cli.add_command(rebuild_stats_command)     # flask rebuild-stats
 
     @app.route('/hello_factory')
     def hello_factory():
         return "Hello from the app factory!"
 
+    @app.route('/pool_status')
+    def db_pool_status():
+        status = pool_status(engine)
+        if replicas is not None:
+            status['replicas'] = replicas.status()
+        return jsonify(status)
+
+    @app.route('/weather_cache/stats')
+    def weather_cache_stats():
+        return jsonify(dict(weather_cache.stats(), circuit=weather_client.breaker.state))
+
+    @app.route('/task_cache/stats')
+    def task_cache_stats():
+        return jsonify(task_cache.stats())
+
     return app
\ No newline at end of file
@@ -0,0 +1,113 @@
+# app/aio/__init__.py
+"""
+ASGI serving mode: the auth and task endpoints as async Quart handlers on
+SQLAlchemy's async engine, so a worker keeps serving other requests while
+one waits on the database or the weather provider.
+
+Selected with SERVER_MODE=asgi (see gunicorn.conf.py); create_app remains
+the entry point for the default sync mode. Compared with it, this mode has
+no request instrumentation (/metrics, Server-Timing, profiles), never reads
+from replicas, and counts ADMISSION_MAX_IN_FLIGHT per worker.
+"""
+from quart import Quart, g, jsonify, request
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from config import Config
+
+async_session = async_sessionmaker(expire_on_commit=False)
+
+def create_async_app(config_class=Config):
+    """
+    Application factory for the ASGI mode.
+    """
+    app = Quart(__name__)
+    app.config.from_object(config_class)
+
+    if not app.config.get('DATABASE_URL'):
+        raise RuntimeError("DATABASE_URL not set in configuration!")
+
+    from app import migrations
+    from app.database import build_engine, build_async_engine, pool_status
+
+    # Schema migrations run once on the sync driver before serving
+    if app.config.get('SCHEMA_CHECK', 'upgrade') != 'off':
+        migration_engine = build_engine(app.config)
+        migrations.check_schema(migration_engine, app.config['SCHEMA_CHECK'])
+        migration_engine.dispose()
+
+    engine = build_async_engine(app.config)
+    app.extensions['db_engine'] = engine
+    async_session.configure(bind=engine)
+
+    from app.auth.hashing import init_password_hasher
+    init_password_hasher(app.config)
+    from app.auth.services import init_tokens
+    init_tokens(app.config)
+
+    from app.utils.api_clients import init_weather_client, init_weather_cache
+    weather_client = init_weather_client(app.config)
+    # Request-path lookups await httpx; the weather jobs below keep the sync client
+    weather_cache = init_weather_cache(app.config, weather_client.get_weather_status,
+                                       afetch=weather_client.aget_weather_status)
+    from app.jobs import init_weather_jobs
+    # The jobs use their own sync engine; they run in a thread, never on the event loop
+    weather_jobs = init_weather_jobs(app.config, build_engine(app.config), weather_client.get_weather_status,
+                                     cache=weather_cache)
+    if weather_jobs is not None and weather_jobs.mode == 'thread':
+        app.before_serving(weather_jobs.start)
+
+    from app.tasks.repository import init_statement_cache
+    init_statement_cache(app.config)
+    from app.tasks.changes import init_changes
+    # Held feed requests wait on the event loop here, not in a worker, so no host-wide hold slots
+    init_changes(app.config, hold=False)
+    from app.tasks.cache import init_task_cache
+    task_cache = init_task_cache(app.config)
+
+    from app.ratelimit import init_rate_limiter, build_admission, admission_exempt_paths, parse_request_start
+    init_rate_limiter(app.config)
+    # Counted per worker: its event loop runs many requests at once, and holding a
+    # host-wide lock-file slot per request would cost more than the handlers here
+    admission = build_admission(app.config, host_wide=False)
+    exempt = admission_exempt_paths(app.config)
+
+    @app.before_request
+    async def admit_request():
+        if request.path in exempt:
+            return None
+        reason = admission.try_enter(parse_request_start(request.headers.get('X-Request-Start')))
+        if reason is not None:
+            return jsonify({'message': 'Server busy, retry shortly.'}), 503, \
+                {'Retry-After': str(admission.retry_after)}
+        g.admitted = True
+        return None
+
+    @app.teardown_request
+    async def release_admission(exception=None):
+        if g.pop('admitted', False):
+            admission.leave()
+
+    from .auth import auth_bp
+    app.register_blueprint(auth_bp)
+
+    from .tasks import tasks_bp
+    app.register_blueprint(tasks_bp)
+
+    @app.route('/pool_status')
+    async def db_pool_status():
+        return jsonify(pool_status(engine.sync_engine))
+
+    @app.route('/weather_cache/stats')
+    async def weather_cache_stats():
+        return jsonify(dict(weather_cache.stats(), circuit=weather_client.breaker.state))
+
+    @app.route('/task_cache/stats')
+    async def task_cache_stats():
+        return jsonify(task_cache.stats())
+
+    @app.after_serving
+    async def dispose_engine():
+        await weather_client.aclose()
+        await engine.dispose()
+
+    return app
@@ -0,0 +1,100 @@
+# app/aio/auth.py
+from functools import wraps
+
+import jwt
+from quart import Blueprint, request, jsonify
+from sqlalchemy import Select
+
+from app.auth.hashing import HashingBusy, get_password_hasher
+from app.auth.services import create_access_token, decode_token, revoke_token
+from app.models import User
+from app.ratelimit import RateLimited, check_rate_limit, rate_limited_response
+from . import async_session
+
+auth_bp = Blueprint('auth_bp', __name__, url_prefix='/auth')
+
+def validate_token(f):
+    # Async twin of app.auth.services.validate_token, with the same responses
+    @wraps(f)
+    async def decorated(*args, **kwargs):
+        auth_header = request.headers.get('Authorization')
+        if auth_header:
+            try:
+                current_userid = decode_token(auth_header.split()[1])
+            except jwt.ExpiredSignatureError:
+                return "Token has Expired"
+            except jwt.InvalidTokenError as e:
+                return {'error': f"Invalid Token: {str(e)}"}
+            except Exception as e:
+                return {'error': f"An unexpected error occurred: {str(e)}"}
+        else:
+            return {'message': 'Token is missing!'}, 401
+
+        try:
+            check_rate_limit('user', current_userid)
+        except RateLimited as e:
+            return rate_limited_response(e)
+        return await f(current_userid, *args, **kwargs)
+    return decorated
+
+@auth_bp.before_request
+async def limit_by_address():
+    if request.endpoint in ('auth_bp.login_user_route', 'auth_bp.register_user_route'):
+        try:
+            check_rate_limit('auth_ip', request.remote_addr)
+        except RateLimited as e:
+            return rate_limited_response(e)
+
+@auth_bp.errorhandler(HashingBusy)
+async def hashing_busy(e):
+    return jsonify({'message': 'Too many password checks in progress, retry shortly.'}), 429, \
+        {'Retry-After': str(e.retry_after)}
+
+@auth_bp.route("/register", methods=['POST'])
+async def register_user_route():
+    user_req = await request.get_json()
+    if not user_req or not user_req.get('username') or not user_req.get('password'):
+        return jsonify({'message': 'Username and password required'}), 400
+
+    async with async_session() as session:
+        existing_user = (await session.scalars(
+            Select(User).where(User.username == user_req['username']))).first()
+        if existing_user:
+            return jsonify({'message': 'Username already exists.'}), 409
+
+        # bcrypt runs in the hashing process pool; the event loop keeps serving meanwhile
+        hashed_password = await get_password_hasher().ahash(user_req['password'])
+        try:
+            session.add(User(username=user_req['username'], hashed_password=hashed_password))
+            await session.commit()
+            return jsonify({'message': 'User Created Successfully'}), 201
+        except Exception as e:
+            await session.rollback()
+            return jsonify({'message': f'Error creating user: {str(e)}'}), 500
+
+@auth_bp.route("/login", methods=['POST'])
+async def login_user_route():
+    user_req = await request.get_json()
+    if not user_req or not user_req.get('username') or not user_req.get('password'):
+        return jsonify({'message': 'Username and password required'}), 400
+
+    async with async_session() as session:
+        user_from_db = (await session.scalars(
+            Select(User).where(User.username == user_req['username']))).first()
+        valid = False
+        if user_from_db:
+            valid, new_hash = await get_password_hasher().averify_and_update(
+                user_req['password'], user_from_db.hashed_password)
+            if valid and new_hash:
+                user_from_db.hashed_password = new_hash
+                await session.commit()
+
+        if valid:
+            return jsonify(create_access_token(user_from_db.id)), 200
+        return jsonify({'message': 'Invalid credentials'}), 401
+
+@auth_bp.route("/logout", methods=['POST'])
+@validate_token
+async def logout_user_route(current_userid):
+    revoke_token(request.headers['Authorization'].split()[1])
+    return jsonify({'message': 'Logged out'}), 200
@@ -0,0 +1,358 @@
+# app/aio/tasks.py
+import asyncio
+from datetime import date
+
+from quart import Blueprint, Response, request, jsonify, abort, current_app
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+
+from app import jobs
+from app.jobs import WEATHER_PENDING, enqueue_weather
+from app.models import Task, User
+from app.tasks import bulk, cache, changes, repository, search, stats, writes
+from app.tasks.services import (add_tasks_new, encode_task_rows, format_due_date,
+                                parse_list_params, task_list_json, tasks_etag, weather_settled, TASK_FIELDS,
+                                WEATHER_UNAVAILABLE)
+from app.utils import api_clients
+from . import async_session
+from .auth import validate_token
+
+tasks_bp = Blueprint('tasks_bp', __name__, url_prefix='/tasks')
+
+async def fetch_weather_batch(session, locations, config):
+    """
+    Async counterpart of app.tasks.services.fetch_weather_batch: cache hits are
+    answered inline, misses are looked up concurrently on the event loop within the
+    request deadline (or read from weather_reports when the background weather jobs
+    are enabled).
+    """
+    weather_jobs = jobs.weather_jobs
+    weather_map = {}
+    missing = []
+    for location in {location for location in locations if location}:
+        found, weather = api_clients.weather_cache.lookup(location, revalidate=weather_jobs is None)
+        if found:
+            weather_map[location] = weather
+        else:
+            missing.append(location)
+    if not missing:
+        return weather_map
+
+    if weather_jobs is not None:
+        stored = await session.run_sync(lambda sync_session: weather_jobs.stored_reports(sync_session, missing))
+        for location in missing:
+            weather_map[location] = stored.get(location, WEATHER_PENDING)
+            if location not in stored:
+                weather_jobs.enqueue(location)
+        return weather_map
+
+    weather_cache = api_clients.weather_cache
+    if weather_cache.afetch is not None:
+        pending = {location: asyncio.ensure_future(weather_cache.aget(location)) for location in missing}
+    else:
+        pending = {location: asyncio.ensure_future(asyncio.to_thread(weather_cache.get, location))
+                   for location in missing}
+
+    await asyncio.wait(pending.values(), timeout=config.get('WEATHER_DEADLINE_SECONDS', 2.0))
+    for location, future in pending.items():
+        if future.done() and not future.cancelled() and future.exception() is None:
+            weather_map[location] = future.result()
+        else:
+            future.cancel()
+            weather_map[location] = WEATHER_UNAVAILABLE
+    return weather_map
+
+def bump_tasks_version_sync(sync_session, owner_id):
+    # bump_tasks_version for writes made through AsyncSession.run_sync (bulk, create, update)
+    version = sync_session.scalar(update(User).where(User.id == owner_id)
+                                  .values(tasks_version=User.tasks_version + 1).returning(User.tasks_version))
+    cache.task_cache.invalidate(owner_id)
+    return version
+
+async def bump_tasks_version(session, owner_id):
+    return await session.run_sync(bump_tasks_version_sync, owner_id)
+
+def record_write(sync_session, owner_id, version, removed, added, logged):
+    # Statistics and change log for a write, in its transaction (through AsyncSession.run_sync)
+    stats.record_task_changes(sync_session, owner_id, removed, added)
+    changes.log_task_changes(sync_session, owner_id, version, logged)
+
+def not_modified(etag):
+    response = Response("", status=304)
+    response.set_etag(etag)
+    return response
+
+@tasks_bp.route("/")
+@tasks_bp.route("/tasks/")
+@tasks_bp.route("/<int:id>")
+@validate_token
+async def displayTasks(current_userid, id=None):
+    config = current_app.config
+    async with async_session() as session:
+        tasks_version = await session.scalar(*repository.tasks_version_statement(current_userid)) or 0
+        if id is None:
+            try:
+                params = parse_list_params(request.args, config)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            fields = params['fields']
+            with_weather = fields is None or 'weather' in fields
+            etag = tasks_etag(current_userid, tasks_version, request.full_path, with_weather, config)
+            if request.if_none_match.contains(etag):
+                return not_modified(etag)
+            body = cache.task_cache.get(etag)
+            if body is not None:
+                return json_body_response(body, etag, tasks_version)
+
+            result = await session.execute(*repository.list_tasks_statement(current_userid, params))
+            columns = list(result.keys())
+            allTasks = result.all()
+            next_cursor = None
+            if len(allTasks) > params['limit']:
+                allTasks = allTasks[:params['limit']]
+                next_cursor = str(allTasks[-1].id)
+
+            weather_map = {}
+            if with_weather:
+                weather_map = await fetch_weather_batch(session, (task.location for task in allTasks), config)
+            body = task_list_json(allTasks, columns, fields, weather_map, next_cursor)
+            cache.task_cache.put(current_userid, etag, body, weather_map)
+            return json_body_response(body, etag if weather_settled(weather_map) else None, tasks_version)
+
+        etag = tasks_etag(current_userid, tasks_version, request.full_path, True, config)
+        if request.if_none_match.contains(etag):
+            return not_modified(etag)
+        body = cache.task_cache.get(etag)
+        if body is not None:
+            return json_body_response(body, etag)
+        task = (await session.execute(*repository.get_task_statement(current_userid, id))).first()
+        if task is None:
+            abort(404)
+        weather_map = await fetch_weather_batch(session, [task.location], config)
+        body = current_app.json.dumps(add_tasks_new(task, weather_map)) + "\n"
+        cache.task_cache.put(current_userid, etag, body, weather_map)
+        return json_body_response(body, etag if weather_settled(weather_map) else None)
+
+def json_body_response(body, etag, tasks_version=None):
+    response = Response(body, mimetype='application/json')
+    if etag is not None:
+        response.set_etag(etag)
+    if tasks_version is not None:
+        response.headers['X-Tasks-Version'] = str(tasks_version)
+    return response
+
+@tasks_bp.route("/search")
+@validate_token
+async def search_tasks(current_userid):
+    config = current_app.config
+    try:
+        terms = search.parse_search_terms(request.args.get('q'))
+        params = parse_list_params(request.args, config)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    fields = params['fields']
+    with_weather = fields is None or 'weather' in fields
+    async with async_session() as session:
+        tasks_version = await session.scalar(*repository.tasks_version_statement(current_userid)) or 0
+        etag = tasks_etag(current_userid, tasks_version, request.full_path, with_weather, config)
+        if request.if_none_match.contains(etag):
+            return not_modified(etag)
+        columns, matches = await session.run_sync(
+            lambda sync_session: search.search_tasks(sync_session.connection(), current_userid, terms, params))
+        next_cursor = None
+        if len(matches) > params['limit']:
+            matches = matches[:params['limit']]
+            next_cursor = str((params['cursor'] or 0) + params['limit'])
+        weather_map = {}
+        if with_weather:
+            weather_map = await fetch_weather_batch(session, (task.location for task in matches), config)
+    return json_body_response(task_list_json(matches, columns, fields, weather_map, next_cursor),
+                              etag if weather_settled(weather_map) else None)
+
+@tasks_bp.route("/stats")
+@validate_token
+async def task_stats(current_userid):
+    today = date.today()
+    async with async_session() as session:
+        tasks_version = await session.scalar(*repository.tasks_version_statement(current_userid)) or 0
+        # Overdue and this week's counts move with the date as well as with writes
+        etag = tasks_etag(current_userid, tasks_version, f"{request.full_path}:{today.isoformat()}", False,
+                          current_app.config)
+        if request.if_none_match.contains(etag):
+            return not_modified(etag)
+        counts = await session.run_sync(
+            lambda sync_session: stats.read_stats(sync_session.connection(), current_userid, today))
+    response = jsonify(dict(counts, date=today.isoformat()))
+    response.set_etag(etag)
+    return response
+
+async def read_changes(owner_id, since):
+    async with async_session() as session:
+        return await session.run_sync(
+            lambda sync_session: changes.read_changes(sync_session.connection(), owner_id, since))
+
+async def wait_for_change(owner_id, since, seconds):
+    # Async counterpart of changes.wait_for_change: the wait costs the event loop nothing
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + seconds
+    while True:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            return False
+        await asyncio.sleep(min(changes.poll_seconds, remaining))
+        async with async_session() as session:
+            if (await session.scalar(*repository.tasks_version_statement(owner_id)) or 0) != since:
+                return True
+
+@tasks_bp.route("/changes")
+@validate_token
+async def task_changes(current_userid):
+    try:
+        since = changes.parse_since(request.args.get('since'))
+        wait = changes.parse_wait(request.args.get('wait'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    page = await read_changes(current_userid, since)
+    if page['changes'] or page['reset'] or not wait:
+        return jsonify(page)
+    if await wait_for_change(current_userid, since, wait):
+        page = await read_changes(current_userid, since)
+    return jsonify(page)
+
+@tasks_bp.route("/changes/stream")
+@validate_token
+async def task_change_stream(current_userid):
+    try:
+        since = changes.parse_since(request.args.get('since', request.headers.get('Last-Event-ID')))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    dumps = current_app.json.dumps
+
+    async def generate():
+        position = since
+        yield "retry: 1000\n\n"
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + changes.stream_seconds
+        while True:
+            page = await read_changes(current_userid, position)
+            while page['changes'] or page['reset']:
+                yield changes.sse_event(page, dumps)
+                position = page['next']
+                if not page['more']:
+                    break
+                page = await read_changes(current_userid, position)
+            if loop.time() >= deadline:
+                return
+            if not await wait_for_change(current_userid, position,
+                                         min(changes.heartbeat_seconds, deadline - loop.time())):
+                yield ": keepalive\n\n"
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@tasks_bp.route("/export")
+@validate_token
+async def export_tasks(current_userid):
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'json'):
+        return jsonify({"error": "Invalid 'format'. Must be ndjson or json."}), 400
+    with_weather = request.args.get('weather', 'false').lower() == 'true'
+    config = current_app.config
+    batch_size = config.get('TASKS_EXPORT_BATCH_SIZE', 500)
+
+    async def generate():
+        # Rows are streamed from a server-side cursor one batch at a time, so memory stays flat
+        first = True
+        if export_format == 'json':
+            yield '['
+        async with async_session() as session:
+            result = await session.stream(*repository.export_statement(current_userid, batch_size))
+            columns = list(result.keys())
+            async for batch in result.partitions():
+                weather_map = {}
+                if with_weather:
+                    weather_map = await fetch_weather_batch(session, (row.location for row in batch), config)
+                encoded = encode_task_rows(batch, columns, None if with_weather else TASK_FIELDS, weather_map)
+                if export_format == 'json':
+                    yield ('' if first else ',') + ','.join(encoded)
+                    first = False
+                else:
+                    yield '\n'.join(encoded) + '\n'
+        if export_format == 'json':
+            yield ']'
+
+    mimetype = 'application/x-ndjson' if export_format == 'ndjson' else 'application/json'
+    return Response(generate(), mimetype=mimetype)
+
+@tasks_bp.route("/tasks/", methods=['post'])
+@validate_token
+async def add_new_task(current_userid):
+    new_task = await request.get_json()
+    if not new_task:
+        abort(404)
+    async with async_session() as session:
+        try:
+            task = await session.run_sync(writes.create_task, current_userid, new_task, bump_tasks_version_sync)
+            await session.commit()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except IntegrityError as e:
+            await session.rollback()
+            return jsonify({"error": f"Task not created: {e.orig}"}), 409
+    enqueue_weather(task.location)
+    return 'POST CREATED', 201
+
+@tasks_bp.route("/bulk", methods=['post'])
+@validate_token
+async def bulk_tasks(current_userid):
+    bulk_req = await request.get_json(silent=True)
+    max_items = current_app.config.get('TASKS_BULK_MAX_ITEMS', 1000)
+    async with async_session() as session:
+        try:
+            results, locations = await session.run_sync(
+                bulk.run_bulk, current_userid, bulk_req, max_items, bump_tasks_version_sync)
+            await session.commit()
+        except bulk.BulkRejected as e:
+            return jsonify({"error": str(e)}), e.status
+        except IntegrityError as e:
+            await session.rollback()
+            return jsonify({"error": f"Bulk request rejected, no changes applied: {e.orig}"}), 409
+    enqueue_weather(*locations)
+    return jsonify(results), 200
+
+@tasks_bp.route("/tasks/<int:id>", methods=['put'])
+@validate_token
+async def update_task(current_userid, id):
+    new_task = await request.get_json()
+    if not new_task:
+        abort(404)
+    async with async_session() as session:
+        try:
+            task = await session.run_sync(writes.update_task, current_userid, id, new_task, bump_tasks_version_sync)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if task is None:
+            abort(404)
+        await session.commit()
+        enqueue_weather(task.location)
+        return jsonify({"id": task.id,
+                        "description": task.description,
+                        "completed": task.completed,
+                        "due_date": format_due_date(task.due_date)})
+
+@tasks_bp.route("/tasks/<int:id>", methods=['delete'])
+@validate_token
+async def delet_task(current_userid, id):
+    # Same contract as the sync route: a JSON body is required
+    if not await request.get_json(silent=True):
+        abort(404)
+    async with async_session() as session:
+        task = await session.get(Task, id)
+        if task is None or task.owner_id != current_userid:
+            abort(404)
+        await session.delete(task)
+        version = await bump_tasks_version(session, current_userid)
+        await session.run_sync(record_write, current_userid, version,
+                               [stats.task_state(task.completed, task.due_date)], [], [(id, 'delete')])
+        await session.commit()
+    return 'No Content', 204
@@ -0,0 +1,180 @@
+# app/auth/hashing.py
+"""
+Password hashing with bounded concurrency.
+
+bcrypt is deliberately slow, and the number of in-flight operations is
+bounded twice:
+
+- per worker process, by a semaphore, and
+- across all gunicorn workers on the host, by a fixed number of lock-file
+  slots, so a login burst can never occupy every worker at once.
+
+When either bound is exhausted the caller gets HashingBusy immediately
+(routes turn it into 429) instead of queueing behind other logins.
+
+Sync workers hash inline: the worker would wait for the result anyway, so a
+pool would only add a round-trip, and the calibrated cost bounds the time
+taken. Under ASGI, ahash/averify_and_update run in a small process pool (a
+thread with HASH_POOL_WORKERS=0) so the event loop keeps serving, and give up
+with HashingBusy after HASH_TIMEOUT_SECONDS.
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from ..instrumentation import phase
+from ..utils.slots import DEFAULT_RUN_DIR, SlotLock, fcntl, slot_dir
+
+
+class HashingBusy(Exception):
+    """Raised when no hashing capacity is free; retry after ``retry_after`` seconds."""
+    def __init__(self, retry_after=1):
+        super().__init__("Password hashing capacity exhausted")
+        self.retry_after = retry_after
+
+
+def build_context(rounds):
+    # Imported here: passlib and its bcrypt self-test are only needed where hashes are
+    # computed, not in every process that imports the app
+    from passlib.context import CryptContext
+    # Hashes below the configured cost are flagged by verify_and_update for rehashing
+    return CryptContext(schemes=["bcrypt"], deprecated="auto",
+                        bcrypt__default_rounds=rounds, bcrypt__min_rounds=rounds)
+
+
+def calibrate_rounds(target_ms, min_rounds=10, max_rounds=14):
+    """
+    Pick the highest bcrypt cost whose hash time stays within ``target_ms`` on
+    this machine, never going below ``min_rounds``. Each extra round doubles the work.
+    """
+    started = time.perf_counter()
+    build_context(min_rounds).hash("calibration-password")
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    rounds = min_rounds
+    while rounds < max_rounds and elapsed_ms * 2 <= target_ms:
+        rounds += 1
+        elapsed_ms *= 2
+    return rounds
+
+
+# One CryptContext per cost per process (web worker or pool process)
+_contexts = {}
+
+def _context_for(rounds):
+    context = _contexts.get(rounds)
+    if context is None:
+        context = _contexts[rounds] = build_context(rounds)
+    return context
+
+def _hash(password, rounds):
+    return _context_for(rounds).hash(password)
+
+def _verify_and_update(password, hashed_password, rounds):
+    return _context_for(rounds).verify_and_update(password, hashed_password)
+
+
+class PasswordHasher:
+
+    def __init__(self, rounds, pool_workers=1, queue_limit=4, timeout=10.0, global_slots=0, slot_dir=None):
+        self.rounds = rounds
+        self.pool_workers = pool_workers
+        self.timeout = timeout
+        self._capacity = threading.BoundedSemaphore(max(1, queue_limit))
+        self._slots = None
+        if global_slots and fcntl is not None:
+            self._slots = SlotLock(slot_dir or DEFAULT_RUN_DIR, global_slots, name='hash-slot')
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Created on first use in each process so forked gunicorn workers never share a pool
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                self._executor = ProcessPoolExecutor(max_workers=self.pool_workers,
+                                                     mp_context=multiprocessing.get_context(method))
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    @contextmanager
+    def _reserved(self, host_wide=True):
+        if not self._capacity.acquire(blocking=False):
+            raise HashingBusy()
+        try:
+            # The held slot lives in a thread-local, so only callers with a thread of their own take one
+            slots = self._slots if host_wide else None
+            if slots is not None and not slots.try_acquire():
+                raise HashingBusy()
+            try:
+                with phase('hash'):
+                    yield
+            finally:
+                if slots is not None:
+                    slots.release()
+        finally:
+            self._capacity.release()
+
+    def _run(self, fn, *args):
+        with self._reserved():
+            return fn(*args)
+
+    async def _arun(self, fn, *args):
+        with self._reserved(host_wide=False):
+            executor = self._get_executor() if self.pool_workers > 0 else None
+            work = asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+            try:
+                return await asyncio.wait_for(work, self.timeout)
+            except asyncio.TimeoutError:
+                raise HashingBusy()
+
+    def hash(self, password):
+        return self._run(_hash, password, self.rounds)
+
+    def verify_and_update(self, password, hashed_password):
+        """
+        Return ``(valid, new_hash)``; ``new_hash`` is set when the stored hash
+        uses an outdated scheme or cost and should be replaced.
+        """
+        return self._run(_verify_and_update, password, hashed_password, self.rounds)
+
+    async def ahash(self, password):
+        return await self._arun(_hash, password, self.rounds)
+
+    async def averify_and_update(self, password, hashed_password):
+        return await self._arun(_verify_and_update, password, hashed_password, self.rounds)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+password_hasher = None
+
+def init_password_hasher(config):
+    global password_hasher
+    rounds = config.get('BCRYPT_ROUNDS', 'auto')
+    if str(rounds) == 'auto':
+        rounds = calibrate_rounds(config.get('BCRYPT_TARGET_MS', 250),
+                                  min_rounds=config.get('BCRYPT_MIN_ROUNDS', 10),
+                                  max_rounds=config.get('BCRYPT_MAX_ROUNDS', 14))
+    password_hasher = PasswordHasher(int(rounds),
+                                     pool_workers=config.get('HASH_POOL_WORKERS', 1),
+                                     queue_limit=config.get('HASH_QUEUE_LIMIT', 4),
+                                     timeout=config.get('HASH_TIMEOUT_SECONDS', 10.0),
+                                     global_slots=config.get('HASH_GLOBAL_SLOTS', 0),
+                                     slot_dir=slot_dir(config, 'HASH_SLOT_DIR'))
+    return password_hasher
+
+def get_password_hasher():
+    # Scripts such as seed.py hash passwords without building the app
+    if password_hasher is None:
+        from config import Config
+        init_password_hasher({key: getattr(Config, key) for key in dir(Config) if key.isupper()})
+    return password_hasher
@@ -0,0 +1,105 @@
+# app/auth/revocations.py
+"""
+Revoked tokens, checked on every authenticated request (decoded-token cache
+hits included).
+
+- SQLiteRevocations: a SQLite file shared by every worker on the host, so a
+  logout handled by one worker is honoured by all of them. Each worker checks
+  an in-process copy, brought up to date at most every ``refresh_seconds``.
+- MemoryRevocations: this process only; for a single process (scripts,
+  tests), never for several gunicorn workers.
+
+A revoked token is kept until it would have expired anyway.
+"""
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+
+class MemoryRevocations:
+
+    def __init__(self):
+        self._tokens = {} # token digest -> exp
+        self._lock = threading.Lock()
+
+    def revoke_token(self, digest, expires_at):
+        now = time.time()
+        with self._lock:
+            for revoked, expiry in list(self._tokens.items()):
+                if expiry <= now:
+                    del self._tokens[revoked]
+            self._tokens[digest] = expires_at
+
+    def is_revoked(self, digest):
+        return digest in self._tokens
+
+
+class SQLiteRevocations:
+    """
+    Checks read a set kept in this process; every ``refresh_seconds`` one of
+    them fetches the rows added since the last refresh (ids only grow), so a
+    logout handled by another worker is honoured within that interval and
+    one handled here at once. 0 refreshes on every check.
+    """
+
+    def __init__(self, path, refresh_seconds=1.0, busy_timeout=5.0):
+        self.path = path
+        self.refresh_seconds = refresh_seconds
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._tokens = {} # token digest -> exp, as of the last refresh plus local revocations
+        self._last_id = 0
+        self._next_refresh = 0.0
+        self._lock = threading.Lock()
+        # Set up on a throwaway connection: one opened here could end up shared by forked workers
+        with closing(sqlite3.connect(path, timeout=busy_timeout, isolation_level=None)) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            # AUTOINCREMENT: ids of pruned rows are never reused, so "id > last seen" misses nothing
+            conn.execute("""CREATE TABLE IF NOT EXISTS revoked_tokens (
+                                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                digest BLOB NOT NULL UNIQUE,
+                                expires_at REAL NOT NULL)""")
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def revoke_token(self, digest, expires_at):
+        conn = self._connection()
+        conn.execute("INSERT OR REPLACE INTO revoked_tokens (digest, expires_at) VALUES (?, ?)", (digest, expires_at))
+        # Expired revocations are useless; the table only holds live tokens
+        conn.execute("DELETE FROM revoked_tokens WHERE expires_at <= ?", (time.time(),))
+        with self._lock:
+            self._tokens[digest] = expires_at
+
+    def _refresh(self):
+        with self._lock:
+            if time.monotonic() < self._next_refresh:
+                return # another thread just did it
+            rows = self._connection().execute(
+                "SELECT id, digest, expires_at FROM revoked_tokens WHERE id > ? ORDER BY id",
+                (self._last_id,)).fetchall()
+            now = time.time()
+            for revoked, expiry in list(self._tokens.items()):
+                if expiry <= now:
+                    del self._tokens[revoked]
+            for row_id, digest, expires_at in rows:
+                self._tokens[digest] = expires_at
+                self._last_id = row_id
+            self._next_refresh = time.monotonic() + self.refresh_seconds
+
+    def is_revoked(self, digest):
+        if time.monotonic() >= self._next_refresh:
+            self._refresh()
+        return digest in self._tokens
+
+
+def build_revocations(config):
+    path = config.get('TOKEN_REVOCATION_PATH', '')
+    if not path:
+        return MemoryRevocations()
+    return SQLiteRevocations(path, refresh_seconds=config.get('TOKEN_REVOCATION_REFRESH_SECONDS', 1.0))
@@ -3,11 +3,29 @@ from flask import Blueprint, request, jsonify
 from sqlalchemy import Select
 
 from app import db_session
+from app.database import replica_reads
 from app.models import User
-from .services import create_user, validate_credentials, create_access_token, validate_token
+from app.ratelimit import RateLimited, check_rate_limit, rate_limited_response
+from .hashing import HashingBusy
+from .services import (create_user, verify_and_update_credentials, create_access_token, validate_token,
+                       revoke_token)
 
 auth_bp = Blueprint('auth_bp', __name__, url_prefix='/auth')
 
+@auth_bp.before_request
+def limit_by_address():
+    # Password checks are the expensive part, so login and register are also limited per client address
+    if request.endpoint in ('auth_bp.login_user_route', 'auth_bp.register_user_route'):
+        try:
+            check_rate_limit('auth_ip', request.remote_addr)
+        except RateLimited as e:
+            return rate_limited_response(e)
+
+@auth_bp.errorhandler(HashingBusy)
+def hashing_busy(e):
+    return jsonify({'message': 'Too many password checks in progress, retry shortly.'}), 429, \
+        {'Retry-After': str(e.retry_after)}
+
 @auth_bp.route("/register", methods=['POST'])
 def register_user_route():
     user_req = request.get_json()
@@ -21,8 +39,9 @@ def register_user_route():
     if existing_user:
         return jsonify({'message': 'Username already exists.'}), 409
 
+    # Outside the try: HashingBusy must reach the 429 handler, not become a 500
+    user_details = create_user(user_req)
     try:
-        user_details = create_user(user_req)
         new_db_user = User(username=user_details[0], hashed_password=user_details[1])
         db_session.add(new_db_user)
         db_session.commit()
@@ -40,10 +59,29 @@ def login_user_route():
         return jsonify({'message': 'Username and password required'}), 400
 
     user_query = Select(User).where(User.username == user_req['username'])
-    user_from_db = db_session.scalars(user_query).first()
+    with replica_reads():
+        user_from_db = db_session.scalars(user_query).first()
+    if user_from_db is None and db_session.info.get('replicas') is not None:
+        # Not replicated yet (e.g. registered a moment ago): ask the primary
+        user_from_db = db_session.scalars(user_query).first()
+
+    valid = False
+    if user_from_db:
+        valid, new_hash = verify_and_update_credentials(user_req['password'], user_from_db.hashed_password)
+        if valid and new_hash:
+            # Stored hash used an outdated cost; replace it while we have the plaintext
+            user_from_db.hashed_password = new_hash
+            db_session.commit()
 
-    if user_from_db and validate_credentials(user_req['password'], user_from_db.hashed_password):
+    if valid:
         token_response = create_access_token(user_from_db.id)
         return jsonify(token_response), 200
     else:
-        return jsonify({'message': 'Invalid credentials'}), 401
\ No newline at end of file
+        return jsonify({'message': 'Invalid credentials'}), 401
+
+
+@auth_bp.route("/logout", methods=['POST'])
+@validate_token
+def logout_user_route(current_userid):
+    revoke_token(request.headers['Authorization'].split()[1])
+    return jsonify({'message': 'Logged out'}), 200
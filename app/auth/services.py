@@ -1,37 +1,122 @@
-from passlib.context import CryptContext
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from flask import request
 from functools import wraps
+import hashlib
 import jwt
-import os
+import secrets
+import threading
+import time
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from ..instrumentation import phase
+from ..ratelimit import RateLimited, check_rate_limit, rate_limited_response
+from .hashing import get_password_hasher
+from .revocations import MemoryRevocations, build_revocations
 
 def create_user(user_obj):
     username = user_obj['username']
-    hashed_password = pwd_context.hash(user_obj['password'])
+    hashed_password = get_password_hasher().hash(user_obj['password'])
     return [username, hashed_password]
 
 def validate_credentials(userreqpass,user_def):
-    return pwd_context.verify(userreqpass,user_def)
+    return get_password_hasher().verify_and_update(userreqpass,user_def)[0]
+
+def verify_and_update_credentials(userreqpass,user_def):
+    # (valid, new_hash); new_hash is set when the stored hash should be upgraded
+    return get_password_hasher().verify_and_update(userreqpass,user_def)
     
+# Decoded-token cache: sha256(token) -> (user_id, exp). Entries live until
+# the token expires, so repeat requests with the same token skip jwt.decode.
+_jwt_key = None
+_token_cache = OrderedDict()
+_token_cache_max_entries = 10000
+_token_cache_lock = threading.Lock()
+# Revoked tokens; shared by the workers on the host once init_tokens has run with TOKEN_REVOCATION_PATH
+_revocations = MemoryRevocations()
+
+def init_tokens(config):
+    """
+    Read the signing key once at startup, size the decoded-token cache and
+    open the revocation store.
+    """
+    global _jwt_key, _token_cache_max_entries, _revocations
+    _jwt_key = config['JWT_SECRET_KEY']
+    _token_cache_max_entries = config.get('TOKEN_CACHE_MAX_ENTRIES', 10000)
+    _revocations = build_revocations(config)
+    with _token_cache_lock:
+        _token_cache.clear()
+
+def _signing_key():
+    global _jwt_key
+    if _jwt_key is None:
+        from config import Config
+        _jwt_key = Config.JWT_SECRET_KEY
+    return _jwt_key
+
+def _token_digest(token):
+    return hashlib.sha256(token.encode()).digest()
+
 def create_access_token(user_integer_id):
     payload = {
         'sub': str(user_integer_id),
         'iat': datetime.utcnow(), # iat (issued at)
-        'exp': datetime.utcnow() + timedelta(minutes=30) # exp (expiration time)
+        'exp': datetime.utcnow() + timedelta(minutes=30), # exp (expiration time)
+        # Unique per token: two logins within the same second must not share a token, or
+        # logging out of one session would revoke the other
+        'jti': secrets.token_urlsafe(12),
     }
-    token = jwt.encode(payload, os.getenv("JWT_KEY"), algorithm="HS256")
+    token = jwt.encode(payload, _signing_key(), algorithm="HS256")
     return {'access_token': token}
 
+def decode_token(token):
+    """
+    Return the user id a token was issued to. Raises the same jwt exceptions
+    as jwt.decode; revoked tokens raise InvalidTokenError.
+    """
+    digest = _token_digest(token)
+    now = time.time()
+    with _token_cache_lock:
+        entry = _token_cache.get(digest)
+        if entry is not None:
+            _token_cache.move_to_end(digest)
+    if entry is not None:
+        user_id, expires_at = entry
+        if now >= expires_at:
+            with _token_cache_lock:
+                _token_cache.pop(digest, None)
+            raise jwt.ExpiredSignatureError("Signature has expired")
+    else:
+        claims = jwt.decode(token, _signing_key(), algorithms=["HS256"])
+        user_id = int(claims['sub'])
+        expires_at = claims.get('exp', now + 60)
+        with _token_cache_lock:
+            _token_cache[digest] = (user_id, expires_at)
+            while len(_token_cache) > _token_cache_max_entries:
+                _token_cache.popitem(last=False)
+
+    # Checked on cache hits too: the logout may have been handled by another worker
+    if _revocations.is_revoked(digest):
+        raise jwt.InvalidTokenError("Token has been revoked")
+    return user_id
+
+def revoke_token(token):
+    """
+    Invalidate one token in every worker, e.g. on logout.
+    """
+    digest = _token_digest(token)
+    with _token_cache_lock:
+        entry = _token_cache.pop(digest, None)
+    _revocations.revoke_token(digest, entry[1] if entry else time.time() + 24 * 3600)
+
 def validate_token(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        if request.headers.get('Authorization'):
+        auth_header = request.headers.get('Authorization')
+        if auth_header:
             try:
-                parsed_token = request.headers.get('Authorization').split()[1]
-                plain_token = jwt.decode(parsed_token,os.getenv("JWT_KEY"), algorithms=["HS256"])
-                current_userid = int(plain_token['sub'])
+                parsed_token = auth_header.split()[1]
+                with phase('auth'):
+                    current_userid = decode_token(parsed_token)
 
             except jwt.ExpiredSignatureError:        
                 return "Token has Expired"
@@ -44,5 +129,9 @@ def validate_token(f):
         else:
             return {'message': 'Token is missing!'}, 401
 
+        try:
+            check_rate_limit('user', current_userid)
+        except RateLimited as e:
+            return rate_limited_response(e)
         return f(current_userid, *args, **kwargs)
     return decorated
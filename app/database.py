@@ -0,0 +1,345 @@
+# app/database.py
+import contextvars
+import itertools
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from contextlib import closing, contextmanager
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.sql.dml import UpdateBase
+
+
+# Every engine built here, so a forked worker can drop the connections it inherited
+_engines = weakref.WeakSet()
+
+def dispose_engines_after_fork():
+    """
+    Call in a freshly forked worker (gunicorn post_fork with preload_app).
+    Inherited pooled connections are forgotten without being closed, so the
+    parent's sockets are left alone and the worker opens its own.
+    """
+    for engine in list(_engines):
+        engine.dispose(close=False)
+
+
+def worker_pool_size(config):
+    """
+    Split the connection budget evenly across gunicorn workers so that
+    workers * (pool_size + max_overflow) stays under DB_MAX_CONNECTIONS.
+    An explicit DB_POOL_SIZE wins.
+    """
+    if config.get('DB_POOL_SIZE'):
+        return config['DB_POOL_SIZE']
+    per_worker = config.get('DB_MAX_CONNECTIONS', 80) // max(1, config.get('WEB_CONCURRENCY', 1))
+    return max(1, per_worker - config.get('DB_MAX_OVERFLOW', 0))
+
+
+def _sqlite_pragmas(config, in_memory):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if not in_memory:
+            # WAL lets readers in other workers proceed while one writer commits
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={config.get('SQLITE_SYNCHRONOUS', 'NORMAL')}")
+        cursor.execute(f"PRAGMA busy_timeout={int(config.get('SQLITE_BUSY_TIMEOUT_MS', 5000))}")
+        cursor.execute(f"PRAGMA cache_size=-{int(config.get('SQLITE_CACHE_SIZE_KB', 16000))}")
+        cursor.close()
+    return on_connect
+
+
+def _engine_options(config, url):
+    # Pool and driver settings shared by the sync and async engines
+    kwargs = {'pool_pre_ping': config.get('DB_POOL_PRE_PING', True)}
+    pool_kwargs = dict(pool_size=worker_pool_size(config),
+                       max_overflow=config.get('DB_MAX_OVERFLOW', 2),
+                       pool_timeout=config.get('DB_POOL_TIMEOUT', 10))
+    if url.get_backend_name() == 'sqlite':
+        if url.database not in (None, '', ':memory:'):
+            kwargs.update(pool_kwargs)
+        return kwargs
+    kwargs.update(pool_kwargs, pool_recycle=config.get('DB_POOL_RECYCLE', 1800), pool_use_lifo=True)
+    return kwargs
+
+
+def build_engine(config, url=None):
+    """
+    Create the SQLAlchemy engine for ``url`` (default DATABASE_URL) with the
+    pool and driver settings from the app config.
+    """
+    url = make_url(url or config['DATABASE_URL'])
+    kwargs = _engine_options(config, url)
+
+    if url.get_backend_name() == 'sqlite':
+        # Connections are handed between request threads by the pool
+        kwargs['connect_args'] = {'check_same_thread': False}
+        engine = create_engine(url, **kwargs)
+        event.listen(engine, 'connect', _sqlite_pragmas(config, url.database in (None, '', ':memory:')))
+    else:
+        if url.get_backend_name() == 'postgresql' and config.get('DB_STATEMENT_TIMEOUT_MS'):
+            kwargs['connect_args'] = {'options': f"-c statement_timeout={int(config['DB_STATEMENT_TIMEOUT_MS'])}"}
+        engine = create_engine(url, **kwargs)
+    _engines.add(engine)
+    return engine
+
+
+# Async driver used for each backend when serving in ASGI mode
+ASYNC_DRIVERS = {'sqlite': 'sqlite+aiosqlite', 'postgresql': 'postgresql+asyncpg'}
+
+def async_database_url(config):
+    if config.get('ASYNC_DATABASE_URL'):
+        return make_url(config['ASYNC_DATABASE_URL'])
+    url = make_url(config['DATABASE_URL'])
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+
+
+def build_async_engine(config):
+    """
+    AsyncEngine counterpart of build_engine for the ASGI serving mode.
+    """
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = async_database_url(config)
+    kwargs = _engine_options(config, url)
+    if url.get_backend_name() == 'sqlite':
+        engine = create_async_engine(url, **kwargs)
+        event.listen(engine.sync_engine, 'connect',
+                     _sqlite_pragmas(config, url.database in (None, '', ':memory:')))
+    else:
+        if url.get_backend_name() == 'postgresql' and config.get('DB_STATEMENT_TIMEOUT_MS'):
+            kwargs['connect_args'] = {'server_settings': {'statement_timeout': str(int(config['DB_STATEMENT_TIMEOUT_MS']))}}
+        engine = create_async_engine(url, **kwargs)
+    _engines.add(engine.sync_engine)
+    return engine
+
+
+def pool_status(engine):
+    pool = engine.pool
+    status = {'pool': type(pool).__name__, 'status': pool.status()}
+    if isinstance(pool, QueuePool):
+        status.update(size=pool.size(),
+                      checked_in=pool.checkedin(),
+                      checked_out=pool.checkedout(),
+                      # QueuePool reports overflow relative to pool size; negative means idle capacity
+                      overflow_in_use=max(0, pool.overflow()),
+                      max_overflow=pool._max_overflow)
+    return status
+
+
+class StickyWrites:
+    """
+    Who wrote recently, for read-your-writes: a key marked here reads from the
+    primary for ``window`` seconds. Marks are per process unless ``path`` names
+    a SQLite file, which every worker on the host then shares.
+    """
+
+    def __init__(self, window=5.0, path='', busy_timeout=5.0):
+        self.window = window
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._until = {}
+        self._local = threading.local()
+        if path:
+            with closing(sqlite3.connect(path, timeout=busy_timeout)) as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("CREATE TABLE IF NOT EXISTS sticky_writes (key TEXT PRIMARY KEY, until REAL NOT NULL)")
+                conn.commit()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=self.busy_timeout)
+        return conn
+
+    def mark(self, key):
+        until = time.time() + self.window
+        self._until[key] = until
+        if self.path:
+            conn = self._connection()
+            conn.execute("INSERT OR REPLACE INTO sticky_writes (key, until) VALUES (?, ?)", (str(key), until))
+            conn.execute("DELETE FROM sticky_writes WHERE until < ?", (until - self.window,))
+            conn.commit()
+
+    def active(self, key):
+        now = time.time()
+        until = self._until.get(key)
+        if until is not None:
+            if until > now:
+                return True
+            self._until.pop(key, None)
+        if self.path:
+            row = self._connection().execute("SELECT until FROM sticky_writes WHERE key = ?", (str(key),)).fetchone()
+            return row is not None and row[0] > now
+        return False
+
+
+class ReplicaSet:
+    """
+    Read replicas behind the primary engine.
+
+    - ``read_engine()`` hands out replicas round-robin, skipping any that
+      failed a health check in the last ``retry_seconds`` or has not been
+      checked yet; with none healthy it returns the primary.
+    - Replicas are checked (``SELECT 1``, plus replay lag on Postgres) every
+      ``check_interval`` by a background thread in each process, never on
+      the request path, and marked down at once when one of their
+      connections is lost.
+    - ``read_engine(key)`` returns the primary while ``key`` is sticky (it
+      wrote within the read-your-writes window).
+    """
+
+    def __init__(self, primary, replicas, sticky, check_interval=5.0, retry_seconds=30.0, max_lag_seconds=0):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.sticky = sticky
+        self.check_interval = check_interval
+        self.retry_seconds = retry_seconds
+        self.max_lag_seconds = max_lag_seconds
+        self._order = itertools.cycle(range(len(self.replicas)))
+        self._lock = threading.Lock()
+        self._health = [{'healthy': False, 'checked_at': 0.0, 'down_until': 0.0, 'error': 'not checked yet'}
+                        for _ in self.replicas]
+        self._checker_pid = None
+        for index, engine in enumerate(self.replicas):
+            event.listen(engine, 'handle_error', self._on_error(index))
+
+    def _on_error(self, index):
+        def handle_error(exception_context):
+            if exception_context.is_disconnect:
+                self.mark_down(index, exception_context.original_exception)
+        return handle_error
+
+    def mark_down(self, index, error):
+        health = self._health[index]
+        health.update(healthy=False, checked_at=time.monotonic(), error=str(error),
+                      down_until=time.monotonic() + self.retry_seconds)
+
+    def _lag_seconds(self, conn):
+        if conn.dialect.name != 'postgresql':
+            return None
+        return conn.scalar(text("SELECT COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)"))
+
+    def check(self, index):
+        try:
+            with self.replicas[index].connect() as conn:
+                conn.execute(text("SELECT 1"))
+                lag = self._lag_seconds(conn)
+        except Exception as e:
+            self.mark_down(index, e)
+            return False
+        if self.max_lag_seconds and lag is not None and lag > self.max_lag_seconds:
+            self.mark_down(index, f"replication lag {lag:.1f}s")
+            return False
+        self._health[index].update(healthy=True, checked_at=time.monotonic(), error=None)
+        return True
+
+    def check_all(self):
+        # Replicas marked down are retried once their retry_seconds are over
+        now = time.monotonic()
+        for index, health in enumerate(self._health):
+            if health['healthy'] or now >= health['down_until']:
+                self.check(index)
+
+    def _run_checks(self):
+        while True:
+            self.check_all()
+            time.sleep(self.check_interval)
+
+    def _start_checks(self):
+        # Started on first use in each process, so it runs in the forked worker, not the master
+        with self._lock:
+            if self._checker_pid == os.getpid():
+                return
+            self._checker_pid = os.getpid()
+        threading.Thread(target=self._run_checks, name='replica-health', daemon=True).start()
+
+    def read_engine(self, key=None):
+        if not self.replicas or (key is not None and self.sticky.active(key)):
+            return self.primary
+        if self._checker_pid != os.getpid():
+            self._start_checks()
+        for _ in range(len(self.replicas)):
+            with self._lock:
+                index = next(self._order)
+            if self._health[index]['healthy']:
+                return self.replicas[index]
+        return self.primary
+
+    def status(self):
+        return [{'url': engine.url.render_as_string(hide_password=True), 'healthy': health['healthy'],
+                 'error': health['error'], **pool_status(engine)}
+                for engine, health in zip(self.replicas, self._health)]
+
+
+def build_replica_set(config, primary):
+    """
+    ReplicaSet for DATABASE_REPLICA_URLS (comma-separated), or None when no
+    replicas are configured.
+    """
+    urls = [url.strip() for url in (config.get('DATABASE_REPLICA_URLS') or '').split(',') if url.strip()]
+    if not urls:
+        return None
+    path = config.get('READ_YOUR_WRITES_PATH', '')
+    if not path and config.get('WEB_CONCURRENCY', 1) > 1 and config.get('SERVER_MODE', 'sync') != 'asgi':
+        # Per-process marks: a read handled by another worker than the write would go to a lagging replica
+        raise RuntimeError("DATABASE_REPLICA_URLS with several workers needs READ_YOUR_WRITES_PATH, "
+                           "a file the workers share")
+    sticky = StickyWrites(config.get('READ_YOUR_WRITES_SECONDS', 5.0), path)
+    return ReplicaSet(primary, [build_engine(config, url) for url in urls], sticky,
+                      check_interval=config.get('DB_REPLICA_CHECK_INTERVAL', 5.0),
+                      retry_seconds=config.get('DB_REPLICA_RETRY_SECONDS', 30.0),
+                      max_lag_seconds=config.get('DB_REPLICA_MAX_LAG_SECONDS', 0))
+
+
+# Set by replica_reads(); None means everything goes to the primary
+_replica_scope = contextvars.ContextVar('replica_scope', default=None)
+
+@contextmanager
+def replica_reads(key=None):
+    """
+    Let reads in the enclosed block go to a replica, unless ``key`` (a user
+    id) wrote recently. Flushes and DML always go to the primary.
+    """
+    token = _replica_scope.set((key,))
+    try:
+        yield
+    finally:
+        _replica_scope.reset(token)
+
+
+def mark_written(session, key):
+    # ``key`` reads from the primary for a while once this session commits
+    session.info.setdefault('written_keys', set()).add(key)
+
+
+class RoutingSession(Session):
+    """
+    Session bound to the primary that sends reads inside replica_reads() to
+    the ReplicaSet in ``info['replicas']``.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        replicas = self.info.get('replicas')
+        scope = _replica_scope.get()
+        if replicas is None or scope is None or self._flushing or isinstance(clause, UpdateBase):
+            return super().get_bind(mapper=mapper, clause=clause, **kw)
+        return replicas.read_engine(scope[0])
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _record_writes(session):
+    keys = session.info.pop('written_keys', None)
+    replicas = session.info.get('replicas')
+    if keys and replicas is not None:
+        for key in keys:
+            replicas.sticky.mark(key)
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _forget_writes(session):
+    session.info.pop('written_keys', None)
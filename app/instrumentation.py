@@ -0,0 +1,359 @@
+# app/instrumentation.py
+"""
+Per-request timing broken down by phase, exported as a Server-Timing header
+and as Prometheus metrics on /metrics, plus sampled profiling of slow requests.
+
+Code marks its phases with ``phase(name)`` / ``@timed(name)``; SQL time and
+query counts come from SQLAlchemy engine events. Outside a request (jobs,
+scripts) phases are no-ops. Phases may overlap: weather includes the DB
+lookups it makes when the background jobs are enabled.
+
+Metrics are per process; under gunicorn each worker reports its own.
+"""
+import contextvars
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import g, request
+from sqlalchemy import event
+
+from .database import pool_status
+
+_timings = contextvars.ContextVar('request_timings', default=None)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestTimings:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {} # name -> [seconds, count]
+        self._active = set()
+
+    def add(self, name, seconds, count=1):
+        totals = self.phases.setdefault(name, [0.0, 0])
+        totals[0] += seconds
+        totals[1] += count
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+@contextmanager
+def phase(name):
+    """
+    Attribute the enclosed block to ``name`` in the current request's timings.
+    A phase nested in itself (e.g. jsonify inside a serialize block) counts once.
+    """
+    timings = _timings.get()
+    if timings is None or name in timings._active:
+        yield
+        return
+    timings._active.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings._active.discard(name)
+        timings.add(name, time.perf_counter() - started)
+
+
+def timed(name):
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            with phase(name):
+                return f(*args, **kwargs)
+        return decorated
+    return decorator
+
+
+class TimedJSONMixin:
+    # Mixed into the app's JSON provider: every jsonify/body encode counts towards serialize
+    def dumps(self, obj, **kwargs):
+        with phase('serialize'):
+            return super().dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        with phase('serialize'):
+            return super().response(*args, **kwargs)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+class Metrics:
+    """
+    Minimal Prometheus registry: counters and histograms keyed by label
+    tuples, plus collectors called at scrape time for gauges owned elsewhere
+    (weather cache, connection pool).
+    """
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self._counters = {} # name -> {labels: value}
+        self._histograms = {} # name -> {labels: [bucket counts..., sum, count]}
+        self._help = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def describe(self, name, kind, help_text):
+        self._help[name] = (kind, help_text)
+
+    def inc(self, name, labels=(), amount=1):
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[labels] = series.get(labels, 0) + amount
+
+    def observe(self, name, value, labels=()):
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            state = series.get(labels)
+            if state is None:
+                state = series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def add_collector(self, collector):
+        """
+        ``collector()`` returns [(name, kind, help, [(labels, value), ...]), ...].
+        """
+        self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            histograms = {name: {labels: list(state) for labels, state in series.items()}
+                          for name, series in self._histograms.items()}
+
+        def header(name, default_kind):
+            kind, help_text = self._help.get(name, (default_kind, ''))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for name, series in sorted(counters.items()):
+            header(name, 'counter')
+            for labels, value in sorted(series.items()):
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+        for name, series in sorted(histograms.items()):
+            header(name, 'histogram')
+            for labels, state in sorted(series.items()):
+                for bound, count in zip(self.buckets, state):
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', bound),))} {count}")
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {state[-1]}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {state[-2]}")
+                lines.append(f"{name}_count{_format_labels(labels)} {state[-1]}")
+        for collector in self._collectors:
+            for name, kind, help_text, samples in collector():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+metrics.describe('http_requests_total', 'counter', 'Requests handled, by endpoint and status.')
+metrics.describe('http_request_duration_seconds', 'histogram', 'Request latency up to the response headers.')
+metrics.describe('http_request_phase_seconds_total', 'counter', 'Time spent per phase (db, auth, hash, weather, serialize).')
+metrics.describe('http_request_phase_calls_total', 'counter', 'Calls per phase; for db, the number of SQL statements.')
+metrics.describe('profiles_written_total', 'counter', 'Slow-request profiles dumped to PROFILE_DIR.')
+
+
+def weather_cache_samples(weather_cache, weather_client):
+    stats = weather_cache.stats()
+    samples = [(f"weather_cache_{name}_total", 'counter', f"Weather cache {name.replace('_', ' ')}.", [((), stats[name])])
+               for name in ('hits', 'stale_hits', 'shared_hits', 'misses', 'evictions', 'refreshes', 'errors')]
+    samples.append(('weather_cache_entries', 'gauge', 'Weather reports held in this process.', [((), stats['entries'])]))
+    samples.append(('weather_circuit_open', 'gauge', '1 while the weather provider circuit breaker is open.',
+                    [((), int(weather_client.breaker.state == 'open'))]))
+    return samples
+
+
+def pool_samples(engine):
+    status = pool_status(engine)
+    samples = []
+    for key in ('size', 'checked_in', 'checked_out', 'overflow_in_use'):
+        if key in status:
+            samples.append((f"db_pool_{key}", 'gauge', f"Connection pool {key.replace('_', ' ')}.", [((), status[key])]))
+    return samples
+
+
+def ratelimit_samples(rate_limiter, admission):
+    samples = [('ratelimit_requests_total', 'counter', 'Rate limit checks, by rule and outcome (allowed, limited, error).',
+                [((('rule', rule), ('outcome', outcome)), count)
+                 for (rule, outcome), count in sorted(rate_limiter.stats().items())])]
+    stats = admission.stats()
+    samples.append(('admission_requests_total', 'counter', 'Requests admitted, and shed by reason (in_flight, queue_time).',
+                    [((('outcome', outcome),), stats[outcome]) for outcome in ('admitted', 'in_flight', 'queue_time')]))
+    samples.append(('admission_in_flight', 'gauge', 'Requests running in this process.', [((), stats['current'])]))
+    return samples
+
+
+def task_cache_samples(task_cache):
+    stats = task_cache.stats()
+    counters = {'hits': 'Task reads answered from the response cache.',
+                'misses': 'Task reads computed because no cached response matched.',
+                'stores': 'Task responses stored.',
+                'skipped': 'Task responses not stored (too large, or weather pending/unavailable).',
+                'invalidations': 'Owners whose cached responses were dropped by a write.',
+                'evictions': 'Cached task responses evicted by the size bound.',
+                'errors': 'Task response cache store errors (served uncached).'}
+    samples = [(f"task_cache_{name}_total", 'counter', help_text, [((), stats[name])])
+               for name, help_text in counters.items()]
+    samples.append(('task_cache_entries', 'gauge', 'Task responses cached.', [((), stats['entries'])]))
+    samples.append(('task_cache_bytes', 'gauge', 'Bytes of cached task responses.', [((), stats['bytes'])]))
+    return samples
+
+
+def instrument_engine(engine):
+    """
+    Count SQL statements and their time towards the db phase of the current request.
+    """
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['query_started'].pop()
+        timings = _timings.get()
+        if timings is not None:
+            timings.add('db', time.perf_counter() - started)
+
+    @event.listens_for(engine, 'handle_error')
+    def handle_error(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get('query_started'):
+            connection.info['query_started'].pop()
+
+
+def _start_profiler(kind):
+    if kind == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            kind = 'cprofile'
+        else:
+            profiler = Profiler()
+            profiler.start()
+            return kind, profiler
+    import cProfile
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiler is already active on this thread
+        return None, None
+    return kind, profiler
+
+
+def _dump_profile(kind, profiler, directory, label):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, label)
+    if kind == 'pyinstrument':
+        profiler.stop()
+        with open(path + '.html', 'w') as f:
+            f.write(profiler.output_html())
+    else:
+        profiler.disable()
+        profiler.dump_stats(path + '.prof')
+
+
+def _stop_profiler(kind, profiler):
+    if kind == 'pyinstrument':
+        profiler.stop()
+    else:
+        profiler.disable()
+
+
+def server_timing(timings, total):
+    entries = []
+    for name, (seconds, count) in sorted(timings.phases.items()):
+        entry = f"{name};dur={seconds * 1000:.2f}"
+        if name == 'db':
+            entry += f';desc="{count} queries"'
+        entries.append(entry)
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ', '.join(entries)
+
+
+def init_instrumentation(app, engine):
+    """
+    Install the timing middleware, the SQL hooks and the /metrics endpoint.
+    """
+    instrument_engine(engine)
+    provider_class = type(app.json)
+    app.json = type(f"Timed{provider_class.__name__}", (TimedJSONMixin, provider_class), {})(app)
+    send_header = app.config.get('SERVER_TIMING', True)
+    sample_rate = app.config.get('PROFILE_SAMPLE_RATE', 0.0)
+    threshold = app.config.get('PROFILE_THRESHOLD_MS', 500) / 1000
+    profile_dir = app.config.get('PROFILE_DIR') or 'profiles'
+    profiler_kind = app.config.get('PROFILER', 'cprofile')
+
+    @app.before_request
+    def start_timing():
+        g.request_timings_token = _timings.set(RequestTimings())
+        g.profiler = (None, None)
+        if sample_rate and random.random() < sample_rate:
+            g.profiler = _start_profiler(profiler_kind)
+
+    @app.after_request
+    def finish_timing(response):
+        timings = _timings.get()
+        if timings is None:
+            return response
+        total = timings.elapsed()
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        metrics.inc('http_requests_total', (('endpoint', endpoint), ('method', request.method),
+                                            ('status', response.status_code)))
+        metrics.observe('http_request_duration_seconds', total, (('endpoint', endpoint),))
+        for name, (seconds, count) in timings.phases.items():
+            labels = (('endpoint', endpoint), ('phase', name))
+            metrics.inc('http_request_phase_seconds_total', labels, seconds)
+            metrics.inc('http_request_phase_calls_total', labels, count)
+        if send_header:
+            response.headers['Server-Timing'] = server_timing(timings, total)
+
+        kind, profiler = g.pop('profiler', (None, None))
+        if profiler is not None:
+            if total >= threshold:
+                slug = re.sub(r'[^A-Za-z0-9]+', '_', endpoint).strip('_') or 'root'
+                _dump_profile(kind, profiler, profile_dir,
+                              f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{request.method}-{slug}-{total * 1000:.0f}ms")
+                metrics.inc('profiles_written_total')
+            else:
+                _stop_profiler(kind, profiler)
+        return response
+
+    @app.teardown_request
+    def reset_timing(exception=None):
+        kind, profiler = g.pop('profiler', (None, None))
+        if profiler is not None:
+            _stop_profiler(kind, profiler)
+        token = g.pop('request_timings_token', None)
+        if token is not None:
+            _timings.reset(token)
+
+    @app.route('/metrics')
+    def prometheus_metrics():
+        return metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+    return metrics
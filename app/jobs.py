@@ -0,0 +1,242 @@
+# app/jobs.py
+"""
+Background weather jobs.
+
+Weather is fetched off the read path and written to the weather_reports
+table: a prefetch is queued whenever a task with a location is created or
+updated, and reports for open tasks due soon are refreshed periodically.
+List reads then only join against stored reports and never call upstream.
+
+WEATHER_JOBS selects where the jobs run:
+    off    - disabled; reads fetch weather live (default)
+    thread - a scheduler thread inside each web worker; each prefetches the
+             locations its own writes queue, and one worker per host (the
+             holder of a lock-file slot) runs the periodic refresh
+    worker - a separate process (worker.py); web workers only read
+"""
+import logging
+import queue
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import Select
+from sqlalchemy.orm import sessionmaker
+
+from .models import Task, WeatherReport
+from .utils.slots import SlotLock, fcntl, slot_dir
+
+logger = logging.getLogger(__name__)
+
+# Returned for a location whose report has not been fetched by the jobs yet
+WEATHER_PENDING = "pending"
+
+
+def _epoch(utc_datetime):
+    # fetched_at is stored as naive UTC
+    return utc_datetime.replace(tzinfo=timezone.utc).timestamp()
+
+
+class WeatherJobs:
+
+    def __init__(self, engine, fetch, mode='thread', refresh_interval=300, due_within_days=7,
+                 max_age=900, cache=None, refresh_slot=None):
+        self.Session = sessionmaker(bind=engine)
+        self.fetch = fetch
+        self.mode = mode
+        self.refresh_interval = refresh_interval
+        self.due_within_days = due_within_days
+        self.max_age = max_age
+        self.cache = cache
+        # A one-slot SlotLock shared by the host's workers; None refreshes in every process
+        self.refresh_slot = refresh_slot
+        self._refresher_pid = None
+        self._queue = queue.Queue()
+        self._queued = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._thread_pid = None
+        self._stop = threading.Event()
+
+    # -- read side -------------------------------------------------------
+
+    def stored_reports(self, session, locations):
+        """
+        Return {location: report} for the locations that have a stored report,
+        priming the weather cache so later reads skip the database.
+        """
+        if not locations:
+            return {}
+        rows = session.execute(Select(WeatherReport.location, WeatherReport.report, WeatherReport.fetched_at)
+                               .where(WeatherReport.location.in_(list(locations)))).all()
+        reports = {}
+        for row in rows:
+            reports[row.location] = row.report
+            if self.cache is not None:
+                self.cache.prime(row.location, row.report, _epoch(row.fetched_at))
+        return reports
+
+    def enqueue(self, location):
+        """
+        Ask for ``location`` to be fetched soon. In worker mode the separate
+        process finds locations without reports on its own.
+        """
+        if not location or self.mode != 'thread':
+            return
+        with self._lock:
+            if location in self._queued:
+                return
+            self._queued.add(location)
+        self._queue.put(location)
+        self.start()
+
+    # -- job side --------------------------------------------------------
+
+    def prefetch(self, location):
+        """
+        Fetch and store the report for ``location``; True when stored. Errors
+        are logged, never raised, so one location can't stop a refresh or
+        the jobs thread.
+        """
+        try:
+            report = self.fetch(location)
+        except Exception:
+            logger.warning("Weather prefetch for %r failed", location, exc_info=True)
+            return False
+        fetched_at = datetime.utcnow()
+        session = self.Session()
+        try:
+            session.merge(WeatherReport(location=location, report=report, fetched_at=fetched_at))
+            session.commit()
+        except Exception:
+            logger.exception("Storing the weather report for %r failed", location)
+            return False
+        finally:
+            session.close()
+        if self.cache is not None:
+            self.cache.prime(location, report, _epoch(fetched_at))
+        return True
+
+    def locations_to_refresh(self):
+        """
+        Locations of open tasks due within ``due_within_days`` whose report is
+        missing or older than ``max_age`` seconds.
+        """
+        today = date.today()
+        stale_before = datetime.utcnow() - timedelta(seconds=self.max_age)
+        session = self.Session()
+        try:
+            query = (Select(Task.location).distinct()
+                     .outerjoin(WeatherReport, WeatherReport.location == Task.location)
+                     .where(Task.location.is_not(None),
+                            Task.completed.is_not(True),
+                            Task.due_date >= today,
+                            Task.due_date <= today + timedelta(days=self.due_within_days))
+                     .where((WeatherReport.fetched_at == None) | (WeatherReport.fetched_at < stale_before)))
+            return list(session.scalars(query))
+        finally:
+            session.close()
+
+    def locations_without_report(self):
+        session = self.Session()
+        try:
+            query = (Select(Task.location).distinct()
+                     .outerjoin(WeatherReport, WeatherReport.location == Task.location)
+                     .where(Task.location.is_not(None), WeatherReport.location == None))
+            return list(session.scalars(query))
+        finally:
+            session.close()
+
+    def refresh(self):
+        refreshed = 0
+        for location in self.locations_to_refresh():
+            refreshed += self.prefetch(location)
+        return refreshed
+
+    def is_refresher(self):
+        """
+        Whether this process runs the periodic refresh: without a slot always,
+        otherwise once it holds the slot, which it keeps until it exits (the
+        kernel then frees it for another worker to take over).
+        """
+        if self.refresh_slot is None:
+            return True
+        if self._refresher_pid != os.getpid():
+            # A slot taken before a fork belongs to the parent
+            self._refresher_pid = os.getpid() if self.refresh_slot.try_acquire() else None
+        return self._refresher_pid is not None
+
+    def start(self):
+        # Started lazily so every forked gunicorn worker runs its own thread
+        with self._lock:
+            if self._thread is not None and self._thread_pid == os.getpid() and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run_thread, name='weather-jobs', daemon=True)
+            self._thread_pid = os.getpid()
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run_thread(self):
+        next_refresh = time.monotonic()
+        while not self._stop.is_set():
+            if time.monotonic() >= next_refresh:
+                try:
+                    if self.is_refresher():
+                        self.refresh()
+                except Exception:
+                    logger.exception("Weather refresh failed")
+                next_refresh = time.monotonic() + self.refresh_interval
+            try:
+                location = self._queue.get(timeout=max(0.1, next_refresh - time.monotonic()))
+            except queue.Empty:
+                continue
+            with self._lock:
+                self._queued.discard(location)
+            self.prefetch(location)
+
+    def run_forever(self, poll_interval=5):
+        """
+        Main loop of worker.py: fill in reports for new locations every
+        ``poll_interval`` seconds and refresh due-soon ones every refresh_interval.
+        """
+        next_refresh = 0
+        while not self._stop.is_set():
+            try:
+                for location in self.locations_without_report():
+                    self.prefetch(location)
+                if time.monotonic() >= next_refresh:
+                    logger.info("Refreshed weather for %d locations", self.refresh())
+                    next_refresh = time.monotonic() + self.refresh_interval
+            except Exception:
+                logger.exception("Weather worker iteration failed")
+            self._stop.wait(poll_interval)
+
+
+weather_jobs = None
+
+def init_weather_jobs(config, engine, fetch, cache=None):
+    global weather_jobs
+    mode = config.get('WEATHER_JOBS', 'off')
+    if mode == 'off':
+        weather_jobs = None
+        return None
+    refresh_slot = None
+    if mode == 'thread' and fcntl is not None:
+        refresh_slot = SlotLock(slot_dir(config, 'WEATHER_REFRESH_SLOT_DIR'), 1,
+                                name='weather-refresh')
+    weather_jobs = WeatherJobs(engine, fetch, mode=mode,
+                               refresh_interval=config.get('WEATHER_REFRESH_INTERVAL', 300),
+                               due_within_days=config.get('WEATHER_REFRESH_DUE_WITHIN_DAYS', 7),
+                               max_age=config.get('WEATHER_REPORT_MAX_AGE', 900),
+                               cache=cache,
+                               refresh_slot=refresh_slot)
+    return weather_jobs
+
+def enqueue_weather(*locations):
+    # Called by the write routes after commit; no-op unless the jobs run in-process
+    if weather_jobs is not None:
+        for location in locations:
+            weather_jobs.enqueue(location)
@@ -0,0 +1,163 @@
+# app/migrations.py
+"""
+Minimal schema migrations tracked in a ``schema_version`` table.
+
+Each migration is a function taking a Connection inside an open transaction.
+Migrations only ever get appended; never edit one that has shipped.
+"""
+import re
+from datetime import date, datetime
+
+from sqlalchemy import (Table, Column, MetaData, Integer, String, Boolean, Date, DateTime, ForeignKey,
+                        inspect, select, text)
+from sqlalchemy.exc import IntegrityError
+
+from . import models
+
+schema_version = Table(
+    "schema_version", MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+def _baseline(conn):
+    # Schema as Base.metadata.create_all used to build it; frozen so that
+    # later migrations always start from the same place
+    metadata = MetaData()
+    Table("users", metadata,
+          Column("id", Integer, primary_key=True),
+          Column("username", String, unique=True, nullable=False),
+          Column("hashed_password", String, nullable=True))
+    Table("task_data", metadata,
+          Column("id", Integer, primary_key=True),
+          Column("description", String),
+          Column("completed", Boolean),
+          Column("due_date", String),
+          Column("location", String, nullable=True),
+          Column("owner_id", Integer, ForeignKey("users.id")))
+    metadata.create_all(conn, checkfirst=True)
+
+_ISO_DATE = re.compile(r"\s*(\d{4}-\d{2}-\d{2})(?:[T ].*)?\s*$")
+
+def _legacy_due_date(value):
+    # due_date used to be free text: keep real YYYY-MM-DD dates (dropping any time part);
+    # anything else ("", "next friday", "12/05/2024", "2024-02-30") can't be read as a date
+    match = _ISO_DATE.match(value)
+    if match is None:
+        return None
+    try:
+        return date.fromisoformat(match.group(1)).isoformat()
+    except ValueError:
+        return None
+
+def _task_indexes_and_due_date(conn):
+    is_text = True
+    if conn.dialect.name == "postgresql":
+        due_date = next(column for column in inspect(conn).get_columns("task_data")
+                        if column["name"] == "due_date")
+        is_text = not isinstance(due_date["type"], Date)
+    if is_text:
+        # Normalized before the type change, so neither the cast below nor the DATE column
+        # readers ever meet a value they can't parse
+        rows = conn.execute(text("SELECT id, due_date FROM task_data WHERE due_date IS NOT NULL")).all()
+        normalized = [(task_id, value, _legacy_due_date(value)) for task_id, value in rows]
+        fixes = [{"id": task_id, "due_date": new} for task_id, value, new in normalized if new != value]
+        if fixes:
+            conn.execute(text("UPDATE task_data SET due_date = :due_date WHERE id = :id"), fixes)
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("ALTER TABLE task_data ALTER COLUMN due_date TYPE DATE USING due_date::date"))
+    for index in models.Task.__table__.indexes:
+        index.create(conn, checkfirst=True)
+
+def _user_tasks_version(conn):
+    columns = {column["name"] for column in inspect(conn).get_columns("users")}
+    if "tasks_version" not in columns:
+        conn.execute(text("ALTER TABLE users ADD COLUMN tasks_version INTEGER NOT NULL DEFAULT 0"))
+
+def _weather_reports(conn):
+    models.WeatherReport.__table__.create(conn, checkfirst=True)
+
+def _task_search(conn):
+    # Imported here so loading the migrations doesn't pull in the tasks blueprint
+    from .tasks.search import create_search_index
+    create_search_index(conn)
+
+def _task_stats(conn):
+    models.TaskStats.__table__.create(conn, checkfirst=True)
+    models.TaskDueCount.__table__.create(conn, checkfirst=True)
+    from .tasks.stats import rebuild_owner_stats
+    rebuild_owner_stats(conn)
+
+def _task_changes(conn):
+    models.TaskChange.__table__.create(conn, checkfirst=True)
+
+MIGRATIONS = [
+    (1, "baseline users and task_data tables", _baseline),
+    (2, "task owner indexes and DATE due_date", _task_indexes_and_due_date),
+    (3, "per-user tasks_version counter", _user_tasks_version),
+    (4, "persisted weather_reports", _weather_reports),
+    (5, "full-text search index on task descriptions", _task_search),
+    (6, "per-user task statistics", _task_stats),
+    (7, "per-user task change log", _task_changes),
+]
+
+def current_version(conn):
+    return conn.execute(select(schema_version.c.version)
+                        .order_by(schema_version.c.version.desc())).scalar() or 0
+
+def pending(engine):
+    """
+    Versions not applied yet. On an up-to-date database this is two quick
+    queries, which is all a worker pays at startup.
+    """
+    with engine.connect() as conn:
+        current = current_version(conn) if inspect(conn).has_table("schema_version") else 0
+    return [version for version, _, _ in MIGRATIONS if version > current]
+
+def verify(engine):
+    # For SCHEMA_CHECK=verify: refuse to serve on a schema the code doesn't match
+    missing = pending(engine)
+    if missing:
+        raise RuntimeError(f"Database schema is behind: migrations {missing} not applied; "
+                           f"run them or start with SCHEMA_CHECK=upgrade")
+
+def check_schema(engine, mode):
+    """
+    Apply SCHEMA_CHECK ``mode`` ('upgrade', 'verify' or 'off') to ``engine``.
+    """
+    if mode == 'upgrade':
+        return upgrade(engine)
+    if mode == 'verify':
+        verify(engine)
+    elif mode != 'off':
+        raise ValueError(f"Unknown SCHEMA_CHECK {mode!r}; use upgrade, verify or off")
+    return []
+
+def upgrade(engine, target=None):
+    """
+    Apply every pending migration up to ``target`` (default: latest).
+    Safe to run from several workers at once.
+    """
+    if target is None and not pending(engine):
+        return []
+    schema_version.create(engine, checkfirst=True)
+    applied = []
+    for version, description, migrate in MIGRATIONS:
+        if target is not None and version > target:
+            break
+        try:
+            with engine.begin() as conn:
+                if conn.dialect.name == "postgresql":
+                    # Serialize concurrent upgrades from several workers
+                    conn.execute(text("SELECT pg_advisory_xact_lock(7306001)"))
+                if current_version(conn) >= version:
+                    continue
+                migrate(conn)
+                conn.execute(schema_version.insert().values(
+                    version=version, description=description, applied_at=datetime.utcnow()))
+        except IntegrityError:
+            # Another worker recorded this version first
+            continue
+        applied.append(version)
+    return applied
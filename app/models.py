@@ -1,4 +1,4 @@
-from sqlalchemy import Column,create_engine,Integer,String,Select,Boolean, ForeignKey
+from sqlalchemy import Column,create_engine,Integer,String,Select,Boolean, Date, DateTime, ForeignKey, Index, JSON
 from sqlalchemy.orm import declarative_base,sessionmaker,scoped_session, relationship
 
 #Define Database Structure
@@ -8,13 +8,54 @@ class Task(Base):
     id = Column(Integer, primary_key=True)
     description = Column(String)
     completed = Column(Boolean)
-    due_date = Column(String)
+    due_date = Column(Date)
     location = Column(String, nullable=True)
     owner_id = Column(Integer, ForeignKey("users.id"))
     owner = relationship("User")
 
+    # Every read path filters by owner: keyset pages walk (owner_id, id),
+    # completed/due-date filters use (owner_id, completed, due_date)
+    __table_args__ = (
+        Index("ix_task_data_owner_id_id", "owner_id", "id"),
+        Index("ix_task_data_owner_completed_due", "owner_id", "completed", "due_date"),
+    )
+
 class User(Base):
     __tablename__ = "users"
     id = Column(Integer, primary_key=True)
     username = Column(String, unique=True, nullable=False)
-    hashed_password = Column(String, nullable=True)
\ No newline at end of file
+    hashed_password = Column(String, nullable=True)
+    # Bumped by every write to the user's tasks; drives the ETags on task reads
+    tasks_version = Column(Integer, nullable=False, default=0, server_default="0")
+
+class WeatherReport(Base):
+    # Latest upstream report per location, written by the background weather jobs
+    __tablename__ = "weather_reports"
+    location = Column(String, primary_key=True)
+    report = Column(JSON)
+    fetched_at = Column(DateTime, nullable=False)
+
+class TaskStats(Base):
+    # Per-user task counters, kept current by every task write (app/tasks/stats.py)
+    __tablename__ = "task_stats"
+    owner_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    total = Column(Integer, nullable=False, default=0, server_default="0")
+    completed = Column(Integer, nullable=False, default=0, server_default="0")
+    # Open tasks due before overdue_as_of; rolled forward a day at a time from task_due_counts
+    overdue = Column(Integer, nullable=False, default=0, server_default="0")
+    overdue_as_of = Column(Date, nullable=False)
+
+class TaskDueCount(Base):
+    # Open (not completed) tasks per user and due date
+    __tablename__ = "task_due_counts"
+    owner_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    due_date = Column(Date, primary_key=True)
+    open_count = Column(Integer, nullable=False)
+
+class TaskChange(Base):
+    # Append-only log of task writes, keyed by the users.tasks_version each write produced
+    __tablename__ = "task_changes"
+    owner_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    version = Column(Integer, primary_key=True)
+    task_id = Column(Integer, primary_key=True)
+    op = Column(String, nullable=False) # 'create', 'update' or 'delete'
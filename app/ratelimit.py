@@ -0,0 +1,312 @@
+# app/ratelimit.py
+"""
+Per-client rate limits and global admission control.
+
+- Token buckets: each (rule, key) pair refills at ``rate`` tokens per second
+  up to ``burst``; a request takes one token or is refused with the time until
+  the next one. Rules: 'user' (every token-protected route, keyed by user id)
+  and 'auth_ip' (login/register, keyed by client address).
+- Buckets live in this process (MemoryBuckets), in a SQLite file shared by
+  every worker on the host (SQLiteBuckets), or in any object with the same
+  ``take`` method (RATE_LIMIT_BACKEND='package.module:factory', called with
+  the app config).
+- Admission sheds requests with 503 before they reach a handler: when the
+  host already has ADMISSION_MAX_IN_FLIGHT requests running (each worker, in
+  the ASGI mode), or when the request waited longer than
+  ADMISSION_MAX_QUEUE_MS in front of the workers (from the proxy's
+  X-Request-Start header).
+
+Backend errors fail open: a broken limiter store never takes the API down.
+"""
+import importlib
+import itertools
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+from app.utils.slots import SlotLock, fcntl, slot_dir
+
+
+class RateLimited(Exception):
+    """Raised when a bucket is empty; retry after ``retry_after`` seconds."""
+    def __init__(self, rule, retry_after):
+        super().__init__(f"Rate limit '{rule}' exceeded")
+        self.rule = rule
+        self.retry_after = retry_after
+
+
+def _refill(tokens, updated, now, rate, burst):
+    return min(burst, tokens + max(0.0, now - updated) * rate)
+
+
+class MemoryBuckets:
+    """
+    Buckets in a dict, per process. Past ``max_keys`` the least recently
+    used tenth is dropped; a dropped bucket simply starts full again.
+    """
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = {} # key -> (tokens, updated); insertion order = last use
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst):
+        """
+        Take one token for ``key``. Returns 0 when allowed, otherwise the
+        seconds until a token is available.
+        """
+        now = time.time()
+        with self._lock:
+            state = self._buckets.pop(key, None)
+            tokens = burst if state is None else _refill(state[0], state[1], now, rate, burst)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            self._buckets[key] = (tokens - 1 if wait == 0 else tokens, now)
+            if len(self._buckets) > self.max_keys:
+                for stale in list(itertools.islice(self._buckets, max(1, self.max_keys // 10))):
+                    del self._buckets[stale]
+        return wait
+
+
+class SQLiteBuckets:
+    """
+    Buckets in a SQLite file, so every worker on the host draws from the same
+    bucket. Each take is one short IMMEDIATE transaction.
+    """
+
+    def __init__(self, path, busy_timeout=1.0, idle_seconds=3600):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.idle_seconds = idle_seconds
+        self._local = threading.local()
+        self._takes = 0
+        with closing(sqlite3.connect(path, timeout=busy_timeout, isolation_level=None)) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                                key TEXT PRIMARY KEY,
+                                tokens REAL NOT NULL,
+                                updated REAL NOT NULL)""")
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit mode; take() opens its own transactions
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key, rate, burst):
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM rate_limit_buckets WHERE key = ?", (key,)).fetchone()
+            tokens = burst if row is None else _refill(row[0], row[1], now, rate, burst)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            conn.execute("INSERT OR REPLACE INTO rate_limit_buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                         (key, tokens - 1 if wait == 0 else tokens, now))
+            self._takes += 1
+            if self._takes % 1000 == 0:
+                # Buckets idle this long are full again; dropping them changes nothing
+                conn.execute("DELETE FROM rate_limit_buckets WHERE updated < ?", (now - self.idle_seconds,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+
+def build_backend(config):
+    backend = config.get('RATE_LIMIT_BACKEND', 'memory')
+    if backend == 'memory':
+        return MemoryBuckets(config.get('RATE_LIMIT_MAX_KEYS', 100000))
+    if backend == 'sqlite':
+        return SQLiteBuckets(config.get('RATE_LIMIT_PATH') or 'ratelimit.db')
+    module_name, _, factory = backend.partition(':')
+    return getattr(importlib.import_module(module_name), factory)(config)
+
+
+class RateLimiter:
+    """
+    Named rules of ``(rate, burst)`` over one bucket backend. A rule with a
+    rate of 0, or one that is not configured, never limits.
+    """
+
+    def __init__(self, backend, rules=None):
+        self.backend = backend
+        self.rules = {name: rule for name, rule in (rules or {}).items() if rule[0] > 0}
+        self._counts = {} # (rule, outcome) -> count
+        self._lock = threading.Lock()
+
+    def _count(self, rule, outcome):
+        with self._lock:
+            self._counts[(rule, outcome)] = self._counts.get((rule, outcome), 0) + 1
+
+    def check(self, rule, key):
+        """
+        Take a token from ``key``'s bucket under ``rule``; raises RateLimited when empty.
+        """
+        limits = self.rules.get(rule)
+        if limits is None:
+            return
+        try:
+            wait = self.backend.take(f"{rule}:{key}", *limits)
+        except Exception:
+            self._count(rule, 'error')
+            return
+        if wait > 0:
+            self._count(rule, 'limited')
+            raise RateLimited(rule, max(1, int(wait + 0.999)))
+        self._count(rule, 'allowed')
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts)
+
+
+def parse_request_start(value, now=None):
+    """
+    Seconds a request spent queued, from an X-Request-Start header ("t=<epoch>"
+    in seconds, milliseconds or microseconds). None when absent or malformed.
+    """
+    if not value:
+        return None
+    try:
+        started = float(value.strip().removeprefix('t='))
+    except ValueError:
+        return None
+    if started > 1e14:
+        started /= 1e6
+    elif started > 1e11:
+        started /= 1e3
+    return max(0.0, (time.time() if now is None else now) - started)
+
+
+class Admission:
+    """
+    Global load shedding: refuses a request when ``max_in_flight`` requests
+    are already running or the request already queued longer than
+    ``max_queue_seconds``. Either bound is off at 0.
+
+    In-flight requests are counted in this process, or across the host when
+    ``slots`` (a SlotLock with ``max_in_flight`` slots) is given: a sync
+    worker never runs more than one request, so only the host-wide count can
+    shed anything there.
+    """
+
+    def __init__(self, max_in_flight=0, max_queue_seconds=0, retry_after=1, slots=None):
+        self.max_in_flight = max_in_flight
+        self.max_queue_seconds = max_queue_seconds
+        self.retry_after = retry_after
+        self.slots = slots
+        self.in_flight = 0
+        self._counts = {'admitted': 0, 'in_flight': 0, 'queue_time': 0}
+        self._lock = threading.Lock()
+
+    def try_enter(self, queued_seconds=None):
+        """
+        Returns None when admitted (pair it with leave()), otherwise the
+        reason the request was shed.
+        """
+        if self.max_queue_seconds and queued_seconds is not None and queued_seconds > self.max_queue_seconds:
+            reason = 'queue_time'
+        elif self.slots is not None:
+            if self.slots.try_acquire():
+                with self._lock:
+                    self.in_flight += 1
+                    self._counts['admitted'] += 1
+                return None
+            reason = 'in_flight'
+        else:
+            with self._lock:
+                if not self.max_in_flight or self.in_flight < self.max_in_flight:
+                    self.in_flight += 1
+                    self._counts['admitted'] += 1
+                    return None
+            reason = 'in_flight'
+        with self._lock:
+            self._counts[reason] += 1
+        return reason
+
+    def leave(self):
+        if self.slots is not None:
+            self.slots.release()
+        with self._lock:
+            self.in_flight -= 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts, current=self.in_flight)
+
+
+rate_limiter = RateLimiter(MemoryBuckets())
+admission = Admission()
+
+def check_rate_limit(rule, key):
+    rate_limiter.check(rule, key)
+
+
+def rate_limited_response(e):
+    # A (body, status, headers) tuple, so Flask and Quart views can return it as is
+    return {'message': 'Too many requests, retry shortly.'}, 429, {'Retry-After': str(e.retry_after)}
+
+
+def init_rate_limiter(config):
+    global rate_limiter
+    rate_limiter = RateLimiter(build_backend(config), {
+        'user': (config.get('RATE_LIMIT_USER_RATE', 0), config.get('RATE_LIMIT_USER_BURST', 1)),
+        'auth_ip': (config.get('RATE_LIMIT_AUTH_IP_RATE', 0), config.get('RATE_LIMIT_AUTH_IP_BURST', 1)),
+    })
+    return rate_limiter
+
+
+def build_admission(config, host_wide=True):
+    """
+    Admission from the ADMISSION_* settings. With ``host_wide`` in-flight
+    requests are counted in lock-file slots across the host's workers,
+    otherwise in this process.
+    """
+    max_in_flight = config.get('ADMISSION_MAX_IN_FLIGHT', 0)
+    slots = None
+    if host_wide and max_in_flight and fcntl is not None:
+        slots = SlotLock(slot_dir(config, 'ADMISSION_SLOT_DIR'), max_in_flight,
+                         name='admission-slot')
+    return Admission(max_in_flight, config.get('ADMISSION_MAX_QUEUE_MS', 0) / 1000,
+                     config.get('ADMISSION_RETRY_AFTER', 1), slots)
+
+
+def admission_exempt_paths(config):
+    return {path.strip() for path in config.get('ADMISSION_EXEMPT_PATHS', '').split(',') if path.strip()}
+
+
+def init_admission(app):
+    """
+    Build the process-wide Admission from the config and shed load in a
+    before_request hook; paths in ADMISSION_EXEMPT_PATHS (metrics, pool
+    status) are always served.
+    """
+    from flask import g, jsonify, request
+
+    global admission
+    admission = build_admission(app.config)
+    exempt = admission_exempt_paths(app.config)
+    current = admission
+
+    @app.before_request
+    def admit_request():
+        if request.path in exempt:
+            return None
+        reason = current.try_enter(parse_request_start(request.headers.get('X-Request-Start')))
+        if reason is not None:
+            return jsonify({'message': 'Server busy, retry shortly.'}), 503, \
+                {'Retry-After': str(current.retry_after)}
+        g.admitted = True
+        return None
+
+    @app.teardown_request
+    def release_admission(exception=None):
+        if g.pop('admitted', False):
+            current.leave()
+
+    return admission
@@ -0,0 +1,58 @@
+# app/serialization.py
+"""
+Response JSON encoding. With JSON_PROVIDER='auto' the app uses orjson when it
+is installed and Flask's stdlib provider otherwise; the output shape is the
+same (compact, sorted keys), except that orjson writes non-ASCII characters
+as UTF-8 instead of \\u escapes.
+"""
+try:
+    import orjson
+except ImportError: # optional: the stdlib provider is used instead
+    orjson = None
+
+from flask.json.provider import DefaultJSONProvider
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson. Dates and datetimes still go through
+    Flask's ``default`` hook, so they serialize exactly as with the stdlib provider.
+    """
+
+    def _options(self):
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        return options
+
+    def dumps_bytes(self, obj, **kwargs):
+        if kwargs:
+            # json.dumps options (indent, cls, ...) are only understood by the stdlib encoder
+            return super().dumps(obj, **kwargs).encode()
+        return orjson.dumps(obj, default=self.default, option=self._options())
+
+    def dumps(self, obj, **kwargs):
+        return self.dumps_bytes(obj, **kwargs).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if self.compact is False or (self.compact is None and self._app.debug):
+            # Pretty-printed debug output keeps the stdlib path
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj) + b"\n", mimetype=self.mimetype)
+
+
+def json_provider_class(name='auto'):
+    if name == 'stdlib' or orjson is None:
+        return DefaultJSONProvider
+    return OrjsonProvider
+
+
+def init_json_provider(app):
+    app.json = json_provider_class(app.config.get('JSON_PROVIDER', 'auto'))(app)
+    return app.json
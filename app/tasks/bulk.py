@@ -0,0 +1,125 @@
+# app/tasks/bulk.py
+"""
+POST /tasks/bulk for both serving modes (the ASGI handlers call it through
+AsyncSession.run_sync). Items are validated one by one and answered with
+per-item statuses; the valid ones are written in the caller's transaction,
+which the caller commits, or rolls back on IntegrityError.
+"""
+from sqlalchemy import Select, insert, update, delete
+
+from app.models import Task
+from . import changes, stats
+from .services import clean_task_fields
+
+
+class BulkRejected(ValueError):
+    """The request as a whole is unusable; answer ``status`` with the message."""
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def run_bulk(session, owner_id, bulk_req, max_items, bump_tasks_version):
+    """
+    Apply ``bulk_req`` ({'create': [...], 'update': [...], 'delete': [...]})
+    for ``owner_id``. Returns the per-item results and the locations to look
+    up weather for once the transaction commits.
+    """
+    if not isinstance(bulk_req, dict):
+        raise BulkRejected("Expected an object with 'create', 'update' and/or 'delete' arrays.")
+    creates = bulk_req.get('create', [])
+    updates = bulk_req.get('update', [])
+    deletes = bulk_req.get('delete', [])
+    if not all(isinstance(ops, list) for ops in (creates, updates, deletes)):
+        raise BulkRejected("'create', 'update' and 'delete' must be arrays.")
+    if len(creates) + len(updates) + len(deletes) > max_items:
+        raise BulkRejected(f"At most {max_items} items per bulk request.", 413)
+
+    results = {"create": [], "update": [], "delete": []}
+
+    create_rows = []
+    create_indexes = []
+    for index, item in enumerate(creates):
+        try:
+            values = clean_task_fields(item)
+        except ValueError as e:
+            results['create'].append({"index": index, "status": 400, "error": str(e)})
+            continue
+        values['owner_id'] = owner_id
+        create_rows.append(values)
+        create_indexes.append(index)
+
+    update_rows = []
+    for index, item in enumerate(updates):
+        try:
+            values = clean_task_fields(item, partial=True)
+            if 'id' not in values:
+                raise ValueError("Missing fields: id")
+        except ValueError as e:
+            results['update'].append({"index": index, "status": 400, "error": str(e)})
+            continue
+        update_rows.append((index, values))
+
+    delete_ids = []
+    for index, task_id in enumerate(deletes):
+        if isinstance(task_id, dict):
+            task_id = task_id.get('id')
+        try:
+            delete_ids.append((index, int(task_id)))
+        except (TypeError, ValueError):
+            results['delete'].append({"index": index, "status": 400, "error": "'id' must be an integer."})
+
+    # A single ownership lookup covers every update and delete in the batch; the
+    # states it returns feed the task statistics
+    requested_ids = {row['id'] for _, row in update_rows} | {task_id for _, task_id in delete_ids}
+    states = {}
+    if requested_ids:
+        states = {task_id: stats.task_state(completed, due_date) for task_id, completed, due_date in session.execute(
+            Select(Task.id, Task.completed, Task.due_date)
+            .where(Task.owner_id == owner_id, Task.id.in_(requested_ids)))}
+    owned_ids = set(states)
+    removed, added = [], []
+    new_ids = []
+
+    if create_rows:
+        new_ids = session.scalars(
+            insert(Task).returning(Task.id, sort_by_parameter_order=True), create_rows).all()
+        for index, new_id in zip(create_indexes, new_ids):
+            results['create'].append({"index": index, "status": 201, "id": new_id})
+        added.extend(stats.task_state(row['completed'], row['due_date']) for row in create_rows)
+
+    owned_updates = [row for _, row in update_rows if row['id'] in owned_ids]
+    if owned_updates:
+        # executemany UPDATE ... WHERE id = ? grouped by the set of columns changed
+        session.execute(update(Task), owned_updates)
+        for row in owned_updates:
+            # Sequential, so a task updated twice in one batch counts once
+            before = states[row['id']]
+            states[row['id']] = stats.task_state(row.get('completed', before[0]), row.get('due_date', before[1]))
+            removed.append(before)
+            added.append(states[row['id']])
+    for index, row in update_rows:
+        status = 200 if row['id'] in owned_ids else 404
+        results['update'].append({"index": index, "id": row['id'], "status": status})
+
+    owned_deletes = [task_id for _, task_id in delete_ids if task_id in owned_ids]
+    if owned_deletes:
+        session.execute(delete(Task)
+                        .where(Task.owner_id == owner_id, Task.id.in_(owned_deletes))
+                        .execution_options(synchronize_session=False))
+    for index, task_id in delete_ids:
+        status = 204 if task_id in owned_ids else 404
+        results['delete'].append({"index": index, "id": task_id, "status": status})
+    removed.extend(states[task_id] for task_id in set(owned_deletes))
+
+    if create_rows or owned_updates or owned_deletes:
+        version = bump_tasks_version(session, owner_id)
+        stats.record_task_changes(session, owner_id, removed, added)
+        changes.log_task_changes(session, owner_id, version,
+                                 [(new_id, 'create') for new_id in new_ids] +
+                                 [(row['id'], 'update') for row in owned_updates] +
+                                 [(task_id, 'delete') for task_id in owned_deletes])
+
+    for op_results in results.values():
+        op_results.sort(key=lambda result: result['index'])
+    return results, {row.get('location') for row in create_rows + owned_updates}
@@ -0,0 +1,274 @@
+# app/tasks/cache.py
+"""
+Read-through cache of serialized task reads (list pages and single tasks).
+
+Entries are keyed by the response's ETag, which already names everything the
+body depends on: the owner, their tasks_version, the path and query string,
+and for bodies with weather the weather TTL window. Every task write bumps
+tasks_version, so once it commits no reader can ask for an entry built
+before it, in any worker; a reader racing the write at most stores a body
+under the old version, which nobody reads again. bump_tasks_version also
+drops the owner's entries outright, which frees them here (or on the host,
+for the shared store) instead of leaving them to age out.
+
+- TASK_CACHE_BACKEND='memory': an LRU in each worker, bounded by
+  TASK_CACHE_MAX_MB of bodies.
+- 'sqlite': one SQLite file (TASK_CACHE_PATH) shared by the workers on the
+  host, same bound, least recently read entries evicted first. It outlives
+  worker restarts; clear_shared_store empties it once per deploy.
+- 'package.module:factory': any object with the store methods, built from
+  the app config; 'off' disables the cache.
+
+Bodies whose weather is pending or unavailable are not stored, so the next
+read tries the lookup again. Store errors fail open: the read is computed
+as if the entry were missing.
+"""
+import importlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+
+from .services import weather_settled
+
+
+class MemoryResponseStore:
+    """
+    In-process LRU of bodies, with an index of each owner's keys so
+    invalidation doesn't scan the cache.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict() # key -> (owner_id, body)
+        self._owners = {} # owner_id -> {key, ...}
+        self._bytes = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, owner_id, key, body):
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (owner_id, body)
+            self._owners.setdefault(owner_id, set()).add(key)
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+                self._evictions += 1
+
+    def invalidate(self, owner_id):
+        with self._lock:
+            for key in list(self._owners.get(owner_id, ())):
+                self._discard(key)
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        owner_id, body = entry
+        self._bytes -= len(body)
+        keys = self._owners[owner_id]
+        keys.discard(key)
+        if not keys:
+            del self._owners[owner_id]
+
+    def size(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes, 'evictions': self._evictions}
+
+
+class SQLiteResponseStore:
+    """
+    Bodies in a SQLite file shared by every worker on the host. Reads refresh
+    an entry's last-used time at most every ``touch_seconds``; the size bound
+    is checked every ``check_every`` stores, dropping the least recently used
+    entries down to 90% of it.
+    """
+
+    def __init__(self, path, max_bytes, busy_timeout=1.0, touch_seconds=10.0, check_every=100):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.busy_timeout = busy_timeout
+        self.touch_seconds = touch_seconds
+        self.check_every = check_every
+        self._local = threading.local()
+        self._stores = 0
+        self._evictions = 0
+        # Set up on a throwaway connection: one opened here could end up shared by forked workers.
+        # Entries survive: every worker builds a store, and the others keep serving from it
+        with closing(sqlite3.connect(path, timeout=busy_timeout, isolation_level=None)) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS task_response_cache (
+                                key TEXT PRIMARY KEY,
+                                owner_id INTEGER NOT NULL,
+                                body BLOB NOT NULL,
+                                size INTEGER NOT NULL,
+                                used REAL NOT NULL)""")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_task_response_cache_owner ON task_response_cache (owner_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_task_response_cache_used ON task_response_cache (used)")
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit mode: every statement is its own short transaction
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._connection()
+        row = conn.execute("SELECT body, used FROM task_response_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if now - row[1] > self.touch_seconds:
+            conn.execute("UPDATE task_response_cache SET used = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def set(self, owner_id, key, body):
+        conn = self._connection()
+        conn.execute("INSERT OR REPLACE INTO task_response_cache (key, owner_id, body, size, used) "
+                     "VALUES (?, ?, ?, ?, ?)", (key, owner_id, body, len(body), time.time()))
+        self._stores += 1
+        if self._stores % self.check_every == 0:
+            self._evict(conn)
+
+    def _evict(self, conn):
+        entries, total = conn.execute("SELECT count(*), total(size) FROM task_response_cache").fetchone()
+        if total <= self.max_bytes or not entries:
+            return
+        # Oldest first, about as many entries as the excess takes at the average size
+        count = int((total - self.max_bytes * 0.9) / (total / entries)) + 1
+        self._evictions += conn.execute(
+            "DELETE FROM task_response_cache WHERE key IN "
+            "(SELECT key FROM task_response_cache ORDER BY used LIMIT ?)", (count,)).rowcount
+
+    def invalidate(self, owner_id):
+        self._connection().execute("DELETE FROM task_response_cache WHERE owner_id = ?", (owner_id,))
+
+    def clear(self):
+        self._connection().execute("DELETE FROM task_response_cache")
+
+    def size(self):
+        entries, total = self._connection().execute(
+            "SELECT count(*), total(size) FROM task_response_cache").fetchone()
+        return {'entries': entries, 'bytes': int(total), 'evictions': self._evictions}
+
+
+def build_store(config):
+    backend = config.get('TASK_CACHE_BACKEND', 'memory')
+    if backend == 'off':
+        return None
+    max_bytes = int(config.get('TASK_CACHE_MAX_MB', 32) * 1024 * 1024)
+    if backend == 'memory':
+        return MemoryResponseStore(max_bytes)
+    if backend == 'sqlite':
+        return SQLiteResponseStore(config.get('TASK_CACHE_PATH') or 'task_cache.db', max_bytes)
+    module_name, _, factory = backend.partition(':')
+    return getattr(importlib.import_module(module_name), factory)(config)
+
+
+def clear_shared_store(config):
+    """
+    Empty the host's shared store (TASK_CACHE_BACKEND='sqlite'). Run once per
+    deploy from the gunicorn master, and by seed.py to drop the entries of a
+    wiped database (its new users start at a later tasks_version, so they
+    would never be hit). Never from a worker, which would drop entries the
+    others are serving.
+    """
+    if config.get('TASK_CACHE_BACKEND', 'memory') == 'sqlite':
+        SQLiteResponseStore(config.get('TASK_CACHE_PATH') or 'task_cache.db', 0).clear()
+
+
+class ResponseCache:
+    """
+    Counts lookups over one store and keeps store errors away from the
+    request. Without a store every lookup misses and nothing is kept.
+    """
+
+    def __init__(self, store, max_entry_bytes=1024 * 1024):
+        self.store = store
+        self.max_entry_bytes = max_entry_bytes
+        self._counters = {'hits': 0, 'misses': 0, 'stores': 0, 'skipped': 0, 'invalidations': 0, 'errors': 0}
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def get(self, key):
+        if self.store is None:
+            return None
+        try:
+            body = self.store.get(key)
+        except sqlite3.Error:
+            self._count('errors')
+            return None
+        self._count('misses' if body is None else 'hits')
+        return body
+
+    def put(self, owner_id, key, body, weather_map=None):
+        """
+        Keep ``body`` (str or bytes) for ``key``. Not kept when it is too large
+        or carries weather that is pending or unavailable.
+        """
+        if self.store is None:
+            return
+        if isinstance(body, str):
+            body = body.encode()
+        if len(body) > self.max_entry_bytes or not weather_settled(weather_map):
+            self._count('skipped')
+            return
+        try:
+            self.store.set(owner_id, key, body)
+        except sqlite3.Error:
+            self._count('errors')
+            return
+        self._count('stores')
+
+    def invalidate(self, owner_id):
+        if self.store is None:
+            return
+        try:
+            self.store.invalidate(owner_id)
+        except sqlite3.Error:
+            # The version bump alone keeps stale entries from being served
+            self._count('errors')
+            return
+        self._count('invalidations')
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        size = {'entries': 0, 'bytes': 0, 'evictions': 0}
+        if self.store is not None:
+            try:
+                size = self.store.size()
+            except sqlite3.Error:
+                pass
+        stats.update(size)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+task_cache = ResponseCache(None)
+
+def init_task_cache(config):
+    """
+    Build the process-wide task response cache from the TASK_CACHE_* settings.
+    """
+    global task_cache
+    task_cache = ResponseCache(build_store(config),
+                               max_entry_bytes=int(config.get('TASK_CACHE_MAX_ENTRY_KB', 1024) * 1024))
+    return task_cache
@@ -0,0 +1,193 @@
+# app/tasks/changes.py
+"""
+Change feed for tasks, so clients fetch deltas instead of re-reading the list.
+
+Every task write appends one task_changes row per task it touched, in its
+own transaction, under the users.tasks_version it bumped to. Versions are
+therefore contiguous per user, and a client that has applied version N asks
+for what came after it:
+
+- GET /tasks/changes?since=N[&wait=S]: the changes after N; when there are
+  none yet, hold the request up to S seconds for one (long-poll).
+- GET /tasks/changes/stream?since=N: Server-Sent Events, one event per page
+  of changes; EventSource resumes from Last-Event-ID on reconnect.
+
+A change carries the task's current fields (no weather), or just its id for
+a delete. List responses send X-Tasks-Version, the version to continue from.
+When the log no longer reaches back to N (pruned past
+TASK_CHANGES_RETAIN_VERSIONS, or older than the log itself) the answer is a
+reset: re-read the list and continue from ``next``.
+
+Under the sync gunicorn workers a held request occupies a whole worker, so
+at most TASK_CHANGES_HOLD_SLOTS feed requests are held at once across the
+host (lock-file slots, as for password hashing), each for a bounded time.
+Without a free slot a request is answered at once with Retry-After, and the
+client simply polls. SERVER_MODE=asgi holds feed requests on the event loop
+instead, where they cost no worker.
+"""
+import time
+
+from sqlalchemy import Select, bindparam, delete, insert
+
+from app.models import Task, TaskChange
+from app.utils.slots import SlotLock, fcntl, slot_dir
+from . import repository
+from .repository import _cached
+from .services import TASK_FIELDS, format_due_date
+
+retain_versions = 1000
+page_size = 500
+max_wait_seconds = 20.0
+poll_seconds = 1.0
+stream_seconds = 20.0
+heartbeat_seconds = 15.0
+retry_after = 5
+hold_slots = None
+
+def init_changes(config, hold=True):
+    """
+    Read the TASK_CHANGES_* settings. ``hold=False`` (the ASGI app) skips the
+    host-wide hold slots.
+    """
+    global retain_versions, page_size, max_wait_seconds, poll_seconds, stream_seconds, heartbeat_seconds
+    global retry_after, hold_slots
+    retain_versions = config.get('TASK_CHANGES_RETAIN_VERSIONS', 1000)
+    page_size = max(1, config.get('TASK_CHANGES_PAGE_SIZE', 500))
+    max_wait_seconds = config.get('TASK_CHANGES_MAX_WAIT_SECONDS', 20.0)
+    poll_seconds = max(0.05, config.get('TASK_CHANGES_POLL_SECONDS', 1.0))
+    stream_seconds = config.get('TASK_CHANGES_STREAM_SECONDS', 20.0)
+    heartbeat_seconds = config.get('TASK_CHANGES_HEARTBEAT_SECONDS', 15.0)
+    retry_after = config.get('TASK_CHANGES_RETRY_AFTER', 5)
+    hold_slots = None
+    slots = config.get('TASK_CHANGES_HOLD_SLOTS', 0)
+    if hold and slots and fcntl is not None:
+        hold_slots = SlotLock(slot_dir(config, 'TASK_CHANGES_SLOT_DIR'), slots,
+                              name='task-changes-slot')
+
+
+def try_hold():
+    # True when this request may be held open; release with release_hold()
+    return max_wait_seconds > 0 and (hold_slots is None or hold_slots.try_acquire())
+
+def release_hold():
+    if hold_slots is not None:
+        hold_slots.release()
+
+
+def log_task_changes(session, owner_id, version, changes):
+    """
+    Append ``(task_id, op)`` pairs for the write that bumped ``owner_id`` to
+    ``version``, inside the session's transaction. A task touched several
+    times by one write is logged once, with its last op.
+    """
+    ops = {}
+    for task_id, op in changes:
+        ops[task_id] = op
+    if not ops:
+        return
+    conn = session.connection()
+    conn.execute(insert(TaskChange), [{'owner_id': owner_id, 'version': version, 'task_id': task_id, 'op': op}
+                                      for task_id, op in ops.items()])
+    if retain_versions and version % 100 == 0:
+        conn.execute(delete(TaskChange).where(TaskChange.owner_id == owner_id,
+                                              TaskChange.version <= version - retain_versions))
+
+
+def parse_since(value):
+    """
+    The ``since`` version, or None when absent. Raises ValueError with a
+    client-facing message.
+    """
+    if value is None or value == '':
+        return None
+    try:
+        since = int(value)
+    except ValueError:
+        raise ValueError("'since' must be a non-negative integer.")
+    if since < 0:
+        raise ValueError("'since' must be a non-negative integer.")
+    return since
+
+
+def parse_wait(value):
+    try:
+        wait = float(value or 0)
+    except ValueError:
+        raise ValueError("'wait' must be a number of seconds.")
+    return min(max(0.0, wait), max_wait_seconds)
+
+
+def _read_statements():
+    def build():
+        log = (Select(TaskChange.version, TaskChange.task_id, TaskChange.op)
+               .where(TaskChange.owner_id == bindparam('owner_id'), TaskChange.version > bindparam('since'))
+               .order_by(TaskChange.version, TaskChange.task_id)
+               .limit(bindparam('limit')))
+        one_version = (Select(TaskChange.version, TaskChange.task_id, TaskChange.op)
+                       .where(TaskChange.owner_id == bindparam('owner_id'), TaskChange.version == bindparam('version'))
+                       .order_by(TaskChange.task_id))
+        tasks = (Select(*[getattr(Task, name) for name in TASK_FIELDS])
+                 .where(Task.owner_id == bindparam('owner_id'), Task.id.in_(bindparam('ids', expanding=True))))
+        return log, one_version, tasks
+    return _cached(('changes',), build)
+
+
+def read_changes(conn, owner_id, since):
+    """
+    One page of ``owner_id``'s changes after version ``since``:
+    ``{'changes': [...], 'next': version, 'more': bool, 'reset': bool}``.
+    A page never splits a write; ``more`` means another page is ready now.
+    """
+    current = repository.tasks_version(conn, owner_id)
+    if since == current:
+        return {'changes': [], 'next': current, 'more': False, 'reset': False}
+    log, one_version, tasks = _read_statements()
+    rows = [] if since is None or since > current else \
+        conn.execute(log, {'owner_id': owner_id, 'since': since, 'limit': page_size + 1}).all()
+    if not rows or rows[0].version != since + 1:
+        # The log doesn't reach back to ``since``: start over from the list
+        return {'changes': [], 'next': current, 'more': False, 'reset': True}
+    if len(rows) > page_size:
+        complete = [row for row in rows if row.version != rows[-1].version]
+        rows = complete or conn.execute(one_version, {'owner_id': owner_id, 'version': rows[0].version}).all()
+
+    ops = {}
+    for _, task_id, op in rows:
+        # Created within this page stays a create unless it is gone again
+        if ops.get(task_id) != 'create' or op == 'delete':
+            ops[task_id] = op
+    ids = [task_id for task_id, op in ops.items() if op != 'delete']
+    found = {row.id: row for row in conn.execute(tasks, {'owner_id': owner_id, 'ids': ids})} if ids else {}
+    changes = []
+    for task_id, op in ops.items():
+        row = found.get(task_id)
+        if row is None:
+            # Deleted since, possibly by a write after this page; the delete is what the client needs
+            changes.append({'id': task_id, 'op': 'delete'})
+        else:
+            task = dict(zip(TASK_FIELDS, row))
+            task['due_date'] = format_due_date(task['due_date'])
+            changes.append({'id': task_id, 'op': op, 'task': task})
+    next_version = rows[-1].version
+    return {'changes': changes, 'next': next_version, 'more': next_version < current, 'reset': False}
+
+
+def wait_for_change(read_version, since, seconds):
+    """
+    Poll ``read_version()`` every poll_seconds until it moves past ``since``
+    or ``seconds`` run out; True when it moved.
+    """
+    deadline = time.monotonic() + seconds
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        time.sleep(min(poll_seconds, remaining))
+        if read_version() != since:
+            return True
+
+
+def sse_event(page, dumps):
+    # One SSE event per page; the id is what EventSource sends back as Last-Event-ID
+    name = 'reset' if page['reset'] else 'changes'
+    return f"id: {page['next']}\nevent: {name}\ndata: {dumps(page)}\n\n"
@@ -0,0 +1,141 @@
+# app/tasks/repository.py
+"""
+Read path for tasks: Core tuple queries on a read-only connection, never ORM
+instances, so reads skip the identity map, change tracking and relationship
+loading.
+
+Statements are built once per query shape with bind parameters and reused
+(TASKS_STATEMENT_CACHE). A reused statement keeps its memoized cache key, so
+SQLAlchemy goes straight to the compiled SQL instead of rebuilding and
+re-keying the Select on every request.
+"""
+import operator
+from contextlib import contextmanager
+
+from sqlalchemy import Select, bindparam
+
+from app import db_session
+from app.models import Task, User
+from .services import TASK_FIELDS
+
+# Optional list filters: (params key, column, comparison)
+_LIST_FILTERS = (
+    ('cursor', Task.id, operator.gt),
+    ('completed', Task.completed, operator.eq),
+    ('due_after', Task.due_date, operator.ge),
+    ('due_before', Task.due_date, operator.le),
+    ('location', Task.location, operator.eq),
+)
+
+_statements = {}
+cache_statements = True
+
+def init_statement_cache(config):
+    global cache_statements
+    cache_statements = config.get('TASKS_STATEMENT_CACHE', True)
+    _statements.clear()
+
+
+def _cached(key, build):
+    if not cache_statements:
+        return build()
+    statement = _statements.get(key)
+    if statement is None:
+        # Shapes are finite (column subsets x filter combinations); a racing build is harmless
+        statement = _statements[key] = build()
+    return statement
+
+
+def _read_only_options(dialect):
+    # psycopg2 runs the transaction as READ ONLY; other drivers have no equivalent option
+    if dialect.name == 'postgresql' and dialect.driver == 'psycopg2':
+        return {'postgresql_readonly': True}
+    return {}
+
+
+@contextmanager
+def read_connection():
+    """
+    A pooled connection for reads, on the engine db_session picks: a replica
+    inside replica_reads(), the primary otherwise. Its transaction is
+    read-only where the driver supports it and is rolled back on exit.
+    """
+    with db_session.get_bind().connect() as conn:
+        options = _read_only_options(conn.dialect)
+        if options:
+            conn.execution_options(**options)
+        yield conn
+
+
+def list_columns(fields):
+    # Columns a list response needs: id for the cursor, location for weather
+    fields = fields or TASK_FIELDS
+    columns = {'id'} | {field for field in fields if field != 'weather'}
+    if 'weather' in fields:
+        columns.add('location')
+    return tuple(name for name in TASK_FIELDS if name in columns)
+
+
+def list_tasks_statement(owner_id, params):
+    """
+    Keyset-paginated list query for ``params`` (see parse_list_params) and its
+    bind parameters. One extra row tells the caller whether another page exists.
+    """
+    columns = list_columns(params['fields'])
+    filters = tuple(key for key, _, _ in _LIST_FILTERS if params[key] is not None and params[key] != '')
+
+    def build():
+        query = Select(*[getattr(Task, name) for name in columns]).where(Task.owner_id == bindparam('owner_id'))
+        for key, column, compare in _LIST_FILTERS:
+            if key in filters:
+                query = query.where(compare(column, bindparam(key)))
+        return query.order_by(Task.id).limit(bindparam('limit'))
+
+    statement = _cached(('list', columns, filters), build)
+    bind = {key: params[key] for key in filters}
+    bind.update(owner_id=owner_id, limit=params['limit'] + 1)
+    return statement, bind
+
+
+def get_task_statement(owner_id, task_id):
+    statement = _cached(('get',), lambda: Select(*[getattr(Task, name) for name in TASK_FIELDS])
+                        .where(Task.owner_id == bindparam('owner_id'), Task.id == bindparam('task_id')))
+    return statement, {'owner_id': owner_id, 'task_id': task_id}
+
+
+def tasks_version_statement(owner_id):
+    statement = _cached(('tasks_version',), lambda: Select(User.tasks_version)
+                        .where(User.id == bindparam('owner_id')))
+    return statement, {'owner_id': owner_id}
+
+
+def export_statement(owner_id, batch_size):
+    statement = _cached(('export', batch_size), lambda: Select(*[getattr(Task, name) for name in TASK_FIELDS])
+                        .where(Task.owner_id == bindparam('owner_id'))
+                        .order_by(Task.id)
+                        .execution_options(yield_per=batch_size))
+    return statement, {'owner_id': owner_id}
+
+
+def tasks_version(conn, owner_id):
+    return conn.scalar(*tasks_version_statement(owner_id)) or 0
+
+
+def list_tasks(conn, owner_id, params):
+    """
+    Return ``(columns, rows)`` for one page; rows are plain tuples in ``columns`` order.
+    """
+    result = conn.execute(*list_tasks_statement(owner_id, params))
+    return list(result.keys()), result.all()
+
+
+def get_task(conn, owner_id, task_id):
+    return conn.execute(*get_task_statement(owner_id, task_id)).first()
+
+
+def export_batches(conn, owner_id, batch_size):
+    """
+    Return ``(columns, partitions)``; rows are fetched ``batch_size`` at a time.
+    """
+    result = conn.execute(*export_statement(owner_id, batch_size))
+    return list(result.keys()), result.partitions()
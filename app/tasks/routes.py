@@ -1,12 +1,36 @@
-from flask import Blueprint, request, jsonify, abort
-from sqlalchemy import Select
+import time
+from datetime import date
+from flask import Blueprint, Response, request, jsonify, abort, current_app, stream_with_context
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
 
 from app import db_session
-from app.models import Task
+from app.database import mark_written, replica_reads
+from app.models import Task, User
 from app.auth.services import validate_token
-from .services import add_tasks_new, bool_cleaner
+from app.jobs import enqueue_weather
+from app.instrumentation import phase
+from . import bulk, cache, changes, repository, search, stats, writes
+from .services import (add_tasks_new, encode_task_rows, fetch_weather_batch,
+                       format_due_date, parse_list_params, task_list_json, tasks_etag,
+                       weather_settled, TASK_FIELDS)
 tasks_bp = Blueprint('tasks_bp', __name__, url_prefix='/tasks')
 
+def bump_tasks_version(session, owner_id):
+    # Part of the caller's transaction, so readers never see new data with an old ETag
+    version = session.scalar(update(User).where(User.id == owner_id)
+                             .values(tasks_version=User.tasks_version + 1).returning(User.tasks_version))
+    # The writer reads its own changes from the primary until replicas have caught up
+    mark_written(session, owner_id)
+    # Entries under the old version are unreachable once this commits; free them now
+    cache.task_cache.invalidate(owner_id)
+    return version
+
+def not_modified(etag):
+    response = Response(status=304)
+    response.set_etag(etag)
+    return response
+
 #CRUD OPERATION LOGIC
 #Define Tasks App Get Route
 @tasks_bp.route("/")
@@ -14,21 +38,221 @@ tasks_bp = Blueprint('tasks_bp', __name__, url_prefix='/tasks')
 @tasks_bp.route("/<int:id>")
 @validate_token
 def displayTasks(current_userid, id=None):
-    session = db_session()
-    if id == None:
-        queryallusertasks = Select(Task).where(Task.owner_id == current_userid)
-        allTasks = session.scalars(queryallusertasks).all()
-        tasks_array = []
-        for i in allTasks:
-            tasks_array.append(add_tasks_new(i))
-        return jsonify(tasks_array)
+    # Reads go through the repository: tuple rows on a read-only connection (a replica when
+    # configured), no ORM instances
+    with replica_reads(current_userid), repository.read_connection() as conn:
+        if id == None:
+            return list_tasks_response(conn, current_userid)
+        return get_task_response(conn, current_userid, id)
+
+def list_tasks_response(conn, current_userid):
+    tasks_version = repository.tasks_version(conn, current_userid)
+    try:
+        params = parse_list_params(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    fields = params['fields']
+    with_weather = fields is None or 'weather' in fields
+    etag = tasks_etag(current_userid, tasks_version, request.full_path, with_weather)
+    if request.if_none_match.contains(etag):
+        return not_modified(etag)
+    body = cache.task_cache.get(etag)
+    if body is not None:
+        return json_body_response(body, etag, tasks_version)
+
+    columns, allTasks = repository.list_tasks(conn, current_userid, params)
+    next_cursor = None
+    if len(allTasks) > params['limit']:
+        allTasks = allTasks[:params['limit']]
+        next_cursor = str(allTasks[-1].id)
+
+    weather_map = {}
+    if with_weather:
+        # One concurrent lookup per distinct city instead of one serial call per task
+        weather_map = fetch_weather_batch(task.location for task in allTasks)
+    # Rows are encoded straight to JSON text; no per-task dicts
+    with phase('serialize'):
+        body = task_list_json(allTasks, columns, fields, weather_map, next_cursor)
+    cache.task_cache.put(current_userid, etag, body, weather_map)
+    return json_body_response(body, etag if weather_settled(weather_map) else None, tasks_version)
+
+def json_body_response(body, etag, tasks_version=None):
+    response = current_app.response_class(body, mimetype='application/json')
+    if etag is not None:
+        response.set_etag(etag)
+    if tasks_version is not None:
+        # Where a change feed client continues from (/tasks/changes?since=)
+        response.headers['X-Tasks-Version'] = str(tasks_version)
+    return response
+
+def get_task_response(conn, current_userid, id):
+    tasks_version = repository.tasks_version(conn, current_userid)
+    etag = tasks_etag(current_userid, tasks_version, request.full_path, True)
+    if request.if_none_match.contains(etag):
+        return not_modified(etag)
+    body = cache.task_cache.get(etag)
+    if body is not None:
+        return json_body_response(body, etag)
+    task = repository.get_task(conn, current_userid, id)
+    if task:
+        weather_map = fetch_weather_batch([task.location]) if task.location is not None else {}
+        body = current_app.json.dumps(add_tasks_new(task, weather_map)) + "\n"
+        cache.task_cache.put(current_userid, etag, body, weather_map)
+        return json_body_response(body, etag if weather_settled(weather_map) else None)
     else:
-        queryselectusertask = Select(Task).where(Task.owner_id == current_userid and Task.id == id)
-        task = session.scalars(queryselectusertask).first()
-        if task:
-            return jsonify(add_tasks_new(task))
-        else:
-            abort(404)
+        abort(404)
+
+#FULL-TEXT SEARCH
+@tasks_bp.route("/search")
+@validate_token
+def search_tasks(current_userid):
+    # Ranked matches on the description, best first; the last word in q also matches as a prefix.
+    # Takes the list endpoint's limit/fields/filters; the cursor is the offset of the next page
+    try:
+        terms = search.parse_search_terms(request.args.get('q'))
+        params = parse_list_params(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    fields = params['fields']
+    with_weather = fields is None or 'weather' in fields
+    with replica_reads(current_userid), repository.read_connection() as conn:
+        tasks_version = repository.tasks_version(conn, current_userid)
+        etag = tasks_etag(current_userid, tasks_version, request.full_path, with_weather)
+        if request.if_none_match.contains(etag):
+            return not_modified(etag)
+        columns, matches = search.search_tasks(conn, current_userid, terms, params)
+
+    next_cursor = None
+    if len(matches) > params['limit']:
+        matches = matches[:params['limit']]
+        next_cursor = str((params['cursor'] or 0) + params['limit'])
+    weather_map = fetch_weather_batch(task.location for task in matches) if with_weather else {}
+    with phase('serialize'):
+        body = task_list_json(matches, columns, fields, weather_map, next_cursor)
+    return json_body_response(body, etag if weather_settled(weather_map) else None)
+
+#STATISTICS
+@tasks_bp.route("/stats")
+@validate_token
+def task_stats(current_userid):
+    # Counts from the incrementally maintained summary; cost independent of the user's task count
+    today = date.today()
+    with replica_reads(current_userid), repository.read_connection() as conn:
+        tasks_version = repository.tasks_version(conn, current_userid)
+        # Overdue and this week's counts move with the date as well as with writes
+        etag = tasks_etag(current_userid, tasks_version, f"{request.full_path}:{today.isoformat()}", False)
+        if request.if_none_match.contains(etag):
+            return not_modified(etag)
+        counts = stats.read_stats(conn, current_userid, today)
+    response = jsonify(dict(counts, date=today.isoformat()))
+    response.set_etag(etag)
+    return response
+
+#CHANGE FEED
+def read_changes(current_userid, since):
+    with replica_reads(current_userid), repository.read_connection() as conn:
+        return changes.read_changes(conn, current_userid, since)
+
+def read_tasks_version(current_userid):
+    with replica_reads(current_userid), repository.read_connection() as conn:
+        return repository.tasks_version(conn, current_userid)
+
+@tasks_bp.route("/changes")
+@validate_token
+def task_changes(current_userid):
+    # Long-poll: answers at once when there are changes, otherwise holds up to ``wait`` seconds
+    try:
+        since = changes.parse_since(request.args.get('since'))
+        wait = changes.parse_wait(request.args.get('wait'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    page = read_changes(current_userid, since)
+    if page['changes'] or page['reset'] or not wait:
+        return jsonify(page)
+    if not changes.try_hold():
+        # Every hold slot is taken; the client polls again instead
+        return jsonify(page), 200, {'Retry-After': str(changes.retry_after)}
+    try:
+        with phase('wait'):
+            moved = changes.wait_for_change(lambda: read_tasks_version(current_userid), since, wait)
+    finally:
+        changes.release_hold()
+    return jsonify(read_changes(current_userid, since) if moved else page)
+
+@tasks_bp.route("/changes/stream")
+@validate_token
+def task_change_stream(current_userid):
+    # Server-Sent Events for up to TASK_CHANGES_STREAM_SECONDS; EventSource reconnects with Last-Event-ID
+    try:
+        since = changes.parse_since(request.args.get('since', request.headers.get('Last-Event-ID')))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    dumps = current_app.json.dumps
+
+    def generate():
+        # Taken here, not in the view, so the finally below always runs once it is held
+        held = changes.try_hold()
+        position = since
+        try:
+            # Without a hold slot: send what is pending and have the client reconnect later
+            yield f"retry: {1000 if held else changes.retry_after * 1000}\n\n"
+            deadline = time.monotonic() + changes.stream_seconds
+            quiet_since = time.monotonic()
+            while True:
+                page = read_changes(current_userid, position)
+                while page['changes'] or page['reset']:
+                    yield changes.sse_event(page, dumps)
+                    quiet_since = time.monotonic()
+                    position = page['next']
+                    if not page['more']:
+                        break
+                    page = read_changes(current_userid, position)
+                if not held or time.monotonic() >= deadline:
+                    return
+                if changes.wait_for_change(lambda: read_tasks_version(current_userid), position,
+                                           min(changes.heartbeat_seconds, deadline - time.monotonic())):
+                    continue
+                if time.monotonic() - quiet_since >= changes.heartbeat_seconds:
+                    # Keeps proxies from timing the stream out; a dead client surfaces here too
+                    yield ": keepalive\n\n"
+                    quiet_since = time.monotonic()
+        finally:
+            if held:
+                changes.release_hold()
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+#STREAMING EXPORT
+@tasks_bp.route("/export")
+@validate_token
+def export_tasks(current_userid):
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'json'):
+        return jsonify({"error": "Invalid 'format'. Must be ndjson or json."}), 400
+    with_weather = request.args.get('weather', 'false').lower() == 'true'
+    batch_size = current_app.config.get('TASKS_EXPORT_BATCH_SIZE', 500)
+
+    def generate():
+        # Rows are pulled from the cursor one batch at a time, so memory stays flat
+        first = True
+        if export_format == 'json':
+            yield '['
+        with replica_reads(current_userid), repository.read_connection() as conn:
+            columns, batches = repository.export_batches(conn, current_userid, batch_size)
+            for batch in batches:
+                weather_map = fetch_weather_batch(row.location for row in batch) if with_weather else {}
+                encoded = encode_task_rows(batch, columns, None if with_weather else TASK_FIELDS, weather_map)
+                if export_format == 'json':
+                    yield ('' if first else ',') + ','.join(encoded)
+                    first = False
+                else:
+                    yield '\n'.join(encoded) + '\n'
+        if export_format == 'json':
+            yield ']'
+
+    mimetype = 'application/x-ndjson' if export_format == 'ndjson' else 'application/json'
+    return Response(stream_with_context(generate()), mimetype=mimetype)
 
 #POST METHOD
 @tasks_bp.route("/tasks/", methods=['post'])
@@ -36,30 +260,36 @@ def displayTasks(current_userid, id=None):
 def add_new_task(current_userid):
     session = db_session()
     new_task = request.get_json()
-    if new_task and 'location' in new_task:
-        task = Task()
-        task.id=int(new_task['id'])
-        task.description=new_task['description']
-        task.completed = bool_cleaner(new_task['completed'])
-        task.due_date=new_task['due_date']
-        task.location=new_task['location']
-        task.owner_id = current_userid
-        session.add(task)
+    if not new_task:
+        abort(404)
+    try:
+        task = writes.create_task(session, current_userid, new_task, bump_tasks_version)
         session.commit()
-        return 'POST CREATED', 201
-    elif new_task:
-        task = Task()
-        task.id=int(new_task['id'])
-        task.description=new_task['description']
-        task.completed = bool_cleaner(new_task['completed'])
-        task.due_date=new_task['due_date']
-        task.location=None
-        task.owner_id = current_userid
-        session.add(task)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except IntegrityError as e:
+        session.rollback()
+        return jsonify({"error": f"Task not created: {e.orig}"}), 409
+    enqueue_weather(task.location)
+    return 'POST CREATED', 201
+
+#BULK CREATE/UPDATE/DELETE
+@tasks_bp.route("/bulk", methods=['post'])
+@validate_token
+def bulk_tasks(current_userid):
+    session = db_session()
+    try:
+        results, locations = bulk.run_bulk(session, current_userid, request.get_json(silent=True),
+                                           current_app.config.get('TASKS_BULK_MAX_ITEMS', 1000),
+                                           bump_tasks_version)
         session.commit()
-        return 'POST CREATED', 201
-    else:
-        abort(404)
+    except bulk.BulkRejected as e:
+        return jsonify({"error": str(e)}), e.status
+    except IntegrityError as e:
+        session.rollback()
+        return jsonify({"error": f"Bulk request rejected, no changes applied: {e.orig}"}), 409
+    enqueue_weather(*locations)
+    return jsonify(results), 200
 
 #UPDATE METHOD
 @tasks_bp.route("/tasks/<int:id>", methods=['put'])
@@ -67,35 +297,20 @@ def add_new_task(current_userid):
 def update_task(current_userid,id):
     session = db_session()
     new_task = request.get_json()
-    if new_task:
-        task = session.get(Task, id)
-        if task:
-            if 'description' in new_task and new_task['description'] != task.description:
-                task.description = new_task['description']
-            if 'completed' in new_task:
-                base_completed = new_task['completed']
-                if isinstance(base_completed, bool) and base_completed != task.completed:
-                    task.completed = base_completed
-                elif isinstance(base_completed, str):
-                    if base_completed.lower() == 'true' and not task.completed:
-                        task.completed = True
-                        print("Converted Completed From String")
-                    elif base_completed.lower() == 'false' and task.completed:
-                        task.completed = False
-                        print("Converted Completed From String")
-                    else:
-                        return jsonify({"error": "Invalid value for 'completed'. Must be true or false."}), 400
-            if 'due_date' in new_task and new_task['due_date'] != task.due_date:
-                task.due_date = new_task['due_date']
-            if 'location' in new_task and new_task['location'] != task.location:
-                task.location = new_task['location']
-            session.commit()
-            return jsonify({"id": task.id,
-                            "description": task.description,
-                            "completed": task.completed,
-                            "due_date": task.due_date})             
-        else:
-            abort(404)
+    if not new_task:
+        abort(404)
+    try:
+        task = writes.update_task(session, current_userid, id, new_task, bump_tasks_version)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if task is None:
+        abort(404)
+    session.commit()
+    enqueue_weather(task.location)
+    return jsonify({"id": task.id,
+                    "description": task.description,
+                    "completed": task.completed,
+                    "due_date": format_due_date(task.due_date)})
 
 #DELETE METHOD
 @tasks_bp.route("/tasks/<int:id>", methods=['delete'])
@@ -108,9 +323,11 @@ def delet_task(current_userid,id):
         abort(404)
     if new_task:
         db_obj = session.get(Task, id)
-        if db_obj:
+        if db_obj and db_obj.owner_id == current_userid:
             session.delete(db_obj)
+            version = bump_tasks_version(session, current_userid)
+            stats.record_task_changes(session, current_userid, removed=[stats.task_state(db_obj.completed, db_obj.due_date)])
+            changes.log_task_changes(session, current_userid, version, [(id, 'delete')])
             session.commit()
             return 'No Content', 204
-    else:
-        abort(404)
\ No newline at end of file
+    abort(404)
\ No newline at end of file
@@ -0,0 +1,157 @@
+# app/tasks/search.py
+"""
+Full-text search over task descriptions.
+
+- SQLite: an external-content FTS5 table ``task_search`` over task_data
+  (description, owner_id), kept in sync by triggers. owner_id is indexed as
+  a token, so a user's matches come from the index instead of a scan of
+  every user's hits. Ranked by bm25 on the description.
+- Postgres: a generated ``search_vector`` tsvector column with a GIN index,
+  ranked by ts_rank; the owner filter uses the (owner_id, id) index.
+
+Both are maintained by the database on every insert, update and delete,
+including bulk writes. All words of a query must match; the last one also
+matches as a prefix (search as you type), the others as whole words, which
+keeps multi-word queries off FTS5's expensive prefix expansion.
+"""
+import re
+import unicodedata
+
+from sqlalchemy import Select, bindparam, column, func, literal_column, table, text
+
+from app.models import Task
+from .repository import _LIST_FILTERS, _cached, list_columns
+
+MAX_TERMS = 8
+_WORD = re.compile(r"\w+")
+
+_SQLITE_TRIGGERS = (
+    """CREATE TRIGGER IF NOT EXISTS task_search_insert AFTER INSERT ON task_data BEGIN
+           INSERT INTO task_search (rowid, description, owner_id) VALUES (new.id, new.description, new.owner_id);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS task_search_delete AFTER DELETE ON task_data BEGIN
+           INSERT INTO task_search (task_search, rowid, description, owner_id)
+           VALUES ('delete', old.id, old.description, old.owner_id);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS task_search_update AFTER UPDATE OF description, owner_id ON task_data BEGIN
+           INSERT INTO task_search (task_search, rowid, description, owner_id)
+           VALUES ('delete', old.id, old.description, old.owner_id);
+           INSERT INTO task_search (rowid, description, owner_id) VALUES (new.id, new.description, new.owner_id);
+       END""",
+)
+
+_POSTGRES_INDEX = "CREATE INDEX IF NOT EXISTS ix_task_data_search_vector ON task_data USING GIN (search_vector)"
+
+
+def create_search_index(conn):
+    """
+    Create and populate the text index (migration 5).
+    """
+    if conn.dialect.name == 'postgresql':
+        conn.execute(text("ALTER TABLE task_data ADD COLUMN IF NOT EXISTS search_vector tsvector "
+                          "GENERATED ALWAYS AS (to_tsvector('simple', coalesce(description, ''))) STORED"))
+        conn.execute(text(_POSTGRES_INDEX))
+        return
+    # prefix='2 3': short prefixes ("ca*") read a prefix index instead of expanding every term
+    conn.execute(text("CREATE VIRTUAL TABLE IF NOT EXISTS task_search USING fts5("
+                      "description, owner_id, content='task_data', content_rowid='id', "
+                      "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"))
+    for trigger in _SQLITE_TRIGGERS:
+        conn.execute(text(trigger))
+    conn.execute(text("INSERT INTO task_search (task_search) VALUES ('rebuild')"))
+
+
+def suspend_search_index(conn):
+    """
+    Stop maintaining the index for a bulk load (seed.py); restore_search_index
+    rebuilds it in one pass afterwards, which is far cheaper than row by row.
+    """
+    if conn.dialect.name == 'postgresql':
+        conn.execute(text("DROP INDEX IF EXISTS ix_task_data_search_vector"))
+        return
+    for name in ('insert', 'delete', 'update'):
+        conn.execute(text(f"DROP TRIGGER IF EXISTS task_search_{name}"))
+
+
+def restore_search_index(conn):
+    if conn.dialect.name == 'postgresql':
+        conn.execute(text(_POSTGRES_INDEX))
+        return
+    for trigger in _SQLITE_TRIGGERS:
+        conn.execute(text(trigger))
+    conn.execute(text("INSERT INTO task_search (task_search) VALUES ('rebuild')"))
+
+
+def _words(text):
+    # The FTS5 tokenizer's view of text: lowercase \w+ runs with diacritics removed
+    text = text.lower()
+    if not text.isascii():
+        text = ''.join(char for char in unicodedata.normalize('NFKD', text) if not unicodedata.combining(char))
+    return _WORD.findall(text)
+
+
+def parse_search_terms(q):
+    """
+    Split the ``q`` parameter into lowercase word terms. Raises ValueError
+    with a client-facing message.
+    """
+    terms = _words(q or '')
+    if not terms:
+        raise ValueError("'q' must contain at least one word.")
+    if len(terms) > MAX_TERMS:
+        raise ValueError(f"'q' may contain at most {MAX_TERMS} words.")
+    return terms
+
+
+def match_expression(dialect_name, owner_id, terms):
+    # Terms are \w+ only, so they are safe inside either query syntax
+    if dialect_name == 'postgresql':
+        return ' & '.join(terms[:-1] + [f"{terms[-1]}:*"])
+    phrases = ' '.join([f'"{term}"' for term in terms[:-1]] + [f'"{terms[-1]}"*'])
+    return f'owner_id:"{int(owner_id)}" AND description:({phrases})'
+
+
+def _build_search(dialect_name, columns, filters):
+    query = Select(*[getattr(Task, name) for name in columns]).where(Task.owner_id == bindparam('owner_id'))
+    if dialect_name == 'postgresql':
+        vector = literal_column('task_data.search_vector')
+        tsquery = func.to_tsquery('simple', bindparam('match'))
+        query = query.where(vector.op('@@')(tsquery))
+        order = (func.ts_rank(vector, tsquery).desc(), Task.id)
+    else:
+        task_search = table('task_search', column('rowid'))
+        query = query.select_from(task_search.join(Task.__table__, Task.id == task_search.c.rowid)) \
+                     .where(literal_column('task_search').op('MATCH')(bindparam('match')))
+        # bm25 weights per FTS column: description counts, the owner token does not
+        order = (func.bm25(literal_column('task_search'), 1.0, 0.0), Task.id)
+    for key, col, compare in _LIST_FILTERS:
+        if key in filters:
+            query = query.where(compare(col, bindparam(key)))
+    return query.order_by(*order).limit(bindparam('limit')).offset(bindparam('offset'))
+
+
+def search_statement(dialect_name, owner_id, terms, params):
+    """
+    Ranked search query for ``terms`` and its bind parameters. ``params``
+    comes from parse_list_params; its cursor is the offset of the page and
+    the other list filters apply as usual. One extra row tells the caller
+    whether another page exists.
+    """
+    columns = list_columns(params['fields'])
+    filters = tuple(key for key, _, _ in _LIST_FILTERS
+                    if key != 'cursor' and params[key] is not None and params[key] != '')
+    statement = _cached(('search', dialect_name, columns, filters),
+                        lambda: _build_search(dialect_name, columns, filters))
+    bind = {key: params[key] for key in filters}
+    bind.update(match=match_expression(dialect_name, owner_id, terms), owner_id=owner_id,
+                limit=params['limit'] + 1, offset=max(0, params['cursor'] or 0))
+    return statement, bind
+
+
+def search_tasks(conn, owner_id, terms, params):
+    """
+    Return ``(columns, rows)`` for one page of ``owner_id``'s tasks matching
+    ``terms``, best match first.
+    """
+    result = conn.execute(*search_statement(conn.dialect.name, owner_id, terms, params))
+    return list(result.keys()), result.all()
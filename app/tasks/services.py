@@ -1,22 +1,306 @@
-import apiUtil
-from flask import jsonify
+import hashlib
+import json
+import threading
+import time
+from datetime import date
+from json.encoder import encode_basestring_ascii
+from concurrent.futures import ThreadPoolExecutor, wait
+from flask import current_app
 
-def add_tasks_new(obj):
+from app import db_session
+from app import jobs
+from app.instrumentation import timed
+from app.jobs import WEATHER_PENDING
+from app.utils import api_clients
+
+# Returned in place of a weather report when the lookup failed or missed the request deadline
+WEATHER_UNAVAILABLE = "unavailable"
+
+_weather_executor = None
+_weather_executor_lock = threading.Lock()
+
+def _get_weather_executor():
+    # Created lazily so every gunicorn worker gets its own threads after fork
+    global _weather_executor
+    if _weather_executor is None:
+        with _weather_executor_lock:
+            if _weather_executor is None:
+                _weather_executor = ThreadPoolExecutor(
+                    max_workers=current_app.config.get('WEATHER_MAX_WORKERS', 8),
+                    thread_name_prefix='weather')
+    return _weather_executor
+
+@timed('weather')
+def fetch_weather_batch(locations):
+    """
+    Look up the weather for every distinct location concurrently and return a
+    {location: weather} map. Lookups that fail or are still running when the
+    per-request deadline expires map to WEATHER_UNAVAILABLE. When background
+    weather jobs are enabled, misses are read from weather_reports instead and
+    locations without a report yet map to WEATHER_PENDING.
+    """
+    distinct_locations = {location for location in locations if location}
+    weather_jobs = jobs.weather_jobs
+    weather_map = {}
+    missing_locations = []
+    for location in distinct_locations:
+        found, weather = api_clients.weather_cache.lookup(location, revalidate=weather_jobs is None)
+        if found:
+            weather_map[location] = weather
+        else:
+            missing_locations.append(location)
+    if not missing_locations:
+        return weather_map
+
+    if weather_jobs is not None:
+        # Background jobs own the upstream calls; reads only join against stored reports
+        stored = weather_jobs.stored_reports(db_session(), missing_locations)
+        for location in missing_locations:
+            if location in stored:
+                weather_map[location] = stored[location]
+            else:
+                weather_map[location] = WEATHER_PENDING
+                weather_jobs.enqueue(location)
+        return weather_map
+
+    deadline = current_app.config.get('WEATHER_DEADLINE_SECONDS', 2.0)
+    executor = _get_weather_executor()
+    futures = {executor.submit(api_clients.weather_cache.get, location): location
+               for location in missing_locations}
+    done, not_done = wait(futures, timeout=deadline)
+    for future in not_done:
+        future.cancel()
+
+    for future, location in futures.items():
+        if future in done and future.exception() is None:
+            weather_map[location] = future.result()
+        else:
+            weather_map[location] = WEATHER_UNAVAILABLE
+    return weather_map
+
+def parse_due_date(value, field='due_date'):
+    # Dates travel as YYYY-MM-DD strings and are stored in a DATE column
+    if value is None or value == '':
+        return None
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid '{field}'. Expected YYYY-MM-DD.")
+
+def format_due_date(value):
+    return value.isoformat() if isinstance(value, date) else value
+
+def add_tasks_new(obj, weather_map=None):
     if obj.location == None:
         return({"id": obj.id,
                     "description": obj.description,
                     "completed": obj.completed,
-                    "due_date": obj.due_date})
+                    "due_date": format_due_date(obj.due_date)})
     else:
-        weather = apiUtil.get_weather_status(obj.location)
+        if weather_map is None:
+            weather_map = fetch_weather_batch([obj.location])
+        weather = weather_map.get(obj.location, WEATHER_UNAVAILABLE)
         return({"id": obj.id,
                     "description": obj.description,
                     "completed": obj.completed,
-                    "due_date": obj.due_date,
+                    "due_date": format_due_date(obj.due_date),
                     "location": obj.location,
                     "weather": weather})
 
+# Columns a client may request with ?fields=, plus the computed weather field
+TASK_FIELDS = ('id', 'description', 'completed', 'due_date', 'location')
+PROJECTABLE_FIELDS = TASK_FIELDS + ('weather',)
+
+def parse_list_params(args, config=None):
+    """
+    Validate the pagination, filter and projection query parameters of the
+    task list endpoint. Raises ValueError with a client-facing message.
+    """
+    config = config if config is not None else current_app.config
+    params = {}
+
+    limit = args.get('limit', config.get('TASKS_PAGE_DEFAULT_LIMIT', 100))
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise ValueError("'limit' must be an integer.")
+    if limit < 1:
+        raise ValueError("'limit' must be at least 1.")
+    params['limit'] = min(limit, config.get('TASKS_PAGE_MAX_LIMIT', 500))
+
+    cursor = args.get('cursor')
+    if cursor:
+        try:
+            params['cursor'] = int(cursor)
+        except ValueError:
+            raise ValueError("Invalid 'cursor'.")
+    else:
+        params['cursor'] = None
+
+    completed = args.get('completed')
+    if completed is not None:
+        if completed.lower() not in ('true', 'false'):
+            raise ValueError("Invalid value for 'completed'. Must be true or false.")
+        completed = completed.lower() == 'true'
+    params['completed'] = completed
+
+    params['due_after'] = parse_due_date(args.get('due_after'), 'due_after')
+    params['due_before'] = parse_due_date(args.get('due_before'), 'due_before')
+    params['location'] = args.get('location')
+
+    fields = args.get('fields')
+    if fields:
+        fields = [field.strip() for field in fields.split(',') if field.strip()]
+        unknown = [field for field in fields if field not in PROJECTABLE_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        params['fields'] = fields
+    else:
+        params['fields'] = None
+    return params
+
+def project_task(row, fields, weather_map):
+    # Build a response dict holding only the requested fields of a column row
+    task = {}
+    for field in fields:
+        if field == 'weather':
+            task['weather'] = weather_map.get(row.location) if row.location else None
+        elif field == 'due_date':
+            task['due_date'] = format_due_date(row.due_date)
+        else:
+            task[field] = getattr(row, field)
+    return task
+
+_JSON_CONSTANTS = {None: 'null', True: 'true', False: 'false'}
+
+def _json_value(value):
+    # One column or weather value as JSON text, escaped the way jsonify escapes it
+    if value is None:
+        return 'null'
+    if value is True:
+        return 'true'
+    if value is False:
+        return 'false'
+    if isinstance(value, str):
+        return encode_basestring_ascii(value)
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, date):
+        return '"%s"' % value.isoformat()
+    return json.dumps(value, sort_keys=True, separators=(',', ':'))
+
+def _encode_full_rows(rows, index, weather_map):
+    id_at, description_at, completed_at, due_date_at, location_at = (index[name] for name in TASK_FIELDS)
+    # Location and weather are the same for many tasks, so their JSON is built once per location
+    location_tails = {}
+    encoded = []
+    for row in rows:
+        # Inline fast paths for the column types; anything unexpected goes through _json_value
+        completed, description, due_date = row[completed_at], row[description_at], row[due_date_at]
+        head = '{"completed":%s,"description":%s,"due_date":%s,"id":%d' % (
+            _JSON_CONSTANTS[completed] if completed is None or completed is True or completed is False
+            else _json_value(completed),
+            encode_basestring_ascii(description) if description.__class__ is str else _json_value(description),
+            '"%s"' % due_date.isoformat() if due_date.__class__ is date else _json_value(due_date),
+            row[id_at])
+        location = row[location_at]
+        if location is None:
+            encoded.append(head + '}')
+            continue
+        tail = location_tails.get(location)
+        if tail is None:
+            tail = location_tails[location] = ',"location":%s,"weather":%s}' % (
+                _json_value(location), _json_value(weather_map.get(location, WEATHER_UNAVAILABLE)))
+        encoded.append(head + tail)
+    return encoded
+
+def encode_task_rows(rows, columns, fields, weather_map):
+    """
+    Encode column rows straight to JSON text, one string per task, with the
+    same content as add_tasks_new (``fields`` None) or project_task. Values are
+    read by position from ``columns``; no per-task dict is built.
+    """
+    index = {name: i for i, name in enumerate(columns)}
+    if fields is None:
+        return _encode_full_rows(rows, index, weather_map)
+    names = sorted(set(fields))
+    template = '{' + ','.join('"%s":%%s' % name for name in names) + '}'
+    positions = [index.get('location' if name == 'weather' else name) for name in names]
+    is_weather = [name == 'weather' for name in names]
+    encoded = []
+    for row in rows:
+        values = []
+        for position, weather in zip(positions, is_weather):
+            value = row[position]
+            if weather:
+                value = weather_map.get(value) if value else None
+            values.append(_json_value(value))
+        encoded.append(template % tuple(values))
+    return encoded
+
+def task_list_json(rows, columns, fields, weather_map, next_cursor):
+    # Same document jsonify({"tasks": [...], "next_cursor": ...}) produces
+    return '{"next_cursor":%s,"tasks":[%s]}\n' % (_json_value(next_cursor),
+                                                  ','.join(encode_task_rows(rows, columns, fields, weather_map)))
+
+def clean_task_fields(item, partial=False):
+    """
+    Validate one task payload from a bulk request and return the column values
+    to write. ``partial`` allows missing fields (updates). Raises ValueError.
+    """
+    if not isinstance(item, dict):
+        raise ValueError("Each item must be an object.")
+    values = {}
+    if 'id' in item:
+        try:
+            values['id'] = int(item['id'])
+        except (TypeError, ValueError):
+            raise ValueError("'id' must be an integer.")
+    if not partial:
+        missing = [field for field in ('description', 'completed', 'due_date') if field not in item]
+        if missing:
+            raise ValueError(f"Missing fields: {', '.join(missing)}")
+    if 'description' in item:
+        values['description'] = item['description']
+    if 'completed' in item:
+        completed = bool_cleaner(item['completed'])
+        if not isinstance(completed, bool):
+            raise ValueError("Invalid value for 'completed'. Must be true or false.")
+        values['completed'] = completed
+    if 'due_date' in item:
+        values['due_date'] = parse_due_date(item['due_date'])
+    if 'location' in item:
+        values['location'] = item['location']
+    elif not partial:
+        values['location'] = None
+    return values
+
+def weather_settled(weather_map):
+    """
+    False when a lookup is still pending or failed: such a body is a stand-in
+    for the real one, so it gets no ETag and isn't cached.
+    """
+    return not weather_map or not any(weather in (WEATHER_PENDING, WEATHER_UNAVAILABLE)
+                                      for weather in weather_map.values())
+
+def tasks_etag(owner_id, tasks_version, variant, with_weather, config=None):
+    """
+    Strong ETag for a task read. ``variant`` distinguishes representations of
+    the same data (path and query string). Responses carrying weather also
+    roll over once per weather cache TTL so clients pick up new reports;
+    within that window only bodies whose weather_settled() may carry it.
+    """
+    parts = [str(owner_id), str(tasks_version), variant]
+    if with_weather:
+        config = config if config is not None else current_app.config
+        ttl = max(1, config.get('WEATHER_CACHE_TTL', 300))
+        parts.append(str(int(time.time() // ttl)))
+    return hashlib.sha1(':'.join(parts).encode()).hexdigest()
+
 def bool_cleaner(bool_data):
+    # True/False for a bool or 'true'/'false' in any case, None for anything else
     if isinstance(bool_data, bool):
         return bool_data
     elif isinstance(bool_data, str):
@@ -24,5 +308,4 @@ def bool_cleaner(bool_data):
             return True
         elif bool_data.lower() == 'false':
             return False
-        else:
-            return jsonify({"error": "Invalid value for 'completed'. Must be true or false."}), 400
\ No newline at end of file
+    return None
@@ -0,0 +1,209 @@
+# app/tasks/stats.py
+"""
+Per-user task statistics, maintained incrementally by the task writes.
+
+- task_stats: one row per user with total, completed and overdue counts.
+- task_due_counts: open tasks per user and due date.
+
+Every write calls record_task_changes in its own transaction with the
+(completed, due_date) state of each task before and after, and only the
+differences are applied, so a read is one stats row plus a handful of due
+date rows no matter how many tasks the user owns.
+
+"Overdue" depends on the date as well as the tasks: task_stats.overdue
+counts open tasks due before overdue_as_of, and both reads and writes roll
+it forward by adding the due-date counts of the days since then.
+
+The counters are derived data; rebuild_stats recomputes them from task_data
+(``flask rebuild-stats``) should they ever drift.
+"""
+from collections import Counter
+from datetime import date, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import Select, and_, bindparam, case, delete, func, literal, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.models import Task, TaskDueCount, TaskStats, User
+from .repository import _cached
+
+_stats = TaskStats.__table__
+_due = TaskDueCount.__table__
+_INSERTS = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+
+def task_state(completed, due_date):
+    # What the counters see of a task; a NULL completed counts as open
+    return (completed is True, due_date)
+
+
+def _deltas(removed, added):
+    total = len(added) - len(removed)
+    completed = sum(state[0] for state in added) - sum(state[0] for state in removed)
+    due = Counter(state[1] for state in added if not state[0] and state[1] is not None)
+    due.subtract(state[1] for state in removed if not state[0] and state[1] is not None)
+    return total, completed, {due_date: count for due_date, count in due.items() if count}
+
+
+def _write_statements(dialect_name):
+    def build():
+        rolled = (Select(func.coalesce(func.sum(_due.c.open_count), 0))
+                  .where(_due.c.owner_id == _stats.c.owner_id,
+                         _due.c.due_date >= _stats.c.overdue_as_of,
+                         _due.c.due_date < bindparam('today'))
+                  .scalar_subquery())
+        roll_forward = (update(_stats)
+                        .where(_stats.c.owner_id == bindparam('owner'), _stats.c.overdue_as_of < bindparam('today'))
+                        .values(overdue=_stats.c.overdue + rolled, overdue_as_of=bindparam('today')))
+        as_of = Select(_stats.c.overdue_as_of).where(_stats.c.owner_id == bindparam('owner'))
+        insert = _INSERTS[dialect_name]
+        stats = insert(_stats)
+        stats = stats.on_conflict_do_update(index_elements=[_stats.c.owner_id], set_={
+            'total': _stats.c.total + stats.excluded.total,
+            'completed': _stats.c.completed + stats.excluded.completed,
+            'overdue': _stats.c.overdue + stats.excluded.overdue,
+        })
+        due = insert(_due)
+        due = due.on_conflict_do_update(index_elements=[_due.c.owner_id, _due.c.due_date],
+                                        set_={'open_count': _due.c.open_count + due.excluded.open_count})
+        prune = delete(_due).where(_due.c.owner_id == bindparam('owner'),
+                                   _due.c.due_date.in_(bindparam('dates', expanding=True)),
+                                   _due.c.open_count == 0)
+        return roll_forward, as_of, stats, due, prune
+    return _cached(('stats_write', dialect_name), build)
+
+
+def record_task_changes(session, owner_id, removed=(), added=(), today=None):
+    """
+    Apply a write to ``owner_id``'s counters inside the session's transaction.
+    ``removed`` and ``added`` are task_state tuples: deleted tasks and the old
+    state of updated ones, created tasks and the new state of updated ones.
+
+    Call it after bump_tasks_version: the users row it updates serializes
+    concurrent writers for the same user.
+    """
+    total, completed, due = _deltas(removed, added)
+    if not (total or completed or due):
+        return
+    today = today or date.today()
+    conn = session.connection()
+    roll_forward, as_of_statement, stats, due_counts, prune = _write_statements(conn.dialect.name)
+    as_of = today
+    if due:
+        as_of = conn.scalar(as_of_statement, {'owner': owner_id}) or today
+        if as_of < today:
+            # First dated write of the day for this user
+            conn.execute(roll_forward, {'owner': owner_id, 'today': today})
+            as_of = today
+    overdue = sum(count for due_date, count in due.items() if due_date < as_of)
+    conn.execute(stats, {'owner_id': owner_id, 'total': total, 'completed': completed, 'overdue': overdue,
+                         'overdue_as_of': today})
+    if due:
+        conn.execute(due_counts, [{'owner_id': owner_id, 'due_date': due_date, 'open_count': count}
+                                  for due_date, count in due.items()])
+        emptied = [due_date for due_date, count in due.items() if count < 0]
+        if emptied:
+            conn.execute(prune, {'owner': owner_id, 'dates': emptied})
+
+
+def _read_statements():
+    def build():
+        stats = (Select(_stats.c.total, _stats.c.completed, _stats.c.overdue, _stats.c.overdue_as_of)
+                 .where(_stats.c.owner_id == bindparam('owner')))
+        due = (Select(_due.c.due_date, _due.c.open_count)
+               .where(_due.c.owner_id == bindparam('owner'),
+                      _due.c.due_date >= bindparam('start'), _due.c.due_date < bindparam('end')))
+        return stats, due
+    return _cached(('stats_read',), build)
+
+
+def read_stats(conn, owner_id, today=None):
+    """
+    ``owner_id``'s counts: total, completed, open, overdue (open, due before
+    today) and due_this_week (open, due from today through Sunday).
+    """
+    today = today or date.today()
+    week_end = today + timedelta(days=6 - today.weekday())
+    stats_statement, due_statement = _read_statements()
+    row = conn.execute(stats_statement, {'owner': owner_id}).first()
+    if row is None:
+        return {'total': 0, 'completed': 0, 'open': 0, 'overdue': 0, 'due_this_week': 0}
+    total, completed, overdue, as_of = row
+    due_this_week = 0
+    # The days between overdue_as_of and today (either way round), then the rest of the week
+    start, end = min(as_of, today), max(as_of, week_end + timedelta(days=1))
+    for due_date, count in conn.execute(due_statement, {'owner': owner_id, 'start': start, 'end': end}):
+        if as_of <= due_date < today:
+            overdue += count
+        elif today <= due_date < as_of:
+            overdue -= count
+        if today <= due_date <= week_end:
+            due_this_week += count
+    return {'total': total, 'completed': completed, 'open': total - completed, 'overdue': overdue,
+            'due_this_week': due_this_week}
+
+
+def rebuild_owner_stats(conn, owner_ids=None, today=None):
+    """
+    Recompute the counters of ``owner_ids`` (default: everyone) from
+    task_data in ``conn``'s transaction.
+    """
+    today = today or date.today()
+    owner_filter = Task.owner_id.is_not(None) if owner_ids is None else Task.owner_id.in_(owner_ids)
+    if owner_ids is None:
+        conn.execute(delete(_due))
+        conn.execute(delete(_stats))
+    else:
+        conn.execute(delete(_due).where(_due.c.owner_id.in_(owner_ids)))
+        conn.execute(delete(_stats).where(_stats.c.owner_id.in_(owner_ids)))
+    is_open = Task.completed.is_not(True)
+    conn.execute(_stats.insert().from_select(
+        ['owner_id', 'total', 'completed', 'overdue', 'overdue_as_of'],
+        Select(Task.owner_id, func.count(),
+               func.sum(case((Task.completed.is_(True), 1), else_=0)),
+               func.sum(case((and_(is_open, Task.due_date < today), 1), else_=0)),
+               literal(today, _stats.c.overdue_as_of.type))
+        .where(owner_filter).group_by(Task.owner_id)))
+    conn.execute(_due.insert().from_select(
+        ['owner_id', 'due_date', 'open_count'],
+        Select(Task.owner_id, Task.due_date, func.count())
+        .where(owner_filter, is_open, Task.due_date.is_not(None))
+        .group_by(Task.owner_id, Task.due_date)))
+
+
+def rebuild_stats(engine, owner_ids=None, batch_size=1000):
+    """
+    Rebuild the counters of ``owner_ids`` (default: every user) in batches,
+    one transaction each. A batch first locks its users rows, which every
+    task write also updates, so no write interleaves with the recount.
+    Returns the number of users rebuilt.
+    """
+    rebuilt = 0
+    last_id = None
+    while True:
+        with engine.begin() as conn:
+            if owner_ids is None:
+                query = Select(User.id).order_by(User.id).limit(batch_size)
+                if last_id is not None:
+                    query = query.where(User.id > last_id)
+                batch = list(conn.scalars(query))
+            else:
+                batch, owner_ids = list(owner_ids[:batch_size]), owner_ids[batch_size:]
+            if not batch:
+                return rebuilt
+            conn.execute(Select(User.id).where(User.id.in_(batch)).with_for_update())
+            rebuild_owner_stats(conn, batch)
+        rebuilt += len(batch)
+        last_id = batch[-1]
+
+
+@click.command('rebuild-stats')
+@with_appcontext
+@click.option('--user', 'user_ids', type=int, multiple=True, help="Only these user ids (repeatable).")
+@click.option('--batch-size', type=int, default=1000, show_default=True)
+def rebuild_stats_command(user_ids, batch_size):
+    """Recompute the per-user task statistics from the tasks table."""
+    rebuilt = rebuild_stats(current_app.extensions['db_engine'], list(user_ids) or None, batch_size)
+    click.echo(f"Rebuilt task statistics for {rebuilt} users.")
@@ -0,0 +1,45 @@
+# app/tasks/writes.py
+"""
+Single-task create and update for both serving modes (the ASGI handlers call
+them through AsyncSession.run_sync), so both validate a payload the way
+POST /tasks/bulk does and answer with the same errors. Writes happen in the
+caller's transaction, which the caller commits, or rolls back on
+IntegrityError (e.g. a client-chosen id that is taken).
+"""
+from app.models import Task
+from . import changes, stats
+from .services import clean_task_fields
+
+
+def create_task(session, owner_id, item, bump_tasks_version):
+    """
+    Add ``item`` as a task of ``owner_id`` and return it. Raises ValueError
+    with a client-facing message when the payload is invalid.
+    """
+    task = Task(owner_id=owner_id, **clean_task_fields(item))
+    session.add(task)
+    session.flush() # assigns the id when the client sent none
+    version = bump_tasks_version(session, owner_id)
+    stats.record_task_changes(session, owner_id, added=[stats.task_state(task.completed, task.due_date)])
+    changes.log_task_changes(session, owner_id, version, [(task.id, 'create')])
+    return task
+
+
+def update_task(session, owner_id, task_id, item, bump_tasks_version):
+    """
+    Apply the fields present in ``item`` to one of ``owner_id``'s tasks and
+    return it, or None when the owner has no such task. Raises ValueError
+    with a client-facing message when the payload is invalid.
+    """
+    values = clean_task_fields(item, partial=True)
+    values.pop('id', None)
+    task = session.get(Task, task_id)
+    if task is None or task.owner_id != owner_id:
+        return None
+    before = stats.task_state(task.completed, task.due_date)
+    for field, value in values.items():
+        setattr(task, field, value)
+    version = bump_tasks_version(session, owner_id)
+    stats.record_task_changes(session, owner_id, [before], [stats.task_state(task.completed, task.due_date)])
+    changes.log_task_changes(session, owner_id, version, [(task.id, 'update')])
+    return task
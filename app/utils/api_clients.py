@@ -0,0 +1,491 @@
+# app/utils/api_clients.py
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class WeatherUnavailable(Exception):
+    """The provider could not answer: circuit open, timeouts or repeated errors."""
+
+
+class CircuitBreaker:
+    """
+    Opens after ``failure_threshold`` consecutive failures and short-circuits
+    calls for ``reset_timeout`` seconds. After that one trial call is let
+    through (half-open); its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return 'half-open'
+            return 'open'
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+class WeatherClient:
+    """
+    Client for an OpenWeatherMap-compatible current-weather endpoint.
+
+    One pooled keep-alive session per process, strict connect/read timeouts,
+    bounded retries with full jitter on connection errors, 429 and 5xx, and a
+    circuit breaker so a provider outage costs a dict lookup instead of a timeout.
+    """
+
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, base_url, api_key, connect_timeout=0.5, read_timeout=1.5, retries=1,
+                 retry_backoff=0.1, pool_maxsize=16, breaker=None):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.pool_maxsize = pool_maxsize
+        self.breaker = breaker or CircuitBreaker()
+        self._session = None
+        self._session_pid = None
+        self._async_client = None
+        self._async_loop = None
+        self._lock = threading.Lock()
+
+    def _get_session(self):
+        # Sockets must not be shared with a forked parent, so each process builds its own
+        with self._lock:
+            if self._session is None or self._session_pid != os.getpid():
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize, max_retries=0)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._session = session
+                self._session_pid = os.getpid()
+            return self._session
+
+    @staticmethod
+    def parse_report(payload):
+        conditions = payload.get('weather') or [{}]
+        return conditions[0].get('description') or conditions[0].get('main')
+
+    def _report(self, response):
+        # The provider's final answer (requests and httpx responses alike)
+        report = self.parse_report(response.json()) if response.status_code == 200 else None
+        self.breaker.record_success()
+        if response.status_code not in (200, 404):
+            raise WeatherUnavailable(f"provider answered {response.status_code}")
+        return report
+
+    def get_weather_status(self, location):
+        """
+        Current conditions for ``location``; None when the provider does not
+        know the location. Raises WeatherUnavailable when it cannot answer.
+        """
+        if not self.breaker.allow():
+            raise WeatherUnavailable("circuit open")
+        params = {'q': location, 'appid': self.api_key}
+        try:
+            session = self._get_session()
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    time.sleep(random.uniform(0, self.retry_backoff * (2 ** attempt)))
+                try:
+                    response = session.get(self.base_url, params=params, timeout=self.timeout)
+                except requests.RequestException:
+                    continue
+                if response.status_code in self.RETRY_STATUSES:
+                    continue
+                return self._report(response)
+        except WeatherUnavailable:
+            raise
+        except BaseException:
+            # Anything unexpected (a malformed report, a bug) still settles the call, so a
+            # half-open trial can't stay in flight and keep the circuit shut for good
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_failure()
+        raise WeatherUnavailable(f"no answer for {location!r} after {self.retries + 1} attempts")
+
+    def _get_async_client(self):
+        # One per event loop (the ASGI worker's); httpx is only needed in that mode
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            import httpx
+            self._async_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout[1], connect=self.timeout[0]),
+                limits=httpx.Limits(max_connections=self.pool_maxsize, max_keepalive_connections=self.pool_maxsize))
+            self._async_loop = loop
+        return self._async_client
+
+    async def aget_weather_status(self, location):
+        """
+        get_weather_status for the event loop (SERVER_MODE=asgi): the same
+        retries, timeouts and circuit breaker on a pooled httpx.AsyncClient,
+        so a lookup waits without holding a thread.
+        """
+        if not self.breaker.allow():
+            raise WeatherUnavailable("circuit open")
+        params = {'q': location, 'appid': self.api_key}
+        try:
+            client = self._get_async_client()
+            import httpx
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    await asyncio.sleep(random.uniform(0, self.retry_backoff * (2 ** attempt)))
+                try:
+                    response = await client.get(self.base_url, params=params)
+                except httpx.HTTPError:
+                    continue
+                if response.status_code in self.RETRY_STATUSES:
+                    continue
+                return self._report(response)
+        except WeatherUnavailable:
+            raise
+        except BaseException:
+            # Cancellation included: a half-open trial must always report back
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_failure()
+        raise WeatherUnavailable(f"no answer for {location!r} after {self.retries + 1} attempts")
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+
+weather_client = None
+
+def init_weather_client(config):
+    """
+    Build the process-wide weather provider client from the app config.
+    """
+    global weather_client
+    weather_client = WeatherClient(config.get('WEATHER_API_URL', 'https://api.openweathermap.org/data/2.5/weather'),
+                                   config.get('WEATHER_API_KEY', ''),
+                                   connect_timeout=config.get('WEATHER_CONNECT_TIMEOUT', 0.5),
+                                   read_timeout=config.get('WEATHER_READ_TIMEOUT', 1.5),
+                                   retries=config.get('WEATHER_RETRIES', 1),
+                                   retry_backoff=config.get('WEATHER_RETRY_BACKOFF', 0.1),
+                                   pool_maxsize=config.get('WEATHER_POOL_MAXSIZE', 16),
+                                   breaker=CircuitBreaker(config.get('WEATHER_BREAKER_THRESHOLD', 5),
+                                                          config.get('WEATHER_BREAKER_RESET_SECONDS', 30.0)))
+    return weather_client
+
+
+class SQLiteWeatherStore:
+    """
+    File-backed weather store shared by every worker process on the host.
+    Each thread keeps its own connection; WAL mode lets readers and the
+    single writer proceed without blocking each other.
+    """
+
+    def __init__(self, path, busy_timeout=5.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        # Set up on a throwaway connection: one opened here could end up shared by forked workers
+        with closing(sqlite3.connect(path, timeout=busy_timeout)) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS weather_cache (
+                                location TEXT PRIMARY KEY,
+                                value TEXT NOT NULL,
+                                fetched_at REAL NOT NULL)""")
+            conn.commit()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout)
+            self._local.conn = conn
+        return conn
+
+    def get(self, location):
+        row = self._connection().execute(
+            "SELECT value, fetched_at FROM weather_cache WHERE location = ?", (location,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, location, value, fetched_at):
+        conn = self._connection()
+        conn.execute("INSERT OR REPLACE INTO weather_cache (location, value, fetched_at) VALUES (?, ?, ?)",
+                     (location, json.dumps(value), fetched_at))
+        conn.commit()
+
+    def prune(self, older_than):
+        conn = self._connection()
+        deleted = conn.execute("DELETE FROM weather_cache WHERE fetched_at < ?", (older_than,)).rowcount
+        conn.commit()
+        return deleted
+
+
+class _InFlight:
+    # One pending upstream call that concurrent misses for the same key wait on
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class WeatherCache:
+    """
+    In-process LRU of weather reports with a per-entry TTL.
+
+    - Entries younger than ``ttl`` are served as hits.
+    - Entries older than ``ttl`` but younger than ``ttl + stale_ttl`` are served
+      immediately while a background refresh replaces them (stale-while-revalidate).
+    - Concurrent misses for the same location share one upstream call (single-flight).
+    - An optional shared ``store`` lets processes reuse each other's lookups.
+    - With an ``afetch`` coroutine function, ``aget`` (and stale refreshes
+      triggered on the event loop) await it instead of using a thread.
+    """
+
+    def __init__(self, fetch, ttl=300, stale_ttl=900, max_entries=1024, store=None, refresh_workers=2,
+                 afetch=None):
+        self.fetch = fetch
+        self.afetch = afetch
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.store = store
+        self.refresh_workers = refresh_workers
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._ainflight = {} # location -> asyncio.Task, on the event loop's thread only
+        self._lock = threading.Lock()
+        self._refresh_executor = None
+        self._counters = {'hits': 0, 'stale_hits': 0, 'shared_hits': 0, 'misses': 0,
+                          'evictions': 0, 'refreshes': 0, 'errors': 0}
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def _remember(self, location, value, fetched_at):
+        with self._lock:
+            self._entries[location] = (value, fetched_at)
+            self._entries.move_to_end(location)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def _read(self, location):
+        with self._lock:
+            entry = self._entries.get(location)
+            if entry is not None:
+                self._entries.move_to_end(location)
+                return entry, False
+        if self.store is not None:
+            try:
+                entry = self.store.get(location)
+            except sqlite3.Error:
+                entry = None
+            if entry is not None:
+                self._remember(location, *entry)
+                return entry, True
+        return None, False
+
+    def lookup(self, location, revalidate=True):
+        """
+        Return ``(True, weather)`` if the location can be answered without waiting
+        on the upstream provider, otherwise ``(False, None)``. With
+        ``revalidate=False`` stale entries are served without triggering a refresh.
+        """
+        entry, shared = self._read(location)
+        if entry is None:
+            return False, None
+        value, fetched_at = entry
+        age = time.time() - fetched_at
+        if age < self.ttl:
+            self._count('shared_hits' if shared else 'hits')
+            return True, value
+        if age < self.ttl + self.stale_ttl:
+            self._count('stale_hits')
+            if revalidate:
+                self._refresh_in_background(location)
+            return True, value
+        return False, None
+
+    def get(self, location):
+        found, value = self.lookup(location)
+        if found:
+            return value
+        self._count('misses')
+        return self._load(location)
+
+    def _load(self, location):
+        with self._lock:
+            call = self._inflight.get(location)
+            leader = call is None
+            if leader:
+                call = _InFlight()
+                self._inflight[location] = call
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = self.fetch(location)
+            fetched_at = time.time()
+            self._remember(location, call.value, fetched_at)
+            if self.store is not None:
+                try:
+                    self.store.set(location, call.value, fetched_at)
+                except sqlite3.Error:
+                    pass
+            return call.value
+        except Exception as e:
+            self._count('errors')
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(location, None)
+            call.event.set()
+
+    async def aget(self, location):
+        """
+        get() for the event loop: a miss awaits ``afetch``. Cancelling the
+        caller (e.g. on a deadline) leaves the shared lookup running, so it
+        still fills the cache.
+        """
+        found, value = self.lookup(location)
+        if found:
+            return value
+        self._count('misses')
+        return await asyncio.shield(self._aload(location))
+
+    def _aload(self, location):
+        call = self._ainflight.get(location)
+        if call is None:
+            call = asyncio.get_running_loop().create_task(self._afetch_and_remember(location))
+            # Retrieved here so a lookup nobody waits for anymore doesn't log "never retrieved"
+            call.add_done_callback(lambda task: task.cancelled() or task.exception())
+            self._ainflight[location] = call
+        return call
+
+    async def _afetch_and_remember(self, location):
+        try:
+            value = await self.afetch(location)
+            fetched_at = time.time()
+            self._remember(location, value, fetched_at)
+            if self.store is not None:
+                try:
+                    self.store.set(location, value, fetched_at)
+                except sqlite3.Error:
+                    pass
+            return value
+        except Exception:
+            self._count('errors')
+            raise
+        finally:
+            self._ainflight.pop(location, None)
+
+    def _refresh_in_background(self, location):
+        if self.afetch is not None and _running_loop() is not None:
+            if location not in self._ainflight:
+                self._count('refreshes')
+                self._aload(location)
+            return
+        with self._lock:
+            if location in self._inflight:
+                return
+            if self._refresh_executor is None:
+                self._refresh_executor = ThreadPoolExecutor(max_workers=self.refresh_workers,
+                                                            thread_name_prefix='weather-refresh')
+            self._counters['refreshes'] += 1
+        self._refresh_executor.submit(self._refresh, location)
+
+    def _refresh(self, location):
+        try:
+            self._load(location)
+        except Exception:
+            # The stale value keeps being served until it expires
+            pass
+
+    def prime(self, location, value, fetched_at):
+        """
+        Seed the cache with a report fetched elsewhere (e.g. by the background jobs).
+        """
+        self._remember(location, value, fetched_at)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['stale_hits'] + stats['shared_hits'] + stats['misses']
+        stats['hit_rate'] = round((lookups - stats['misses']) / lookups, 4) if lookups else 0.0
+        return stats
+
+
+def _running_loop():
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+weather_cache = None
+
+def init_weather_cache(config, fetch, afetch=None):
+    """
+    Build the process-wide weather cache from the app config.
+    """
+    global weather_cache
+    store = None
+    if config.get('WEATHER_CACHE_PATH'):
+        store = SQLiteWeatherStore(config['WEATHER_CACHE_PATH'])
+    weather_cache = WeatherCache(fetch,
+                                 ttl=config.get('WEATHER_CACHE_TTL', 300),
+                                 stale_ttl=config.get('WEATHER_CACHE_STALE_TTL', 900),
+                                 max_entries=config.get('WEATHER_CACHE_MAX_ENTRIES', 1024),
+                                 store=store,
+                                 afetch=afetch)
+    return weather_cache
@@ -0,0 +1,52 @@
+# app/utils/slots.py
+"""
+A non-blocking semaphore shared by every process on the host, built from
+``slots`` lock files: holding a slot is holding an flock on one of them, so
+slots held by a worker that dies are released by the kernel.
+
+The lock files live in the app's own RUN_DIR unless a setting names another
+directory; the system temp dir would let two deployments on one host share
+(and exhaust) each other's slots.
+"""
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError: # not POSIX: callers fall back to their per-process bounds
+    fcntl = None
+
+
+DEFAULT_RUN_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'run')
+
+
+def slot_dir(config, setting=None):
+    # ``setting`` (e.g. 'HASH_SLOT_DIR') when set, else RUN_DIR
+    return (setting and config.get(setting)) or config.get('RUN_DIR') or DEFAULT_RUN_DIR
+
+
+class SlotLock:
+
+    def __init__(self, directory, slots, name='slot'):
+        os.makedirs(directory, exist_ok=True)
+        self.paths = [os.path.join(directory, f"{name}-{i}.lock") for i in range(slots)]
+        self._held = threading.local()
+
+    def try_acquire(self):
+        for path in self.paths:
+            fd = os.open(path, os.O_CREAT | os.O_RDWR, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                continue
+            self._held.fd = fd
+            return True
+        return False
+
+    def release(self):
+        fd = getattr(self._held, 'fd', None)
+        if fd is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+            self._held.fd = None
@@ -0,0 +1,5 @@
+# asgi.py (in your project root)
+from app.aio import create_async_app
+
+# ASGI application for SERVER_MODE=asgi, e.g. `uvicorn asgi:app` or via gunicorn.conf.py
+app = create_async_app()
@@ -0,0 +1,82 @@
+"""
+What a polling client costs the server: re-reading the task list vs asking
+the change feed, for one user with many tasks (default 2k).
+
+    python benchmarks/bench_changes.py --tasks 2000
+
+- list page: the list query plus JSON encoding of one page (limit 500, no
+  weather), what GET /tasks/ does on every poll.
+- feed, nothing new: read_changes at the current version.
+- feed, one write: read_changes right after a single-task update.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+
+from app import migrations
+from app.database import build_engine
+from app.models import Task, User
+from app.tasks import changes, repository
+from app.tasks.services import task_list_json
+
+
+def per_call_us(fn, iterations):
+    fn()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return round((time.perf_counter() - started) / iterations * 1e6, 1)
+
+
+def run(num_tasks, iterations):
+    engine = build_engine({'DATABASE_URL': "sqlite:///" + os.path.join(tempfile.mkdtemp(), "changes.db")})
+    migrations.upgrade(engine)
+    repository.init_statement_cache({})
+    changes.init_changes({})
+    with engine.begin() as conn:
+        conn.execute(insert(User).values(id=1, username="poller", hashed_password="x"))
+        conn.execute(insert(Task), [{"id": i, "description": f"Task {i}", "completed": i % 4 == 0,
+                                     "due_date": date(2025, 1, 1) + timedelta(days=i % 90),
+                                     "location": f"City {i % 25}", "owner_id": 1} for i in range(1, num_tasks + 1)])
+
+    def write(task_id):
+        with Session(engine) as session:
+            session.execute(update(Task).where(Task.id == task_id).values(completed=True))
+            version = session.scalar(update(User).where(User.id == 1)
+                                     .values(tasks_version=User.tasks_version + 1).returning(User.tasks_version))
+            changes.log_task_changes(session, 1, version, [(task_id, 'update')])
+            session.commit()
+            return version
+
+    params = {'fields': ['id', 'description', 'completed', 'due_date', 'location'], 'cursor': None,
+              'completed': None, 'due_after': None, 'due_before': None, 'location': None, 'limit': 500}
+    results = {}
+    with engine.connect() as conn:
+        def list_page():
+            columns, rows = repository.list_tasks(conn, 1, params)
+            return task_list_json(rows[:500], columns, params['fields'], {}, None)
+
+        results["list page (500 tasks)"] = per_call_us(list_page, iterations)
+        version = write(1)
+        conn.rollback()
+        results["feed, nothing new"] = per_call_us(lambda: changes.read_changes(conn, 1, version), iterations)
+        results["feed, one write"] = per_call_us(lambda: changes.read_changes(conn, 1, version - 1), iterations)
+    engine.dispose()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tasks', type=int, default=2000)
+    parser.add_argument('--iterations', type=int, default=500)
+    args = parser.parse_args()
+    for name, value in run(args.tasks, args.iterations).items():
+        print(f"{name:<28} {value} us")
@@ -0,0 +1,124 @@
+"""
+Task read path before and after the repository layer, for one user with many
+tasks (default 20k).
+
+    python benchmarks/bench_read_path.py --tasks 20000
+
+- get: the old ORM Select(Task) on db_session vs the prebuilt tuple query on
+  a read-only connection.
+- list page: a freshly built Select per request vs the cached statement.
+- full read: all of the user's tasks as ORM instances vs tuple rows, with
+  time and memory allocated per row (tracemalloc).
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flask import Flask
+from sqlalchemy import Select, insert
+
+from app import db_session
+from app.database import build_engine
+from app.models import Base, Task, User
+from app.tasks import repository
+from app.tasks.services import TASK_FIELDS
+
+
+def seed(engine, num_tasks):
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": 1, "username": "reader", "hashed_password": "x"},
+                                    {"id": 2, "username": "other", "hashed_password": "x"}])
+        conn.execute(insert(Task), [{"description": f"Task {i}", "completed": i % 4 == 0,
+                                     "due_date": date(2025, 1, 1) + timedelta(days=i % 90),
+                                     "location": f"City {i % 25}" if i % 3 else None,
+                                     "owner_id": 1 if i % 10 else 2} for i in range(num_tasks)])
+
+
+def per_call_us(fn, iterations):
+    fn()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return round((time.perf_counter() - started) / iterations * 1e6, 1)
+
+
+def allocated_per_row(fn):
+    tracemalloc.start()
+    rows = fn()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(rows), round(current / max(1, len(rows)))
+
+
+def old_list_query(owner_id, params):
+    # The list query as it was built before the repository: a new Select per request
+    query = Select(*[getattr(Task, name) for name in TASK_FIELDS]).where(Task.owner_id == owner_id)
+    if params['cursor'] is not None:
+        query = query.where(Task.id > params['cursor'])
+    return query.order_by(Task.id).limit(params['limit'] + 1)
+
+
+def run(num_tasks, iterations):
+    url = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "read_path.db")
+    config = {'DATABASE_URL': url}
+    engine = build_engine(config)
+    Base.metadata.create_all(engine)
+    seed(engine, num_tasks)
+    db_session.configure(bind=engine)
+    repository.init_statement_cache({})
+    app = Flask(__name__)
+    params = {'fields': None, 'cursor': 100, 'completed': None, 'due_after': None, 'due_before': None,
+              'location': None, 'limit': 100}
+    task_id = 12345 if num_tasks > 12345 else 1
+    results = {}
+
+    with app.app_context():
+        session = db_session()
+
+        def orm_get():
+            session.scalars(Select(Task).where(Task.owner_id == 1, Task.id == task_id)).first()
+            session.expunge_all()
+
+        def orm_list():
+            session.execute(old_list_query(1, params)).all()
+
+        with repository.read_connection() as conn:
+            results["get (ORM instance)"] = per_call_us(orm_get, iterations)
+            results["get (repository)"] = per_call_us(lambda: repository.get_task(conn, 1, task_id), iterations)
+            results["list page (new Select)"] = per_call_us(orm_list, iterations)
+            results["list page (repository)"] = per_call_us(lambda: repository.list_tasks(conn, 1, params), iterations)
+
+            def orm_all():
+                tasks = session.scalars(Select(Task).where(Task.owner_id == 1).order_by(Task.id)).all()
+                return tasks
+
+            def tuples_all():
+                columns, batches = repository.export_batches(conn, 1, 1000)
+                return [row for batch in batches for row in batch]
+
+            for label, fn in (("full read (ORM instances)", orm_all), ("full read (repository)", tuples_all)):
+                started = time.perf_counter()
+                count = len(fn())
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                session.expunge_all()
+                rows, bytes_per_row = allocated_per_row(fn)
+                session.expunge_all()
+                results[label] = f"{count} rows in {elapsed_ms:.1f} ms, {bytes_per_row} bytes/row"
+        db_session.remove()
+    engine.dispose()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tasks', type=int, default=20000)
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+    for name, value in run(args.tasks, args.iterations).items():
+        print(f"{name:<28} {value}{' us' if isinstance(value, float) else ''}")
@@ -0,0 +1,99 @@
+"""
+Task search latency with the text index vs a LIKE scan, at millions of tasks.
+
+    python benchmarks/bench_search.py --tasks 2000000 --users 20000
+
+Seeds a SQLite database with seed.py (Zipf-skewed owners, so one user holds
+a large share of the tasks), then times one page (limit 50) of
+search_tasks against the equivalent ``description LIKE '%term%'`` query on
+the same owner, for the heaviest user and a median one. Queries: a common
+word, a rare word, a two-letter prefix and two words.
+"""
+import argparse
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import Select, and_, func
+
+from app.database import build_engine
+from app.models import Task
+from app.tasks import repository, search
+from seed import seed
+
+
+def page_params(limit=50):
+    return {'fields': ['id', 'description'], 'cursor': None, 'completed': None, 'due_after': None,
+            'due_before': None, 'location': None, 'limit': limit}
+
+
+def like_query(owner_id, terms, limit=50):
+    return (Select(Task.id, Task.description)
+            .where(Task.owner_id == owner_id,
+                   and_(*[Task.description.ilike(f"%{term}%") for term in terms]))
+            .order_by(Task.id).limit(limit + 1))
+
+
+def timings_us(fn, iterations):
+    fn()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1e6)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def pick_queries(conn, owner_id):
+    words = Counter()
+    for (description,) in conn.execute(Select(Task.description).where(Task.owner_id == owner_id).limit(20000)):
+        words.update(re.findall(r"\w+", (description or '').lower()))
+    ranked = [word for word, _ in words.most_common() if len(word) > 3]
+    common, rare = ranked[0], ranked[-1]
+    return {'common word': [common], 'rare word': [rare], 'prefix': [common[:2]], 'two words': ranked[:2]}
+
+
+def run(num_tasks, num_users, iterations, seed_value):
+    database_url = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "search.db")
+    summary = seed(database_url, num_users, num_tasks, seed_value=seed_value)
+    print(f"seeded {num_tasks:,} tasks in {summary['task_seconds']}s, indexes in {summary['index_seconds']}s")
+    engine = build_engine({'DATABASE_URL': database_url})
+    repository.init_statement_cache({})
+    results = []
+    with engine.connect() as conn:
+        owners = conn.execute(Select(Task.owner_id, func.count()).group_by(Task.owner_id)
+                              .order_by(func.count().desc())).all()
+        for label, (owner_id, count) in (("heaviest user", owners[0]), ("median user", owners[len(owners) // 2])):
+            for name, terms in pick_queries(conn, owner_id).items():
+                _, matches = search.search_tasks(conn, owner_id, terms, page_params())
+                indexed = timings_us(lambda: search.search_tasks(conn, owner_id, terms, page_params()), iterations)
+                scan = timings_us(lambda: conn.execute(like_query(owner_id, terms)).all(), iterations)
+                results.append((f"{label} ({count:,} tasks)", f"{name}: {' '.join(terms)}", len(matches), indexed, scan))
+        statement, bind = search.search_statement('sqlite', owners[0][0], ['ab'], page_params())
+        compiled = statement.compile(dialect=engine.dialect)
+        values = compiled.construct_params(bind)
+        plan = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + str(compiled),
+                                    tuple(values[key] for key in compiled.positiontup)).all()
+    engine.dispose()
+    return results, [row[-1] for row in plan]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tasks', type=int, default=2000000)
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=2222)
+    args = parser.parse_args()
+    results, plan = run(args.tasks, args.users, args.iterations, args.seed)
+    print("query plan: " + "; ".join(plan))
+    print(f"{'owner':<28}{'query':<34}{'page':>5}{'index p50':>12}{'p95':>10}{'LIKE p50':>12}{'p95':>10}  (us)")
+    for owner, query, page, (index_p50, index_p95), (scan_p50, scan_p95) in results:
+        print(f"{owner:<28}{query:<34}{page:>5}{index_p50:>12.0f}{index_p95:>10.0f}{scan_p50:>12.0f}{scan_p95:>10.0f}")
@@ -0,0 +1,78 @@
+"""
+CPU time to turn a 1k-task list page into a response body.
+
+    python benchmarks/bench_serialization.py --tasks 1000 --iterations 200
+
+Compares the previous path (add_tasks_new dict per row, then jsonify with
+Flask's stdlib provider) with the same dicts through the orjson provider and
+with encode_task_rows, which writes JSON straight from the column rows.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flask import Flask, jsonify
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import Select, create_engine, insert
+
+from app.models import Base, Task
+from app.serialization import OrjsonProvider, orjson
+from app.tasks.services import add_tasks_new, task_list_json, TASK_FIELDS
+
+
+def load_rows(num_tasks):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Task), [{"description": f"Task {i}: call the supplier about order #{i * 7}",
+                                     "completed": i % 4 == 0,
+                                     "due_date": date(2025, 1, 1) + timedelta(days=i % 90),
+                                     "location": f"City {i % 25}" if i % 3 else None,
+                                     "owner_id": 1} for i in range(num_tasks)])
+        result = conn.execute(Select(*[getattr(Task, name) for name in TASK_FIELDS]).order_by(Task.id))
+        return list(result.keys()), result.all()
+
+
+def cpu_ms(fn, iterations):
+    fn()
+    started = time.process_time()
+    for _ in range(iterations):
+        fn()
+    return round((time.process_time() - started) / iterations * 1000, 3)
+
+
+def run(num_tasks, iterations):
+    columns, rows = load_rows(num_tasks)
+    weather_map = {f"City {i}": "clear sky" for i in range(25)}
+    results = {}
+
+    def dicts_jsonify():
+        tasks_array = [add_tasks_new(row, weather_map) for row in rows]
+        return jsonify({"tasks": tasks_array, "next_cursor": None}).get_data()
+
+    providers = [("stdlib", DefaultJSONProvider)]
+    if orjson is not None:
+        providers.append(("orjson", OrjsonProvider))
+    for name, provider_class in providers:
+        app = Flask(__name__)
+        app.json = provider_class(app)
+        with app.app_context():
+            results[f"dicts + jsonify ({name})"] = cpu_ms(dicts_jsonify, iterations)
+
+    results["encode_task_rows"] = cpu_ms(
+        lambda: task_list_json(rows, columns, None, weather_map, None).encode(), iterations)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tasks', type=int, default=1000)
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+    print(f"CPU ms per {args.tasks}-task list body:")
+    for name, ms in run(args.tasks, args.iterations).items():
+        print(f"  {name:<28} {ms}")
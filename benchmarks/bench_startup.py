@@ -0,0 +1,141 @@
+"""
+Worker startup cost: how long until each gunicorn worker can take requests.
+
+    python benchmarks/bench_startup.py --workers 4 --runs 3
+
+For each variant gunicorn is started against a migrated SQLite database with
+the repo's gunicorn.conf.py, and the benchmark records
+
+- worker ready: seconds from launch until each worker finished booting
+  (gunicorn's post_worker_init hook), as min / median / max over workers,
+- first response: seconds from launch until /hello_factory answered,
+- create_app: seconds one create_app() call takes in a fresh interpreter,
+  with the same settings (imports excluded).
+
+Variants: preload on/off, with BCRYPT_ROUNDS=auto (calibrated at startup)
+and SCHEMA_CHECK=upgrade, which are the defaults.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+REPO = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Wraps the repo's gunicorn config and reports when each worker is ready
+HOOK_CONFIG = """
+exec(compile(open({config!r}).read(), {config!r}, 'exec'))
+
+def post_worker_init(worker):
+    import os, time
+    with open({ready!r}, 'a') as f:
+        f.write(f"{{os.getpid()}} {{time.time()}}\\n")
+"""
+
+CREATE_APP_TIMER = """
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app()
+print(json.dumps({'import': imported - started, 'create_app': time.perf_counter() - imported}))
+"""
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def base_env(database_url):
+    env = dict(os.environ, DATABASE_URL=database_url, JWT_KEY='startup-benchmark-key-0123456789abcdef',
+               WEATHER_JOBS='off', FLASK_DEBUG='0')
+    env.pop('PYTHONPATH', None)
+    return env
+
+
+def time_create_app(env):
+    output = subprocess.run([sys.executable, '-c', CREATE_APP_TIMER], cwd=REPO, env=env, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def time_gunicorn(env, workers, timeout=60):
+    tmp = tempfile.mkdtemp()
+    ready_path = os.path.join(tmp, 'ready')
+    config_path = os.path.join(tmp, 'gunicorn_bench.conf.py')
+    with open(config_path, 'w') as f:
+        f.write(HOOK_CONFIG.format(config=os.path.join(REPO, 'gunicorn.conf.py'), ready=ready_path))
+    port = free_port()
+    env = dict(env, WEB_CONCURRENCY=str(workers), GUNICORN_BIND=f'127.0.0.1:{port}')
+    started = time.time()
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', config_path], cwd=REPO, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        first_response = None
+        deadline = started + timeout
+        while time.time() < deadline:
+            if first_response is None:
+                try:
+                    if requests.get(f'http://127.0.0.1:{port}/hello_factory', timeout=1).ok:
+                        first_response = time.time() - started
+                except requests.ConnectionError:
+                    pass
+            ready = []
+            if os.path.exists(ready_path):
+                with open(ready_path) as f:
+                    ready = [float(line.split()[1]) - started for line in f if line.strip()]
+            if first_response is not None and len(ready) >= workers:
+                return first_response, sorted(ready)
+            time.sleep(0.01)
+        raise RuntimeError(f"gunicorn did not start {workers} workers within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def run(workers, runs):
+    tmp = tempfile.mkdtemp()
+    database_url = 'sqlite:///' + os.path.join(tmp, 'startup.db')
+    env = base_env(database_url)
+    time_create_app(env) # applies the migrations, so every variant starts from a current schema
+    variants = {
+        'no preload': dict(env, GUNICORN_PRELOAD='0'),
+        'preload': dict(env, GUNICORN_PRELOAD='1'),
+    }
+    results = {}
+    for name, variant_env in variants.items():
+        first, ready, create = [], [], []
+        for _ in range(runs):
+            create.append(time_create_app(variant_env)['create_app'])
+            first_response, ready_times = time_gunicorn(variant_env, workers)
+            first.append(first_response)
+            ready.append(ready_times)
+        results[name] = {
+            'worker ready min': statistics.median(r[0] for r in ready),
+            'worker ready median': statistics.median(statistics.median(r) for r in ready),
+            'worker ready max': statistics.median(r[-1] for r in ready),
+            'first response': statistics.median(first),
+            'create_app': statistics.median(create),
+        }
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+    results = run(args.workers, args.runs)
+    metrics = list(next(iter(results.values())))
+    print(f"{'seconds (median of runs)':<26}" + ''.join(f"{name:>14}" for name in results))
+    for metric in metrics:
+        print(f"{metric:<26}" + ''.join(f"{results[name][metric]:>14.3f}" for name in results))
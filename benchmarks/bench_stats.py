@@ -0,0 +1,96 @@
+"""
+Task statistics from the summary tables vs computing them from task_data,
+for users owning 1k to 100k tasks.
+
+    python benchmarks/bench_stats.py --sizes 1000,10000,100000
+
+- summary: read_stats (one task_stats row plus this week's due-date rows).
+- aggregate: one COUNT/SUM query over the user's tasks, the best a
+  dashboard could do without the summary.
+- write overhead: a single-task insert + commit with and without
+  record_task_changes.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import Select, and_, case, func, insert
+from sqlalchemy.orm import Session
+
+from app import migrations
+from app.database import build_engine
+from app.models import Task, User
+from app.tasks import repository, stats
+
+
+def median_us(fn, iterations):
+    fn()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1e6)
+    return round(statistics.median(samples))
+
+
+def aggregate(conn, owner_id, today):
+    week_end = today + timedelta(days=6 - today.weekday())
+    is_open = Task.completed.is_not(True)
+    return conn.execute(Select(
+        func.count(),
+        func.sum(case((Task.completed.is_(True), 1), else_=0)),
+        func.sum(case((and_(is_open, Task.due_date < today), 1), else_=0)),
+        func.sum(case((and_(is_open, Task.due_date >= today, Task.due_date <= week_end), 1), else_=0)),
+    ).where(Task.owner_id == owner_id)).one()
+
+
+def run(sizes, iterations):
+    engine = build_engine({'DATABASE_URL': "sqlite:///" + os.path.join(tempfile.mkdtemp(), "stats.db")})
+    migrations.upgrade(engine)
+    repository.init_statement_cache({})
+    today = date.today()
+    next_id = 1
+    results = []
+    for owner_id, size in enumerate(sizes, 1):
+        with engine.begin() as conn:
+            conn.execute(insert(User).values(id=owner_id, username=f"user{owner_id}", hashed_password="x"))
+            conn.execute(insert(Task), [{"id": next_id + i, "description": f"Task {i}", "completed": i % 4 == 0,
+                                         "due_date": today + timedelta(days=i % 120 - 60), "owner_id": owner_id}
+                                        for i in range(size)])
+            stats.rebuild_owner_stats(conn, [owner_id])
+        next_id += size
+        with engine.connect() as conn:
+            summary = median_us(lambda: stats.read_stats(conn, owner_id), iterations)
+            computed = median_us(lambda: aggregate(conn, owner_id, today), iterations)
+        results.append((f"stats read, {size:,} tasks", summary, computed))
+
+    def write(record):
+        nonlocal next_id
+        next_id += 1
+        with Session(engine) as session:
+            session.execute(insert(Task).values(id=next_id, description="new", completed=False,
+                                                due_date=today, owner_id=1))
+            if record:
+                stats.record_task_changes(session, 1, added=[stats.task_state(False, today)])
+            session.commit()
+
+    results.append(("single-task write", median_us(lambda: write(True), iterations),
+                    median_us(lambda: write(False), iterations)))
+    engine.dispose()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,10000,100000')
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+    print(f"{'':<28}{'with summary':>14}{'without':>12}  (us, median)")
+    for name, summary, computed in run([int(size) for size in args.sizes.split(',')], args.iterations):
+        print(f"{name:<28}{summary:>14}{computed:>12}")
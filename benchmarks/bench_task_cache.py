@@ -0,0 +1,81 @@
+"""
+A task list read with and without the response cache, for one user with
+many tasks (default 2k), as GET /tasks/?limit=500 does it (no weather).
+
+    python benchmarks/bench_task_cache.py --tasks 2000
+
+- uncached: tasks_version, the list query and JSON encoding of the page.
+- memory / sqlite hit: tasks_version, then the body from the store.
+- write invalidation: dropping the owner's entries, what bump_tasks_version
+  adds to every write.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import insert
+
+from app import migrations
+from app.database import build_engine
+from app.models import Task, User
+from app.tasks import repository
+from app.tasks.cache import MemoryResponseStore, ResponseCache, SQLiteResponseStore
+from app.tasks.services import task_list_json, tasks_etag
+
+
+def per_call_us(fn, iterations):
+    fn()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return round((time.perf_counter() - started) / iterations * 1e6, 1)
+
+
+def run(num_tasks, iterations):
+    directory = tempfile.mkdtemp()
+    engine = build_engine({'DATABASE_URL': "sqlite:///" + os.path.join(directory, "tasks.db")})
+    migrations.upgrade(engine)
+    repository.init_statement_cache({})
+    with engine.begin() as conn:
+        conn.execute(insert(User).values(id=1, username="reader", hashed_password="x"))
+        conn.execute(insert(Task), [{"id": i, "description": f"Task {i}", "completed": i % 4 == 0,
+                                     "due_date": date(2025, 1, 1) + timedelta(days=i % 90),
+                                     "location": f"City {i % 25}", "owner_id": 1} for i in range(1, num_tasks + 1)])
+
+    params = {'fields': ['id', 'description', 'completed', 'due_date', 'location'], 'cursor': None,
+              'completed': None, 'due_after': None, 'due_before': None, 'location': None, 'limit': 500}
+    caches = {'memory': ResponseCache(MemoryResponseStore(64 * 1024 * 1024)),
+              'sqlite': ResponseCache(SQLiteResponseStore(os.path.join(directory, "cache.db"), 64 * 1024 * 1024))}
+    results = {}
+    with engine.connect() as conn:
+        def read(cache):
+            version = repository.tasks_version(conn, 1)
+            etag = tasks_etag(1, version, '/tasks/?limit=500', False)
+            body = cache.get(etag) if cache is not None else None
+            if body is None:
+                columns, rows = repository.list_tasks(conn, 1, params)
+                body = task_list_json(rows[:500], columns, params['fields'], {}, None)
+                if cache is not None:
+                    cache.put(1, etag, body)
+            return body
+
+        results["uncached"] = per_call_us(lambda: read(None), iterations)
+        for name, cache in caches.items():
+            results[f"{name} hit"] = per_call_us(lambda: read(cache), iterations)
+            results[f"{name} invalidation"] = per_call_us(lambda: cache.invalidate(1), iterations)
+    engine.dispose()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tasks', type=int, default=2000)
+    parser.add_argument('--iterations', type=int, default=500)
+    args = parser.parse_args()
+    for name, value in run(args.tasks, args.iterations).items():
+        print(f"{name:<28} {value} us")
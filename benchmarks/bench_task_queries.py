@@ -0,0 +1,109 @@
+"""
+List/filter latency of the task queries before and after the owner indexes
+and DATE due_date (schema version 1 vs latest).
+
+    python benchmarks/bench_task_queries.py --tasks 1000000 --users 1000
+
+Pass --database-url to run against Postgres instead of a temporary SQLite file.
+The database is dropped and rebuilt for each schema version.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import create_engine, text, Select, insert, MetaData, Table
+
+from app import migrations
+
+
+def build_database(engine, version, num_users, num_tasks, seed):
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS task_data"))
+        conn.execute(text("DROP TABLE IF EXISTS users"))
+        conn.execute(text("DROP TABLE IF EXISTS schema_version"))
+    migrations.upgrade(engine, target=version)
+    # Reflected so each schema version is written and queried with its own column types
+    task_data = Table("task_data", MetaData(), autoload_with=engine)
+
+    rng = random.Random(seed)
+    start = date(2025, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (id, username) VALUES " +
+                          ",".join(f"({i}, 'user{i}')" for i in range(1, num_users + 1))))
+        batch = []
+        for task_id in range(1, num_tasks + 1):
+            due = start + timedelta(days=rng.randrange(365))
+            batch.append({"id": task_id, "description": f"task {task_id}", "completed": rng.random() < 0.25,
+                          "due_date": due.isoformat() if version < 2 else due,
+                          "location": None, "owner_id": rng.randint(1, num_users)})
+            if len(batch) == 10000:
+                conn.execute(insert(task_data), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(task_data), batch)
+        if engine.dialect.name == "postgresql":
+            conn.execute(text("ANALYZE task_data"))
+        else:
+            conn.execute(text("ANALYZE"))
+    return task_data
+
+
+def time_query(engine, make_query, owner_ids, repeat):
+    samples = []
+    with engine.connect() as conn:
+        for owner_id in owner_ids[:repeat]:
+            query = make_query(owner_id)
+            started = time.perf_counter()
+            conn.execute(query).all()
+            samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {"p50_ms": round(statistics.median(samples), 3),
+            "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 3)}
+
+
+def run(database_url, num_users, num_tasks, repeat, seed):
+    engine = create_engine(database_url)
+    owner_ids = random.Random(seed + 1).sample(range(1, num_users + 1), min(repeat, num_users))
+    results = {}
+    for label, version in (("before", 1), ("after", len(migrations.MIGRATIONS))):
+        started = time.perf_counter()
+        task = build_database(engine, version, num_users, num_tasks, seed).c
+        columns = [task.id, task.description, task.completed, task.due_date, task.location]
+        print(f"[{label}] loaded {num_tasks} tasks in {time.perf_counter() - started:.1f}s")
+        low, high = ("2025-03-01", "2025-03-31") if version < 2 else (date(2025, 3, 1), date(2025, 3, 31))
+        queries = {
+            "list_first_page": lambda owner_id: Select(*columns).where(task.owner_id == owner_id)
+                                                 .order_by(task.id).limit(101),
+            "filter_open_due_in_march": lambda owner_id: Select(*columns).where(
+                task.owner_id == owner_id, task.completed == False,
+                task.due_date >= low, task.due_date <= high).order_by(task.id).limit(101),
+        }
+        results[label] = {name: time_query(engine, query, owner_ids, repeat) for name, query in queries.items()}
+    engine.dispose()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--tasks', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    database_url = args.database_url
+    if not database_url:
+        database_url = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    results = run(database_url, args.users, args.tasks, args.repeat, args.seed)
+    for name in results['before']:
+        before, after = results['before'][name], results['after'][name]
+        print(f"{name:28} before p50={before['p50_ms']:>9}ms p95={before['p95_ms']:>9}ms | "
+              f"after p50={after['p50_ms']:>7}ms p95={after['p95_ms']:>7}ms")
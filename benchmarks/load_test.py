@@ -0,0 +1,131 @@
+"""
+Concurrency/throughput of the sync (gunicorn sync workers) and ASGI (uvicorn
+workers) serving modes under the same load.
+
+    python benchmarks/load_test.py --modes sync asgi --concurrency 64 --duration 20
+
+Each mode is started through gunicorn.conf.py on a fresh SQLite database (or
+--database-url), seeded with one user and --tasks tasks, then hammered with
+--concurrency client threads requesting --path for --duration seconds.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from datetime import date
+
+import jwt
+import requests
+from sqlalchemy import create_engine, insert
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from app.models import Task
+
+
+def start_server(mode, port, database_url, workers, extra_env=None):
+    env = dict(os.environ, SERVER_MODE=mode, DATABASE_URL=database_url, WEB_CONCURRENCY=str(workers),
+               GUNICORN_BIND=f"127.0.0.1:{port}", JWT_KEY=os.getenv("JWT_KEY", "load-test-signing-key-0123456789"),
+               BCRYPT_ROUNDS="4", BCRYPT_MIN_ROUNDS="4", **(extra_env or {}))
+    process = subprocess.Popen([sys.executable, "-m", "gunicorn", "--config", "gunicorn.conf.py"],
+                               cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            requests.get(base_url + "/pool_status", timeout=1)
+            return process, base_url
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"{mode} server did not start")
+
+
+def seed(base_url, database_url, num_tasks):
+    # The user goes through the API; tasks are inserted directly so both modes start from the same data
+    credentials = {"username": f"load-{time.time_ns()}", "password": "load-test-password"}
+    requests.post(base_url + "/auth/register", json=credentials).raise_for_status()
+    token = requests.post(base_url + "/auth/login", json=credentials).json()["access_token"]
+    owner_id = int(jwt.decode(token, options={"verify_signature": False})["sub"])
+    engine = create_engine(database_url)
+    with engine.begin() as conn:
+        conn.execute(insert(Task), [{"description": f"load task {i}", "completed": i % 4 == 0,
+                                     "due_date": date(2025, 6, 1), "location": None, "owner_id": owner_id}
+                                    for i in range(num_tasks)])
+    engine.dispose()
+    return {"Authorization": f"Bearer {token}"}
+
+
+def hammer(url, headers, concurrency, duration):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client():
+        session = requests.Session()
+        local = []
+        local_errors = 0
+        while time.perf_counter() < stop_at:
+            started = time.perf_counter()
+            try:
+                ok = session.get(url, headers=headers, timeout=30).status_code == 200
+            except requests.RequestException:
+                ok = False
+            if ok:
+                local.append((time.perf_counter() - started) * 1000)
+            else:
+                local_errors += 1
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    def percentile(p):
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))], 2) if latencies else None
+    return {"requests": len(latencies), "errors": errors[0], "rps": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(statistics.median(latencies), 2) if latencies else None,
+            "p95_ms": percentile(0.95), "p99_ms": percentile(0.99)}
+
+
+def run(modes, concurrency, duration, num_tasks, workers, path, database_url=None, extra_env=None):
+    results = {}
+    for offset, mode in enumerate(modes):
+        url = database_url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), f"load-{mode}.db")
+        process, base_url = start_server(mode, 5100 + offset, url, workers, extra_env)
+        try:
+            headers = seed(base_url, url, num_tasks)
+            results[mode] = hammer(base_url + path, headers, concurrency, duration)
+        finally:
+            process.terminate()
+            process.wait(10)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', nargs='+', default=['sync', 'asgi'], choices=['sync', 'asgi'])
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--tasks', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--path', default='/tasks/?limit=50')
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+    print(json.dumps(run(args.modes, args.concurrency, args.duration, args.tasks, args.workers, args.path,
+                         args.database_url), indent=2))
@@ -0,0 +1,264 @@
+"""
+Endpoint latency/throughput suite: login, task list, single get, create,
+update and delete, measured over HTTP against an in-process server built
+with create_app.
+
+    python benchmarks/run_benchmarks.py --size small --weather-latency 50
+    python benchmarks/run_benchmarks.py --database-url postgresql://bench@localhost/bench --size medium
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/baseline.json
+
+Each database is reset and seeded with a fixed dataset size (seed.py, fixed
+seed), the weather API is served by tests/fake_weather_provider.py with the
+requested latency, and every endpoint gets --requests requests from
+--concurrency client threads. Results are written as JSON (--output); with
+--compare, p50/p95/p99 and throughput are diffed against an earlier run and
+the exit status is 1 if any endpoint regressed by more than --tolerance.
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timezone
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+import requests
+from sqlalchemy import Select, func
+from werkzeug.serving import make_server
+
+from config import Config
+from tests.fake_weather_provider import FakeWeatherProvider
+
+# name: (users, tasks)
+DATASET_SIZES = {'small': (100, 10_000), 'medium': (1_000, 200_000), 'large': (10_000, 2_000_000)}
+DATASET_SEED = 1515
+BASE_DATE = date(2025, 6, 1)
+
+
+def bench_config(database_url, weather_url, bcrypt_rounds, concurrency):
+    return type('BenchConfig', (Config,), {
+        'DATABASE_URL': database_url, 'WEATHER_API_URL': weather_url, 'WEATHER_JOBS': 'off',
+        'JWT_SECRET_KEY': 'benchmark-signing-key-0123456789abcdef',
+        'BCRYPT_ROUNDS': bcrypt_rounds, 'BCRYPT_MIN_ROUNDS': min(int(bcrypt_rounds), Config.BCRYPT_MIN_ROUNDS),
+        # One server process, and logins should queue for the hashing pool rather than bounce with 429
+        'HASH_GLOBAL_SLOTS': 0, 'HASH_QUEUE_LIMIT': max(Config.HASH_QUEUE_LIMIT, concurrency),
+        # Every benchmark client shares one address and a handful of users; measure the endpoints, not the limiter
+        'RATE_LIMIT_USER_RATE': 0, 'RATE_LIMIT_AUTH_IP_RATE': 0})
+
+
+def percentile(sorted_values, p):
+    return round(sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p))], 2)
+
+
+def measure(base_url, make_request, num_requests, concurrency):
+    """
+    Issue ``num_requests`` requests from ``concurrency`` threads. ``make_request(session, base_url, i)``
+    returns a response. 429/503 count as rejected (backpressure), other 4xx/5xx as errors.
+    """
+    counter = itertools.count()
+    latencies = []
+    errors = [0]
+    rejected = [0]
+    lock = threading.Lock()
+
+    def client():
+        session = requests.Session()
+        local = []
+        local_errors = local_rejected = 0
+        while (i := next(counter)) < num_requests:
+            started = time.perf_counter()
+            try:
+                status = make_request(session, base_url, i).status_code
+            except requests.RequestException:
+                status = None
+            if status is not None and status < 400:
+                local.append((time.perf_counter() - started) * 1000)
+            elif status in (429, 503):
+                local_rejected += 1
+            else:
+                local_errors += 1
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+            rejected[0] += local_rejected
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    if not latencies:
+        return {"requests": 0, "errors": errors[0], "rejected": rejected[0]}
+    return {"requests": len(latencies), "errors": errors[0], "rejected": rejected[0], "rps": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(statistics.median(latencies), 2), "p95_ms": percentile(latencies, 0.95),
+            "p99_ms": percentile(latencies, 0.99)}
+
+
+def endpoint_requests(credentials, headers, task_ids, first_new_id):
+    # The write endpoints work on their own rows: create makes them, update and delete reuse them
+    def login(session, base_url, i):
+        return session.post(base_url + "/auth/login", json=credentials)
+
+    def list_tasks(session, base_url, i):
+        return session.get(base_url + "/tasks/?limit=50", headers=headers)
+
+    def get_task(session, base_url, i):
+        return session.get(f"{base_url}/tasks/{task_ids[i % len(task_ids)]}", headers=headers)
+
+    def create_task(session, base_url, i):
+        return session.post(base_url + "/tasks/tasks/", headers=headers,
+                            json={"id": first_new_id + i, "description": f"benchmark task {i}",
+                                  "completed": False, "due_date": "2025-07-01", "location": f"City {i % 20}"})
+
+    def update_task(session, base_url, i):
+        return session.put(f"{base_url}/tasks/tasks/{first_new_id + i}", headers=headers,
+                           json={"completed": True, "description": f"benchmark task {i} (done)"})
+
+    def delete_task(session, base_url, i):
+        return session.delete(f"{base_url}/tasks/tasks/{first_new_id + i}", headers=headers,
+                              json={"id": first_new_id + i})
+
+    return [("login", login), ("list", list_tasks), ("get", get_task),
+            ("create", create_task), ("update", update_task), ("delete", delete_task)]
+
+
+def run_database(database_url, size, num_requests, concurrency, weather_url, bcrypt_rounds, workers):
+    from app import create_app
+    from app.models import Task, User
+    from app.utils import api_clients
+    import seed
+
+    app = create_app(bench_config(database_url, weather_url, bcrypt_rounds, concurrency))
+    num_users, num_tasks = DATASET_SIZES[size]
+    seeded = seed.seed(database_url, num_users, num_tasks, seed_value=DATASET_SEED, workers=workers,
+                       base_date=BASE_DATE)
+
+    engine = app.extensions['db_engine']
+    with engine.connect() as conn:
+        # The first seeded user logs in with seed-password-0 (see seed.py)
+        user_id, username = conn.execute(Select(User.id, User.username).order_by(User.id).limit(1)).one()
+        task_ids = conn.scalars(Select(Task.id).where(Task.owner_id == user_id).limit(1000)).all()
+        first_new_id = conn.scalar(Select(func.max(Task.id))) + 1
+    credentials = {"username": username, "password": "seed-password-0"}
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    try:
+        token = requests.post(base_url + "/auth/login", json=credentials).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        results = {"dataset": {"size": size, "users": num_users, "tasks": num_tasks,
+                               "benchmark_user_tasks": len(task_ids), "seed_seconds": seeded.get("task_seconds")},
+                   "endpoints": {}}
+        for name, make_request in endpoint_requests(credentials, headers, task_ids, first_new_id):
+            # get/list warm up on a few requests so the first-touch cost does not skew small runs
+            if name in ("list", "get"):
+                measure(base_url, make_request, min(20, num_requests), 1)
+            results["endpoints"][name] = measure(base_url, make_request, num_requests, concurrency)
+            print(f"  {name}: {results['endpoints'][name]}", flush=True)
+        results["weather_cache"] = api_clients.weather_cache.stats()
+        return results
+    finally:
+        server.shutdown()
+        engine.dispose()
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline, tolerance):
+    """
+    Print per-endpoint changes against ``baseline`` and return the regressions:
+    latency percentiles that grew, or throughput that fell, by more than ``tolerance``.
+    """
+    regressions = []
+    for label, run in current["runs"].items():
+        previous_run = baseline.get("runs", {}).get(label)
+        if previous_run is None:
+            print(f"{label}: not in baseline")
+            continue
+        print(f"{label}:")
+        for endpoint, stats in run["endpoints"].items():
+            previous = previous_run["endpoints"].get(endpoint)
+            if not previous or not stats.get("requests") or not previous.get("requests"):
+                continue
+            changes = []
+            for metric in ("p50_ms", "p95_ms", "p99_ms", "rps"):
+                change = (stats[metric] - previous[metric]) / previous[metric] if previous[metric] else 0.0
+                worse = change < -tolerance if metric == "rps" else change > tolerance
+                changes.append(f"{metric} {previous[metric]} -> {stats[metric]} ({change:+.0%}){' !' if worse else ''}")
+                if worse:
+                    regressions.append((label, endpoint, metric, change))
+            print(f"  {endpoint}: " + ", ".join(changes))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', action='append', dest='database_urls',
+                        help="repeatable; default is a temporary SQLite file. The database is wiped.")
+    parser.add_argument('--size', choices=sorted(DATASET_SIZES), default='small')
+    parser.add_argument('--requests', type=int, default=500, help="requests per endpoint")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--weather-latency', type=float, default=50, help="fake provider latency in ms")
+    parser.add_argument('--bcrypt-rounds', default='10', help="server bcrypt cost; dominates /auth/login")
+    parser.add_argument('--workers', type=int, default=None, help="seeding processes")
+    parser.add_argument('--output', help="result file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument('--compare', help="earlier result file to diff against")
+    parser.add_argument('--tolerance', type=float, default=0.10)
+    args = parser.parse_args()
+
+    provider = FakeWeatherProvider(latency=args.weather_latency / 1000).start()
+    database_urls = args.database_urls or ["sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")]
+    started_at = datetime.now(timezone.utc)
+    report = {"started_at": started_at.isoformat(), "git_revision": git_revision(),
+              "python": platform.python_version(), "platform": platform.platform(),
+              "settings": {"size": args.size, "requests": args.requests, "concurrency": args.concurrency,
+                           "weather_latency_ms": args.weather_latency, "bcrypt_rounds": args.bcrypt_rounds},
+              "runs": {}}
+    try:
+        for database_url in database_urls:
+            backend = database_url.split(":", 1)[0].split("+", 1)[0]
+            print(f"{backend} ({args.size}):", flush=True)
+            report["runs"][f"{backend}-{args.size}"] = run_database(
+                database_url, args.size, args.requests, args.concurrency, provider.url,
+                args.bcrypt_rounds, args.workers)
+    finally:
+        provider.stop()
+
+    output = args.output or os.path.join(ROOT, "benchmarks", "results",
+                                         started_at.strftime("%Y%m%dT%H%M%SZ") + ".json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,14 @@
 # config.py (in your project root)
 import os
-from dotenv import load_dotenv
 
 # Construct the path to the .env file, assuming it's in the project root
 # This config.py file is also in the project root.
 dotenv_path = os.path.join(os.path.dirname(__file__), '.env')
 
-# Load the .env file if it exists
+# Load the .env file if it exists; otherwise settings come straight from the environment
 if os.path.exists(dotenv_path):
+    from dotenv import load_dotenv
     load_dotenv(dotenv_path)
-else:
-    # Fallback if .env is not found, allows for vars to be set in the environment directly
-    print("Warning: .env file not found. Relying on system environment variables.")
-    load_dotenv()
 
 
 class Config:
@@ -22,14 +18,161 @@ class Config:
 
     # JWT Secret Key
     JWT_SECRET_KEY = os.getenv('JWT_KEY', 'secret')
+    TOKEN_CACHE_MAX_ENTRIES = int(os.getenv('TOKEN_CACHE_MAX_ENTRIES', '10000')) # Decoded tokens kept per worker
+    TOKEN_REVOCATION_PATH = os.getenv('TOKEN_REVOCATION_PATH', 'revoked_tokens.db') # Logged-out tokens, shared by all workers; empty keeps them per process
+    TOKEN_REVOCATION_REFRESH_SECONDS = float(os.getenv('TOKEN_REVOCATION_REFRESH_SECONDS', '1')) # How stale a worker's copy of TOKEN_REVOCATION_PATH may get; 0 reads it on every request
 
     # Database URL
     DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///./default_fallback.db') # Fallback if not set
+    # What create_app does about the schema: 'upgrade' applies pending migrations,
+    # 'verify' refuses to start while any are pending, 'off' skips the check (run
+    # migrations as a deploy step). Under gunicorn it runs once, in the master
+    SCHEMA_CHECK = os.getenv('SCHEMA_CHECK', 'upgrade')
+
+    # 'sync' serves run:app with gunicorn's sync workers; 'asgi' serves asgi:app
+    # (async Quart handlers on SQLAlchemy's async engine) with uvicorn workers. The asgi mode
+    # serves every /auth and /tasks endpoint but has no request instrumentation (/metrics,
+    # Server-Timing, profiles) and reads from the primary only (DATABASE_REPLICA_URLS unused)
+    SERVER_MODE = os.getenv('SERVER_MODE', 'sync')
+    ASYNC_DATABASE_URL = os.getenv('ASYNC_DATABASE_URL', '') # Defaults to DATABASE_URL with the async driver
+
+    # Connection pool. Unless DB_POOL_SIZE is set, each worker gets an even share of
+    # DB_MAX_CONNECTIONS (keep it below Postgres max_connections) across WEB_CONCURRENCY workers
+    WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', '4')) # gunicorn worker count
+    # Lock files the workers use to share slots (hashing, admission, feed holds, refresher election).
+    # Each deployment needs its own; the *_SLOT_DIR settings below override it per use
+    RUN_DIR = os.getenv('RUN_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'run'))
+    DB_MAX_CONNECTIONS = int(os.getenv('DB_MAX_CONNECTIONS', '80'))
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '0'))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '2'))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10')) # Seconds to wait for a free connection
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800')) # Seconds before a connection is replaced
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', '1') == '1'
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '5000')) # Postgres only; 0 disables
+
+    # Read replicas (comma-separated URLs). Task GETs and login lookups read from them
+    # round-robin; writes, and a user's reads for READ_YOUR_WRITES_SECONDS after they
+    # write, go to the primary
+    DATABASE_REPLICA_URLS = os.getenv('DATABASE_REPLICA_URLS', '')
+    DB_REPLICA_CHECK_INTERVAL = float(os.getenv('DB_REPLICA_CHECK_INTERVAL', '5')) # Seconds between health checks
+    DB_REPLICA_RETRY_SECONDS = float(os.getenv('DB_REPLICA_RETRY_SECONDS', '30')) # A failed replica sits out this long
+    DB_REPLICA_MAX_LAG_SECONDS = float(os.getenv('DB_REPLICA_MAX_LAG_SECONDS', '0')) # Postgres only; 0 disables
+    READ_YOUR_WRITES_SECONDS = float(os.getenv('READ_YOUR_WRITES_SECONDS', '5'))
+    READ_YOUR_WRITES_PATH = os.getenv('READ_YOUR_WRITES_PATH', 'read_your_writes.db') # SQLite file shared by all workers; empty keeps marks per process (single process only)
+
+    # SQLite fallback tuning
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', '16000'))
 
     # Flask Environment (e.g., 'development', 'production')
     FLASK_ENV = os.getenv('FLASK_ENV', 'development')
     FLASK_DEBUG = os.getenv('FLASK_DEBUG', '1') == '1' # Convert '1' or '0' to boolean
 
+    # Password hashing. BCRYPT_ROUNDS='auto' picks the highest cost (>= BCRYPT_MIN_ROUNDS)
+    # that hashes within BCRYPT_TARGET_MS on this machine
+    BCRYPT_ROUNDS = os.getenv('BCRYPT_ROUNDS', 'auto')
+    BCRYPT_TARGET_MS = int(os.getenv('BCRYPT_TARGET_MS', '250'))
+    BCRYPT_MIN_ROUNDS = int(os.getenv('BCRYPT_MIN_ROUNDS', '10'))
+    BCRYPT_MAX_ROUNDS = int(os.getenv('BCRYPT_MAX_ROUNDS', '14'))
+    HASH_POOL_WORKERS = int(os.getenv('HASH_POOL_WORKERS', '1')) # SERVER_MODE=asgi: hashing processes per worker (0 uses a thread); sync workers hash inline
+    HASH_QUEUE_LIMIT = int(os.getenv('HASH_QUEUE_LIMIT', '4')) # In-flight hashes per worker before answering 429
+    HASH_TIMEOUT_SECONDS = float(os.getenv('HASH_TIMEOUT_SECONDS', '10')) # SERVER_MODE=asgi: answer 429 when a hash takes longer
+    HASH_GLOBAL_SLOTS = int(os.getenv('HASH_GLOBAL_SLOTS', str(max(1, WEB_CONCURRENCY // 2)))) # Across all workers; 0 disables
+    HASH_SLOT_DIR = os.getenv('HASH_SLOT_DIR', '') # Lock files for HASH_GLOBAL_SLOTS; defaults to RUN_DIR
+
+    JSON_PROVIDER = os.getenv('JSON_PROVIDER', 'auto') # 'auto' uses orjson when installed, 'stdlib' forces Flask's encoder
+
+    # Request instrumentation: Server-Timing header, /metrics, sampled profiles of slow requests
+    INSTRUMENTATION = os.getenv('INSTRUMENTATION', 'on') == 'on'
+    SERVER_TIMING = os.getenv('SERVER_TIMING', 'on') == 'on'
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0')) # Fraction of requests profiled; 0 disables
+    PROFILE_THRESHOLD_MS = float(os.getenv('PROFILE_THRESHOLD_MS', '500')) # Sampled requests slower than this are dumped
+    PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+    PROFILER = os.getenv('PROFILER', 'cprofile') # 'cprofile' or 'pyinstrument' (falls back to cprofile)
+
+    # Weather provider (OpenWeatherMap-compatible current weather endpoint)
+    WEATHER_API_URL = os.getenv('WEATHER_API_URL', 'https://api.openweathermap.org/data/2.5/weather')
+    WEATHER_API_KEY = os.getenv('OW_KEY', '')
+    WEATHER_CONNECT_TIMEOUT = float(os.getenv('WEATHER_CONNECT_TIMEOUT', '0.5'))
+    WEATHER_READ_TIMEOUT = float(os.getenv('WEATHER_READ_TIMEOUT', '1.5'))
+    WEATHER_RETRIES = int(os.getenv('WEATHER_RETRIES', '1')) # Extra attempts on connection errors, 429 and 5xx
+    WEATHER_RETRY_BACKOFF = float(os.getenv('WEATHER_RETRY_BACKOFF', '0.1'))
+    WEATHER_POOL_MAXSIZE = int(os.getenv('WEATHER_POOL_MAXSIZE', '16')) # Keep-alive connections per worker
+    WEATHER_BREAKER_THRESHOLD = int(os.getenv('WEATHER_BREAKER_THRESHOLD', '5')) # Consecutive failures before opening
+    WEATHER_BREAKER_RESET_SECONDS = float(os.getenv('WEATHER_BREAKER_RESET_SECONDS', '30'))
+
+    # Weather enrichment for task listings
+    WEATHER_MAX_WORKERS = int(os.getenv('WEATHER_MAX_WORKERS', '8')) # Concurrent upstream lookups per worker
+    WEATHER_DEADLINE_SECONDS = float(os.getenv('WEATHER_DEADLINE_SECONDS', '2.0')) # Per-request budget for all lookups
+
+    # Weather cache: entries are fresh for TTL seconds, then served stale for up to STALE_TTL more while refreshing
+    WEATHER_CACHE_TTL = int(os.getenv('WEATHER_CACHE_TTL', '300'))
+    WEATHER_CACHE_STALE_TTL = int(os.getenv('WEATHER_CACHE_STALE_TTL', '900'))
+    WEATHER_CACHE_MAX_ENTRIES = int(os.getenv('WEATHER_CACHE_MAX_ENTRIES', '1024'))
+    WEATHER_CACHE_PATH = os.getenv('WEATHER_CACHE_PATH', '') # SQLite file shared by all workers; empty keeps the cache per-process
+
+    # Background weather jobs (see app/jobs.py): 'off', 'thread' (inside each web worker; one per host refreshes)
+    # or 'worker' (separate `python worker.py` process; web workers only read stored reports)
+    WEATHER_JOBS = os.getenv('WEATHER_JOBS', 'off')
+    WEATHER_REFRESH_INTERVAL = int(os.getenv('WEATHER_REFRESH_INTERVAL', '300')) # Seconds between due-soon refreshes
+    WEATHER_REFRESH_DUE_WITHIN_DAYS = int(os.getenv('WEATHER_REFRESH_DUE_WITHIN_DAYS', '7'))
+    WEATHER_REPORT_MAX_AGE = int(os.getenv('WEATHER_REPORT_MAX_AGE', '900')) # Stored reports older than this are refreshed
+    WEATHER_REFRESH_SLOT_DIR = os.getenv('WEATHER_REFRESH_SLOT_DIR', '') # Lock file electing the thread-mode refresher; defaults to RUN_DIR
+
+    # Rate limits (token buckets: RATE sustained requests per second, BURST at once; RATE 0 disables).
+    # USER applies to every token-protected route, AUTH_IP to login/register per client address.
+    # RATE_LIMIT_BACKEND: 'memory' (per worker: each of WEB_CONCURRENCY workers allows the full rate),
+    # 'sqlite' (RATE_LIMIT_PATH, shared by the workers on this host, at the cost of a write transaction
+    # per request) or 'package.module:factory' returning an object with take(key, rate, burst)
+    RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'memory')
+    RATE_LIMIT_PATH = os.getenv('RATE_LIMIT_PATH', '') # Defaults to ratelimit.db in the working directory
+    RATE_LIMIT_USER_RATE = float(os.getenv('RATE_LIMIT_USER_RATE', '20'))
+    RATE_LIMIT_USER_BURST = float(os.getenv('RATE_LIMIT_USER_BURST', '40'))
+    RATE_LIMIT_AUTH_IP_RATE = float(os.getenv('RATE_LIMIT_AUTH_IP_RATE', '0.5'))
+    RATE_LIMIT_AUTH_IP_BURST = float(os.getenv('RATE_LIMIT_AUTH_IP_BURST', '10'))
+
+    # Reverse proxies in front of the app (nginx in docker-compose). With N > 0 the client
+    # address is taken from the last N X-Forwarded-For hops instead of the socket peer
+    TRUSTED_PROXIES = int(os.getenv('TRUSTED_PROXIES', '0'))
+
+    # Admission control: shed with 503 + Retry-After when the workers on this host already run
+    # ADMISSION_MAX_IN_FLIGHT requests between them (lock-file slots in ADMISSION_SLOT_DIR), or a
+    # request waited more than ADMISSION_MAX_QUEUE_MS before reaching a worker (needs the proxy to
+    # set X-Request-Start: t=<epoch>). 0 disables. With SERVER_MODE=asgi, where one worker runs many
+    # requests at once, ADMISSION_MAX_IN_FLIGHT bounds each worker instead
+    ADMISSION_MAX_IN_FLIGHT = int(os.getenv('ADMISSION_MAX_IN_FLIGHT', '0'))
+    ADMISSION_SLOT_DIR = os.getenv('ADMISSION_SLOT_DIR', '') # Defaults to RUN_DIR
+    ADMISSION_MAX_QUEUE_MS = int(os.getenv('ADMISSION_MAX_QUEUE_MS', '0'))
+    ADMISSION_RETRY_AFTER = int(os.getenv('ADMISSION_RETRY_AFTER', '1'))
+    ADMISSION_EXEMPT_PATHS = os.getenv('ADMISSION_EXEMPT_PATHS', '/metrics,/pool_status')
+
+    # Task list pagination
+    TASKS_PAGE_DEFAULT_LIMIT = int(os.getenv('TASKS_PAGE_DEFAULT_LIMIT', '100'))
+    TASKS_PAGE_MAX_LIMIT = int(os.getenv('TASKS_PAGE_MAX_LIMIT', '500'))
+    TASKS_BULK_MAX_ITEMS = int(os.getenv('TASKS_BULK_MAX_ITEMS', '1000')) # Creates + updates + deletes per bulk request
+    TASKS_EXPORT_BATCH_SIZE = int(os.getenv('TASKS_EXPORT_BATCH_SIZE', '500')) # Rows fetched per round-trip when streaming exports
+    TASKS_STATEMENT_CACHE = os.getenv('TASKS_STATEMENT_CACHE', 'on') == 'on' # Reuse prebuilt read statements per query shape
+
+    # Read-through cache of task list pages and single tasks, keyed by ETag (see app/tasks/cache.py).
+    # TASK_CACHE_BACKEND: 'memory' (LRU per worker), 'sqlite' (TASK_CACHE_PATH, shared by the workers
+    # on this host), 'off', or 'package.module:factory' returning an object with the store methods
+    TASK_CACHE_BACKEND = os.getenv('TASK_CACHE_BACKEND', 'memory')
+    TASK_CACHE_PATH = os.getenv('TASK_CACHE_PATH', '') # Defaults to task_cache.db; emptied by the gunicorn master on start and by seed.py
+    TASK_CACHE_MAX_MB = float(os.getenv('TASK_CACHE_MAX_MB', '32')) # Bodies kept per worker (memory) or per host (sqlite)
+    TASK_CACHE_MAX_ENTRY_KB = int(os.getenv('TASK_CACHE_MAX_ENTRY_KB', '1024')) # Larger bodies are not cached
+
+    # Task change feed (/tasks/changes). Held requests must stay below gunicorn's worker timeout (30 s)
+    TASK_CHANGES_RETAIN_VERSIONS = int(os.getenv('TASK_CHANGES_RETAIN_VERSIONS', '1000')) # Writes kept per user; clients further behind re-read the list
+    TASK_CHANGES_PAGE_SIZE = int(os.getenv('TASK_CHANGES_PAGE_SIZE', '500')) # Changed tasks per response / SSE event
+    TASK_CHANGES_MAX_WAIT_SECONDS = float(os.getenv('TASK_CHANGES_MAX_WAIT_SECONDS', '20')) # Long-poll hold cap; 0 never holds
+    TASK_CHANGES_STREAM_SECONDS = float(os.getenv('TASK_CHANGES_STREAM_SECONDS', '20')) # SSE connection lifetime before the client reconnects
+    TASK_CHANGES_HEARTBEAT_SECONDS = float(os.getenv('TASK_CHANGES_HEARTBEAT_SECONDS', '15'))
+    TASK_CHANGES_POLL_SECONDS = float(os.getenv('TASK_CHANGES_POLL_SECONDS', '1')) # How often a held request checks for new writes
+    TASK_CHANGES_HOLD_SLOTS = int(os.getenv('TASK_CHANGES_HOLD_SLOTS', str(max(1, WEB_CONCURRENCY // 4)))) # Sync workers that may hold a feed request at once; 0 = unlimited
+    TASK_CHANGES_SLOT_DIR = os.getenv('TASK_CHANGES_SLOT_DIR', '') # Lock files for TASK_CHANGES_HOLD_SLOTS; defaults to RUN_DIR
+    TASK_CHANGES_RETRY_AFTER = int(os.getenv('TASK_CHANGES_RETRY_AFTER', '5')) # Seconds a client without a hold slot waits before polling again
+
     # Add any other global configurations your application might need
     # For example:
     # MAIL_SERVER = os.getenv('MAIL_SERVER')
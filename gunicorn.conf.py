@@ -0,0 +1,50 @@
+# gunicorn.conf.py (in your project root)
+# Picks the app and worker class from Config.SERVER_MODE:
+#   sync -> run:app with the default sync workers
+#   asgi -> asgi:app with uvicorn's ASGI workers
+import os
+
+from config import Config
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = Config.WEB_CONCURRENCY
+
+if Config.SERVER_MODE == 'asgi':
+    wsgi_app = 'asgi:app'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'run:app'
+
+# Build the app once in the master and fork the workers from it: imports, bcrypt
+# calibration and the schema check are paid once instead of once per worker
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') == '1'
+
+
+def on_starting(server):
+    config = {key: getattr(Config, key) for key in dir(Config) if key.isupper()}
+    # Once per deploy, here rather than in create_app: a worker (re)starting must not
+    # empty the cache the others are serving from
+    from app.tasks.cache import clear_shared_store
+    clear_shared_store(config)
+    if preload_app:
+        return
+    # Without preload each worker runs create_app; do the one-off work here first and
+    # let the workers inherit the result
+    if Config.SCHEMA_CHECK == 'upgrade':
+        from app import migrations
+        from app.database import build_engine
+        engine = build_engine(config)
+        migrations.upgrade(engine)
+        engine.dispose()
+        Config.SCHEMA_CHECK = 'verify'
+    if str(Config.BCRYPT_ROUNDS) == 'auto':
+        from app.auth.hashing import calibrate_rounds
+        Config.BCRYPT_ROUNDS = calibrate_rounds(Config.BCRYPT_TARGET_MS, min_rounds=Config.BCRYPT_MIN_ROUNDS,
+                                                max_rounds=Config.BCRYPT_MAX_ROUNDS)
+
+
+def post_fork(server, worker):
+    if preload_app:
+        # Pooled connections opened in the master must never be shared between processes
+        from app.database import dispose_engines_after_fork
+        dispose_engines_after_fork()
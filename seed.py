@@ -1,105 +1,284 @@
-import os
+"""
+Bulk seeding of users and tasks for development and capacity testing.
+
+    python seed.py --users 100000 --tasks 10000000 --workers 8 --seed 42
+
+- Task ownership is Zipf-skewed (--skew): a few users own most of the tasks,
+  most users own a handful, like real accounts.
+- User number i (counting users loaded by earlier --append runs) is named
+  ``<faker user name>_{i}`` and logs in with password
+  ``seed-password-{i % --hash-pool}``; only --hash-pool distinct bcrypt hashes
+  are computed, at the server's cost.
+- Rows are generated in worker processes, chunk by chunk, each chunk from its own
+  seed, so the same arguments always produce the same data.
+- Tasks load through COPY on Postgres and batched executemany inserts elsewhere.
+  On a fresh load the task indexes and the text search index are dropped first
+  and rebuilt at the end; the per-user task statistics are computed last.
+- New users start at tasks_version = seconds since GENERATION_EPOCH rather than
+  0. Cached bodies and ETags are keyed by (user id, tasks_version), so a reseed
+  or --append must never hand out a pair that running workers already cached
+  for other data.
+"""
+import argparse
+import io
+import multiprocessing
 import random
-from sqlalchemy import create_engine, select
-from sqlalchemy.orm import sessionmaker, scoped_session
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+from itertools import accumulate
+
 from faker import Faker
+from sqlalchemy import delete, func, insert, select, text
 
+from app import migrations
+from app.auth.hashing import build_context, get_password_hasher
+from app.database import build_engine
+from app.models import Task, TaskChange, TaskDueCount, TaskStats, User
+from app.tasks.cache import clear_shared_store
+from app.tasks.search import restore_search_index, suspend_search_index
+from app.tasks.stats import rebuild_stats
+from config import Config
 
+TASK_COLUMNS = ("description", "completed", "due_date", "location", "owner_id")
+# Due dates are spread around this date; fixed so a rerun on another day loads the same data
+BASE_DATE = date(2025, 1, 1)
+# Seeded tasks_versions count seconds from here: later loads start higher, and a 32-bit column lasts decades
+GENERATION_EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
 
-from app import User, Task, Base 
-from user_registration import pwd_context
+# Per-process generator state, set by the pool initializers
+_state = {}
 
 
-from dotenv import load_dotenv
-load_dotenv()
+def _hash_password(password, rounds):
+    return build_context(rounds).hash(password)
 
-DATABASE_URL = os.getenv("DATABASE_URL")
-if not DATABASE_URL:
-    raise Exception("DATABASE_URL environment variable not set")
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def _chunk_rng(seed, kind, chunk):
+    label = f"{seed}-{kind}-{chunk}"
+    fake = Faker()
+    fake.seed_instance(label)
+    return random.Random(label), fake
 
-# Initialize Faker
-fake = Faker()
 
-Base.metadata.create_all(bind=engine)
+def _init_user_worker(seed, hashes, tasks_version):
+    _state['seed'] = seed
+    _state['hashes'] = hashes
+    _state['tasks_version'] = tasks_version
 
-print("Database connection and Faker initialized.")
-print("Next steps: Write functions to seed users and tasks.")
 
-def seed_users(db_session, num_users):
-    print(f"Seeding {num_users} users...")
-    users_created_count = 0
-    for i in range(num_users):
-        fake_username = f'{fake.user_name()}__{i}'
-        fake_password = fake.password(length=12, special_chars=True, digits=True, upper_case=True, lower_case=True)
-        
-        hashed_password = pwd_context.hash(fake_password)
+def _generate_users(chunk):
+    chunk_index, start, count = chunk
+    rng, fake = _chunk_rng(_state['seed'], 'users', chunk_index)
+    hashes, tasks_version = _state['hashes'], _state['tasks_version']
+    return [{"username": f"{fake.user_name()}_{i}", "hashed_password": hashes[i % len(hashes)],
+             "tasks_version": tasks_version}
+            for i in range(start, start + count)]
 
-        new_user = User(username=fake_username, hashed_password=hashed_password)
 
-        db_session.add(new_user)
-        users_created_count += 1
+def _init_task_worker(seed, owner_ids, skew, base_date):
+    # Vocabulary pools keep Faker off the per-row path; they are identical in every worker
+    rng, fake = _chunk_rng(seed, 'vocabulary', 0)
+    _state['seed'] = seed
+    _state['owner_ids'] = owner_ids
+    _state['sentences'] = [fake.sentence(nb_words=rng.randint(4, 8)) for _ in range(5000)]
+    _state['cities'] = [fake.city() for _ in range(1000)]
+    _state['base_date'] = base_date
+    # Zipf weights over a seeded permutation of the users, so the heavy owners are spread out
+    ranks = list(range(1, len(owner_ids) + 1))
+    rng.shuffle(ranks)
+    _state['cum_weights'] = list(accumulate(1.0 / rank ** skew for rank in ranks))
 
-        try:
-            db_session.commit()
-            print(f'Successfully seeded {users_created_count} users.')
-        except Exception as e:
-            db_session.rollback()
-            print(f'Error seeding users: {e}')
 
-def seed_tasks(db_session, num_tasks_per_user_avg):
-    users = db_session.scalars(select(User)).all()
-    if not users:
-        print("No users found in the database. Please seed users first.")
-        return
-    
-    print(f'Attempting to seed tasks for {len(users)} users (avg ~{num_tasks_per_user_avg} tasks per user)...')
-    total_tasks_created = 0
+def _generate_tasks(chunk):
+    chunk_index, count = chunk
+    rng, _ = _chunk_rng(_state['seed'], 'tasks', chunk_index)
+    sentences, cities, base_date = _state['sentences'], _state['cities'], _state['base_date']
+    owners = rng.choices(_state['owner_ids'], cum_weights=_state['cum_weights'], k=count)
+    rows = []
+    for owner_id in owners:
+        rows.append((rng.choice(sentences),
+                     rng.random() < 0.25,
+                     base_date + timedelta(days=rng.randint(-30, 60)),
+                     rng.choice(cities) if rng.random() < 0.6 else None,
+                     owner_id))
+    return rows
 
-    for user_obj in users:
-        num_individual_tasks = random.randint(1, max(1,(num_tasks_per_user_avg * 2) -1))
 
-    for i in range(num_individual_tasks):
-        task_description = fake.sentence(nb_words=random.randint(4,8))
-        task_completed = fake.boolean(chance_of_getting_true=25)
-        task_due_date = fake.future_date(end_date="+60d").strftime('%Y-%m-%d')
-        task_location = fake.city() if fake.boolean(chance_of_getting_true=60) else None
+def _chunks(total, size, first=0):
+    # (chunk index, first row number, rows); row numbers start at ``first``
+    for chunk_index, start in enumerate(range(0, total, size)):
+        yield chunk_index, first + start, min(size, total - start)
 
-        new_task = Task(
-            description=task_description,
-            completed=task_completed,
-            due_date=task_due_date,
-            location=task_location,
-            owner_id=user_obj.id
-        )
-        db_session.add(new_task)
-        total_tasks_created += 1
 
-        try:
-            db_session.commit()
-            print(f'Successfully seeded {total_tasks_created} tasks across {len(users)} users.')
-        except Exception as e:
-            db_session.rollback()
-            print(f'Error seeding tasks: {e}')
+def _copy_value(value):
+    if value is None:
+        return r"\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
 
-if __name__ == "__main__":
-    db = SessionLocal()
+
+def copy_tasks(engine, rows):
+    """
+    Load task rows with Postgres COPY, which skips per-row statement overhead.
+    """
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(_copy_value(value) for value in row))
+        buffer.write("\n")
+    buffer.seek(0)
+    connection = engine.raw_connection()
     try:
+        with connection.cursor() as cursor:
+            cursor.copy_expert(f"COPY {Task.__tablename__} ({', '.join(TASK_COLUMNS)}) FROM STDIN", buffer)
+        connection.commit()
+    finally:
+        connection.close()
 
-        #Clear existing table data before seeding
-        print(f'Clearing existing table data...')
-        num_tasks_deleted = db.query(Task).delete()
-        num_users_deleted = db.query(User).delete()
-        print(f'{num_users_deleted} users deleted from table.')
-        print(f'{num_tasks_deleted} tasks deleted from table.')
 
-        # Seed a specific number of users
-        #seed_users(db, 50)
-        seed_users(db, 10)
-        seed_tasks(db, 5)
+def insert_tasks(engine, rows):
+    with engine.begin() as conn:
+        conn.execute(insert(Task), [dict(zip(TASK_COLUMNS, row)) for row in rows])
 
-    finally:
-        print("Closing database session.")
-        db.close()
+
+def clear_tables(engine):
+    with engine.begin() as conn:
+        if engine.dialect.name == 'postgresql':
+            conn.execute(text(f"TRUNCATE {Task.__tablename__}, {User.__tablename__} RESTART IDENTITY CASCADE"))
+        else:
+            conn.execute(delete(TaskChange))
+            conn.execute(delete(TaskDueCount))
+            conn.execute(delete(TaskStats))
+            conn.execute(delete(Task))
+            conn.execute(delete(User))
+
+
+class Progress:
+
+    def __init__(self, label, total):
+        self.label = label
+        self.total = total
+        self.done = 0
+        self.started = time.perf_counter()
+        self._next_report = 0
+
+    def add(self, rows):
+        self.done += rows
+        if self.done >= self._next_report:
+            print(f"  {self.label}: {self.done:,}/{self.total:,} ({self.rate():,.0f} rows/s)", flush=True)
+            self._next_report = self.done + max(1, self.total // 10)
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def rate(self):
+        return self.done / self.elapsed() if self.elapsed() else 0.0
+
+
+def seed(database_url, num_users, num_tasks, seed_value=0, workers=None, batch_size=50000, hash_pool=16,
+         skew=0.8, base_date=BASE_DATE, append=False, defer_indexes=True):
+    """
+    Generate and load ``num_users`` users and ``num_tasks`` tasks. Returns a
+    summary dict with row counts, timings and rows/sec.
+    """
+    config = {key: getattr(Config, key) for key in dir(Config) if key.isupper()}
+    config['DB_STATEMENT_TIMEOUT_MS'] = 0
+    config['SQLITE_SYNCHRONOUS'] = 'OFF' # Throwaway load: durability is not needed until the end
+    engine = build_engine(config, database_url)
+    migrations.upgrade(engine)
+    use_copy = engine.dialect.name == 'postgresql' and engine.dialect.driver == 'psycopg2'
+    workers = workers or multiprocessing.cpu_count()
+    summary = {"users": num_users, "tasks": num_tasks, "loader": "copy" if use_copy else "executemany"}
+
+    if not append:
+        # The text index is rebuilt in one pass at the end instead of row by row
+        with engine.begin() as conn:
+            suspend_search_index(conn)
+        print("Clearing existing users and tasks...")
+        clear_tables(engine)
+        # Entries for the old rows can never be hit again (see GENERATION_EPOCH); free the space
+        clear_shared_store(config)
+    task_indexes = list(Task.__table__.indexes) if defer_indexes and not append else []
+    if task_indexes:
+        with engine.begin() as conn:
+            for index in task_indexes:
+                index.drop(conn, checkfirst=True)
+
+    rounds = get_password_hasher().rounds
+    with multiprocessing.Pool(workers) as pool:
+        started = time.perf_counter()
+        hashes = pool.starmap(_hash_password, [(f"seed-password-{i}", rounds) for i in range(hash_pool)])
+        summary["hash_seconds"] = round(time.perf_counter() - started, 2)
+
+    with engine.begin() as conn:
+        first_new_id = (conn.scalar(select(func.max(User.id))) or 0) + 1
+    tasks_version = int((datetime.now(timezone.utc) - GENERATION_EPOCH).total_seconds())
+    progress = Progress("users", num_users)
+    with multiprocessing.Pool(workers, _init_user_worker, (seed_value, hashes, tasks_version)) as pool:
+        # Numbered after the existing users, so an --append run never repeats a username
+        for rows in pool.imap(_generate_users, _chunks(num_users, batch_size, first=first_new_id - 1)):
+            with engine.begin() as conn:
+                conn.execute(insert(User), rows)
+            progress.add(len(rows))
+    summary["user_seconds"] = round(progress.elapsed(), 2)
+    summary["users_per_second"] = round(progress.rate())
+
+    with engine.begin() as conn:
+        owner_ids = conn.scalars(select(User.id).where(User.id >= first_new_id).order_by(User.id)).all()
+    if num_tasks and owner_ids:
+        progress = Progress("tasks", num_tasks)
+        load = copy_tasks if use_copy else insert_tasks
+        task_chunks = ((chunk_index, count) for chunk_index, _, count in _chunks(num_tasks, batch_size))
+        with multiprocessing.Pool(workers, _init_task_worker, (seed_value, owner_ids, skew, base_date)) as pool:
+            for rows in pool.imap(_generate_tasks, task_chunks):
+                load(engine, rows)
+                progress.add(len(rows))
+        summary["task_seconds"] = round(progress.elapsed(), 2)
+        summary["tasks_per_second"] = round(progress.rate())
+
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        for index in task_indexes:
+            index.create(conn)
+        if not append:
+            restore_search_index(conn)
+        if engine.dialect.name != 'sqlite':
+            conn.execute(text(f"ANALYZE {Task.__tablename__}"))
+    if engine.dialect.name == 'sqlite':
+        with engine.connect() as conn:
+            conn.execute(text("ANALYZE"))
+    summary["index_seconds"] = round(time.perf_counter() - started, 2)
+
+    # Bulk loads bypass the write routes, so the new users' statistics are computed afterwards
+    started = time.perf_counter()
+    rebuild_stats(engine, owner_ids)
+    summary["stats_seconds"] = round(time.perf_counter() - started, 2)
+    engine.dispose()
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default=Config.DATABASE_URL)
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--tasks', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0, help="same seed and arguments give the same data")
+    parser.add_argument('--workers', type=int, default=None, help="generator processes (default: CPU count)")
+    parser.add_argument('--batch-size', type=int, default=50000, help="rows per generated chunk and insert")
+    parser.add_argument('--hash-pool', type=int, default=16, help="distinct passwords/bcrypt hashes")
+    parser.add_argument('--skew', type=float, default=0.8, help="Zipf exponent of tasks per user")
+    parser.add_argument('--base-date', type=date.fromisoformat, default=BASE_DATE,
+                        help="due dates fall 30 days before to 60 days after this date "
+                             f"(default: {BASE_DATE.isoformat()}; pass today's date for tasks due around now)")
+    parser.add_argument('--append', action='store_true', help="keep existing users and tasks")
+    parser.add_argument('--keep-indexes', action='store_true', help="load with the task indexes in place")
+    args = parser.parse_args()
+
+    if not args.database_url:
+        sys.exit("DATABASE_URL environment variable not set")
+    result = seed(args.database_url, args.users, args.tasks, seed_value=args.seed, workers=args.workers,
+                  batch_size=args.batch_size, hash_pool=args.hash_pool, skew=args.skew,
+                  base_date=args.base_date, append=args.append, defer_indexes=not args.keep_indexes)
+    for key, value in result.items():
+        print(f"{key}: {value}")
@@ -0,0 +1,55 @@
+"""
+The real Flask app on a throwaway SQLite database, for endpoint tests.
+
+    app = make_app(TASKS_PAGE_MAX_LIMIT=10)
+    client = app.test_client()
+    headers = login(client, 'alice')
+
+make_async_app builds the ASGI (Quart) app from the same settings.
+"""
+import os
+import tempfile
+
+from app import create_app, db_session
+from config import Config
+
+
+def config_class(**overrides):
+    directory = tempfile.mkdtemp()
+    settings = {
+        'DATABASE_URL': "sqlite:///" + os.path.join(directory, "tasks.db"),
+        'JWT_SECRET_KEY': 'k' * 32,
+        'BCRYPT_ROUNDS': 4, 'BCRYPT_MIN_ROUNDS': 4,
+        'HASH_POOL_WORKERS': 0, # hash inline, no process pool
+        'RATE_LIMIT_BACKEND': 'memory', 'RATE_LIMIT_USER_RATE': 0, 'RATE_LIMIT_AUTH_IP_RATE': 0,
+        'INSTRUMENTATION': False,
+        'WEATHER_JOBS': 'off',
+        'WEATHER_API_URL': 'http://127.0.0.1:9/data/2.5/weather', # nothing listens: lookups fail fast
+        'TASK_CHANGES_HOLD_SLOTS': 0,
+        'TASK_CACHE_BACKEND': 'memory',
+        'TOKEN_REVOCATION_PATH': os.path.join(directory, "revoked_tokens.db"),
+        'RUN_DIR': os.path.join(directory, 'run'),
+    }
+    settings.update(overrides)
+    return type('TestConfig', (Config,), settings)
+
+
+def make_app(**overrides):
+    return create_app(config_class(**overrides))
+
+
+def make_async_app(**overrides):
+    from app.aio import create_async_app
+    return create_async_app(config_class(**overrides))
+
+
+def close_app(app):
+    db_session.remove()
+    app.extensions['db_engine'].dispose()
+
+
+def login(client, username, password='secret'):
+    """Register ``username`` if needed and return Authorization headers for it."""
+    client.post('/auth/register', json={'username': username, 'password': password})
+    response = client.post('/auth/login', json={'username': username, 'password': password})
+    return {'Authorization': 'Bearer ' + response.get_json()['access_token']}
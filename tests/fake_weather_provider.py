@@ -0,0 +1,94 @@
+"""
+Local stand-in for the OpenWeatherMap current-weather endpoint, for tests and
+benchmarks. Latency, error rate and unknown locations are configurable, and
+can be changed while the server runs.
+
+    python tests/fake_weather_provider.py --port 8099 --latency 0.2 --fail-rate 0.1
+
+then point the app at it with WEATHER_API_URL=http://127.0.0.1:8099/data/2.5/weather.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeWeatherProvider:
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, fail_rate=0.0, fail_status=503,
+                 unknown_locations=()):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.fail_status = fail_status
+        self.unknown_locations = set(unknown_locations)
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/data/2.5/weather"
+
+    def _handler(self):
+        provider = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                with provider._lock:
+                    provider.requests += 1
+                location = parse_qs(urlparse(self.path).query).get('q', [''])[0]
+                if provider.latency:
+                    time.sleep(provider.latency)
+                if random.random() < provider.fail_rate:
+                    self._reply(provider.fail_status, {"cod": provider.fail_status, "message": "upstream error"})
+                elif not location or location in provider.unknown_locations:
+                    self._reply(404, {"cod": "404", "message": "city not found"})
+                else:
+                    self._reply(200, {"name": location, "main": {"temp": 288.15},
+                                      "weather": [{"main": "Clear", "description": f"clear sky in {location}"}]})
+
+            def _reply(self, status, body):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                try:
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up (timeout) before the reply was ready
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--fail-rate', type=float, default=0.0)
+    args = parser.parse_args()
+    provider = FakeWeatherProvider(args.host, args.port, args.latency, args.fail_rate)
+    print(f"Serving fake weather on {provider.url}")
+    provider._server.serve_forever()
@@ -0,0 +1,76 @@
+import json
+import time
+import unittest
+
+from tests.app_client import make_async_app
+
+
+class TestAsgiApp(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.app = make_async_app(ADMISSION_MAX_IN_FLIGHT=5, ADMISSION_MAX_QUEUE_MS=100)
+        self.context = self.app.test_app()
+        await self.context.__aenter__()
+        self.client = self.app.test_client()
+        await self.client.post('/auth/register', json={'username': 'alice', 'password': 'secret'})
+        response = await self.client.post('/auth/login', json={'username': 'alice', 'password': 'secret'})
+        self.headers = {'Authorization': 'Bearer ' + (await response.get_json())['access_token']}
+
+    async def asyncTearDown(self):
+        await self.context.__aexit__(None, None, None)
+
+    async def test_bulk_and_export(self):
+        response = await self.client.post('/tasks/bulk', headers=self.headers, json={
+            'create': [{'description': 'Buy milk', 'completed': False, 'due_date': '2025-01-01'},
+                       {'description': 'No dates'}],
+            'delete': [99]})
+        self.assertEqual(response.status_code, 200)
+        results = await response.get_json()
+        self.assertEqual([item['status'] for item in results['create']], [201, 400])
+        self.assertEqual(results['delete'], [{'index': 0, 'id': 99, 'status': 404}])
+
+        response = await self.client.get('/tasks/export?format=ndjson', headers=self.headers)
+        lines = (await response.get_data(as_text=True)).splitlines()
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        self.assertEqual([json.loads(line) for line in lines], [
+            {'id': results['create'][0]['id'], 'description': 'Buy milk', 'completed': False,
+             'due_date': '2025-01-01', 'location': None}])
+        response = await self.client.get('/tasks/export?format=json', headers=self.headers)
+        self.assertEqual(json.loads(await response.get_data(as_text=True)), [json.loads(line) for line in lines])
+
+        response = await self.client.post('/tasks/bulk', headers=self.headers, json=[])
+        self.assertEqual(response.status_code, 400)
+
+    async def test_create_and_update_match_the_sync_routes(self):
+        response = await self.client.post('/tasks/tasks/', headers=self.headers, json={
+            'description': 'Call', 'completed': 'false', 'due_date': '2025-03-01'})
+        self.assertEqual(response.status_code, 201)
+        response = await self.client.post('/tasks/tasks/', headers=self.headers, json={
+            'id': 7, 'description': 'Pay', 'completed': False, 'due_date': '2025-03-02'})
+        self.assertEqual(response.status_code, 201)
+        for body, status in [({'description': 'x', 'completed': False}, 400),
+                             ({'id': 7, 'description': 'x', 'completed': False, 'due_date': '2025-03-01'}, 409)]:
+            response = await self.client.post('/tasks/tasks/', headers=self.headers, json=body)
+            self.assertEqual(response.status_code, status, body)
+        response = await self.client.post('/tasks/tasks/', headers=self.headers, json={'description': 'x'})
+        self.assertEqual((await response.get_json())['error'], "Missing fields: completed, due_date")
+
+        response = await self.client.put('/tasks/tasks/7', headers=self.headers, json={'completed': 'TRUE'})
+        self.assertEqual(await response.get_json(), {'id': 7, 'description': 'Pay', 'completed': True,
+                                                     'due_date': '2025-03-02'})
+        response = await self.client.put('/tasks/tasks/7', headers=self.headers, json={'completed': 'maybe'})
+        self.assertEqual(response.status_code, 400)
+        response = await self.client.put('/tasks/tasks/99', headers=self.headers, json={'completed': True})
+        self.assertEqual(response.status_code, 404)
+
+    async def test_admission_sheds_queued_requests(self):
+        queued = {'X-Request-Start': f"t={time.time() - 1:.3f}"}
+        response = await self.client.get('/tasks/', headers=dict(self.headers, **queued))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], '1')
+        response = await self.client.get('/pool_status', headers=queued) # exempt
+        self.assertEqual(response.status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
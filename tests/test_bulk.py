@@ -0,0 +1,100 @@
+import unittest
+from unittest.mock import patch
+
+from sqlalchemy.exc import IntegrityError
+
+from tests.app_client import close_app, login, make_app
+
+
+class TestBulkTasks(unittest.TestCase):
+
+    def setUp(self):
+        self.app = make_app(TASKS_BULK_MAX_ITEMS=10)
+        self.client = self.app.test_client()
+        self.alice = login(self.client, 'alice')
+        self.bob = login(self.client, 'bob')
+        self.existing = self.bulk(self.alice, create=[
+            {'description': 'Keep', 'completed': False, 'due_date': '2025-01-01'},
+            {'description': 'Drop', 'completed': False, 'due_date': '2025-01-02'}]).get_json()
+        self.bobs = self.bulk(self.bob, create=[
+            {'description': "Bob's", 'completed': False, 'due_date': '2025-01-03'}]).get_json()
+
+    def tearDown(self):
+        close_app(self.app)
+
+    def bulk(self, headers, **body):
+        return self.client.post('/tasks/bulk', json=body, headers=headers)
+
+    def tasks(self, headers):
+        response = self.client.get('/tasks/?fields=id,description,completed', headers=headers)
+        return response.headers['X-Tasks-Version'], response.get_json()['tasks']
+
+    def test_mixed_batch_reports_each_item(self):
+        keep_id, drop_id = [item['id'] for item in self.existing['create']]
+        response = self.bulk(self.alice,
+                             create=[{'description': 'New', 'completed': 'true', 'due_date': '2025-02-01'}],
+                             update=[{'id': keep_id, 'completed': True}],
+                             delete=[drop_id, {'id': 12345}])
+        self.assertEqual(response.status_code, 200)
+        results = response.get_json()
+        new_id = results['create'][0]['id']
+        self.assertEqual(results['create'], [{'index': 0, 'status': 201, 'id': new_id}])
+        self.assertEqual(results['update'], [{'index': 0, 'id': keep_id, 'status': 200}])
+        self.assertEqual(results['delete'], [{'index': 0, 'id': drop_id, 'status': 204},
+                                             {'index': 1, 'id': 12345, 'status': 404}])
+        _, tasks = self.tasks(self.alice)
+        self.assertEqual(tasks, [{'id': keep_id, 'description': 'Keep', 'completed': True},
+                                 {'id': new_id, 'description': 'New', 'completed': True}])
+
+    def test_other_users_tasks_are_not_found(self):
+        bobs_id = self.bobs['create'][0]['id']
+        results = self.bulk(self.alice, update=[{'id': bobs_id, 'description': 'Mine now'}],
+                            delete=[bobs_id]).get_json()
+        self.assertEqual(results['update'], [{'index': 0, 'id': bobs_id, 'status': 404}])
+        self.assertEqual(results['delete'], [{'index': 0, 'id': bobs_id, 'status': 404}])
+        _, tasks = self.tasks(self.bob)
+        self.assertEqual(tasks, [{'id': bobs_id, 'description': "Bob's", 'completed': False}])
+
+    def test_invalid_items_and_requests(self):
+        version, before = self.tasks(self.alice)
+        results = self.bulk(self.alice,
+                            create=[{'description': 'No dates'},
+                                    {'description': 'Bad date', 'completed': False, 'due_date': 'soon'},
+                                    'not an object'],
+                            update=[{'completed': True}, {'id': 'x'}],
+                            delete=['nope']).get_json()
+        self.assertEqual([item['status'] for item in results['create']], [400, 400, 400])
+        self.assertEqual(results['create'][0]['error'], 'Missing fields: completed, due_date')
+        self.assertEqual([item['status'] for item in results['update']], [400, 400])
+        self.assertEqual(results['delete'], [{'index': 0, 'status': 400, 'error': "'id' must be an integer."}])
+        # Nothing valid, nothing written
+        self.assertEqual(self.tasks(self.alice), (version, before))
+
+        self.assertEqual(self.client.post('/tasks/bulk', json=[], headers=self.alice).status_code, 400)
+        self.assertEqual(self.bulk(self.alice, create={}).status_code, 400)
+        self.assertEqual(self.bulk(self.alice, delete=list(range(11))).status_code, 413)
+
+    def test_database_error_rolls_back_the_whole_batch(self):
+        keep_id, drop_id = [item['id'] for item in self.existing['create']]
+        version, before = self.tasks(self.alice)
+        batch = {'create': [{'description': 'New', 'completed': False, 'due_date': '2025-02-01'}],
+                 'update': [{'id': keep_id, 'description': 'Changed'}],
+                 'delete': [drop_id]}
+        # Fails after the insert, update and delete have run
+        with patch('app.tasks.bulk.changes.log_task_changes',
+                   side_effect=IntegrityError("INSERT INTO task_changes", {}, Exception("constraint failed"))):
+            response = self.bulk(self.alice, **batch)
+        self.assertEqual(response.status_code, 409)
+        self.assertIn('no changes applied', response.get_json()['error'])
+        self.assertEqual(self.tasks(self.alice), (version, before))
+
+        # A create reusing an existing id fails in the database too
+        response = self.bulk(self.alice, create=[
+            {'id': keep_id, 'description': 'Duplicate', 'completed': False, 'due_date': '2025-02-01'}],
+            delete=[drop_id])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.tasks(self.alice), (version, before))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+from datetime import date
+
+from sqlalchemy import create_engine, delete, insert, update
+from sqlalchemy.orm import Session
+
+from app import migrations
+from app.models import Task, User
+from app.tasks import changes, repository
+
+
+class TestChangeFeed(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        migrations.upgrade(self.engine)
+        repository.init_statement_cache({})
+        changes.init_changes({'TASK_CHANGES_PAGE_SIZE': 3, 'TASK_CHANGES_RETAIN_VERSIONS': 50})
+        with self.engine.begin() as conn:
+            conn.execute(insert(User).values(id=1, username='a', hashed_password='x'))
+
+    def tearDown(self):
+        changes.init_changes({})
+        self.engine.dispose()
+
+    def write(self, statement, logged):
+        # A task write the way the routes make it: bump the version, log under it, one transaction
+        with Session(self.engine) as session:
+            if statement is not None:
+                session.execute(statement)
+            version = session.scalar(update(User).where(User.id == 1)
+                                     .values(tasks_version=User.tasks_version + 1).returning(User.tasks_version))
+            changes.log_task_changes(session, 1, version, logged)
+            session.commit()
+
+    def create(self, task_id):
+        self.write(insert(Task).values(id=task_id, description=f"task {task_id}", completed=False,
+                                       due_date=date(2025, 1, 1), owner_id=1), [(task_id, 'create')])
+
+    def read(self, since):
+        with self.engine.connect() as conn:
+            return changes.read_changes(conn, 1, since)
+
+    def test_pages_carry_current_state_and_collapse(self):
+        self.create(1)
+        self.create(2)
+        self.write(update(Task).where(Task.id == 1).values(completed=True), [(1, 'update')])
+        self.write(delete(Task).where(Task.id == 2), [(2, 'delete')])
+        page = self.read(0)
+        self.assertEqual(page['next'], 3)
+        self.assertTrue(page['more'])
+        self.assertEqual([(change['id'], change['op']) for change in page['changes']], [(1, 'create'), (2, 'delete')])
+        self.assertTrue(page['changes'][0]['task']['completed'])
+        page = self.read(3)
+        self.assertEqual((page['changes'], page['next'], page['more']), ([{'id': 2, 'op': 'delete'}], 4, False))
+        self.assertEqual(self.read(4), {'changes': [], 'next': 4, 'more': False, 'reset': False})
+
+    def test_a_page_never_splits_a_write(self):
+        self.create(1)
+        self.write(insert(Task).values([{'id': task_id, 'description': 't', 'completed': False, 'owner_id': 1}
+                                        for task_id in range(2, 7)]),
+                   [(task_id, 'create') for task_id in range(2, 7)])
+        page = self.read(0)
+        self.assertEqual((len(page['changes']), page['next'], page['more']), (1, 1, True))
+        page = self.read(1)
+        self.assertEqual((len(page['changes']), page['next'], page['more']), (5, 2, False))
+
+    def test_reset_when_the_log_does_not_reach_back(self):
+        for task_id in range(1, 101):
+            self.write(None, [(task_id, 'update')])
+        self.assertTrue(self.read(10)['reset'])
+        self.assertFalse(self.read(60)['reset'])
+        self.assertEqual(self.read(None), {'changes': [], 'next': 100, 'more': False, 'reset': True})
+        self.assertTrue(self.read(101)['reset'])
+
+    def test_parse_since(self):
+        self.assertIsNone(changes.parse_since(None))
+        self.assertEqual(changes.parse_since('7'), 7)
+        for value in ('-1', 'x'):
+            with self.assertRaises(ValueError):
+                changes.parse_since(value)
+
+
+if __name__ == '__main__':
+    unittest.main()
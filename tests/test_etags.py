@@ -0,0 +1,86 @@
+import time
+import unittest
+
+from app.utils import api_clients
+from tests.app_client import close_app, login, make_app
+
+
+class TestTaskETags(unittest.TestCase):
+
+    def setUp(self):
+        self.app = make_app()
+        self.client = self.app.test_client()
+        self.headers = login(self.client, 'alice')
+        self.create(1, location=None)
+
+    def tearDown(self):
+        close_app(self.app)
+
+    def create(self, task_id, location):
+        task = {'id': task_id, 'description': f'Task {task_id}', 'completed': False, 'due_date': '2025-01-01'}
+        if location is not None:
+            task['location'] = location
+        response = self.client.post('/tasks/tasks/', json=task, headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+
+    def get(self, path, etag=None):
+        headers = dict(self.headers, **({'If-None-Match': etag} if etag else {}))
+        return self.client.get(path, headers=headers)
+
+    def test_not_modified_until_a_write(self):
+        for path in ('/tasks/?fields=id,description', '/tasks/1', '/tasks/stats'):
+            first = self.get(path)
+            etag = first.headers['ETag'].strip('"')
+            again = self.get(path, etag)
+            self.assertEqual(again.status_code, 304, path)
+            self.assertEqual(again.data, b'')
+            self.assertEqual(again.headers['ETag'], first.headers['ETag'])
+
+        etag = self.get('/tasks/?fields=id,description').headers['ETag'].strip('"')
+        self.create(2, location=None)
+        after = self.get('/tasks/?fields=id,description', etag)
+        self.assertEqual(after.status_code, 200)
+        self.assertNotEqual(after.headers['ETag'].strip('"'), etag)
+        self.assertEqual([task['id'] for task in after.get_json()['tasks']], [1, 2])
+
+    def test_other_representations_get_other_etags(self):
+        etags = {self.get(path).headers['ETag'] for path in
+                 ('/tasks/?fields=id', '/tasks/?fields=id,description', '/tasks/?fields=id&limit=1')}
+        self.assertEqual(len(etags), 3)
+
+    def test_unavailable_weather_gets_no_etag(self):
+        # Nothing listens on the test WEATHER_API_URL: the lookup fails
+        self.create(2, location='Oslo')
+        response = self.get('/tasks/2')
+        self.assertEqual(response.get_json()['weather'], 'unavailable')
+        self.assertNotIn('ETag', response.headers)
+        response = self.get('/tasks/')
+        self.assertEqual(response.get_json()['tasks'][1]['weather'], 'unavailable')
+        self.assertNotIn('ETag', response.headers)
+        self.assertNotIn('ETag', self.get('/tasks/search?q=task').headers)
+
+        # Once the report is in, the same read is cacheable again
+        api_clients.weather_cache.prime('Oslo', 'Clear', time.time())
+        response = self.get('/tasks/2')
+        self.assertEqual(response.get_json()['weather'], 'Clear')
+        self.assertEqual(self.get('/tasks/2', response.headers['ETag'].strip('"')).status_code, 304)
+
+
+class TestPendingWeatherETags(unittest.TestCase):
+
+    def test_pending_weather_gets_no_etag(self):
+        app = make_app(WEATHER_JOBS='worker')
+        try:
+            client = app.test_client()
+            headers = login(client, 'alice')
+            client.post('/tasks/tasks/', headers=headers, json={
+                'id': 1, 'description': 'Walk', 'completed': False, 'due_date': '2025-01-01', 'location': 'Lima'})
+            response = client.get('/tasks/', headers=headers)
+            self.assertEqual(response.get_json()['tasks'][0]['weather'], 'pending')
+            self.assertNotIn('ETag', response.headers)
+        finally:
+            close_app(app)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import json
+import time
+import unittest
+
+from app.utils import api_clients
+from tests.app_client import close_app, login, make_app
+
+
+class TestExport(unittest.TestCase):
+
+    def setUp(self):
+        # Batches of 3 so the 8 tasks span several, including a partial last one
+        self.app = make_app(TASKS_EXPORT_BATCH_SIZE=3, TASKS_PAGE_MAX_LIMIT=100)
+        self.client = self.app.test_client()
+        self.headers = login(self.client, 'alice')
+
+    def tearDown(self):
+        close_app(self.app)
+
+    def add_tasks(self):
+        self.client.post('/tasks/bulk', headers=self.headers, json={'create': [
+            {'description': f'Task "{i}" ✓', 'completed': i % 2 == 0, 'due_date': f'2025-03-{i:02d}',
+             'location': ['Oslo', 'Rome', None][i % 3]} for i in range(1, 9)]})
+        self.client.post('/tasks/bulk', headers=login(self.client, 'bob'), json={'create': [
+            {'description': "Bob's", 'completed': False, 'due_date': '2025-03-01'}]})
+
+    def export(self, query):
+        response = self.client.get('/tasks/export?' + query, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def listed(self, query):
+        return self.client.get('/tasks/?limit=100&' + query, headers=self.headers).get_json()['tasks']
+
+    def test_ndjson_matches_the_list(self):
+        self.add_tasks()
+        response = self.export('format=ndjson')
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        body = response.get_data(as_text=True)
+        self.assertTrue(body.endswith('\n'))
+        exported = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(len(exported), 8)
+        self.assertEqual(exported, self.listed('fields=id,description,completed,due_date,location'))
+
+    def test_json_matches_the_list(self):
+        self.add_tasks()
+        response = self.export('format=json')
+        self.assertEqual(response.mimetype, 'application/json')
+        self.assertEqual(json.loads(response.get_data(as_text=True)),
+                         self.listed('fields=id,description,completed,due_date,location'))
+
+    def test_with_weather_matches_the_full_list(self):
+        self.add_tasks()
+        for location in ('Oslo', 'Rome'):
+            api_clients.weather_cache.prime(location, f'Clear in {location}', time.time())
+        exported = [json.loads(line) for line in
+                    self.export('format=ndjson&weather=true').get_data(as_text=True).splitlines()]
+        self.assertEqual(exported, self.listed(''))
+        self.assertEqual({task.get('weather') for task in exported}, {'Clear in Oslo', 'Clear in Rome', None})
+        exported = json.loads(self.export('format=json&weather=true').get_data(as_text=True))
+        self.assertEqual(exported, self.listed(''))
+
+    def test_empty_and_invalid(self):
+        self.assertEqual(self.export('format=ndjson').get_data(as_text=True), '')
+        self.assertEqual(json.loads(self.export('format=json').get_data(as_text=True)), [])
+        response = self.client.get('/tasks/export?format=csv', headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
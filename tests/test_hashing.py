@@ -0,0 +1,98 @@
+import asyncio
+import time
+import unittest
+
+from sqlalchemy import select
+
+from app import db_session
+from app.auth import hashing
+from app.auth.hashing import HashingBusy, PasswordHasher
+from app.models import User
+from tests.app_client import close_app, make_app
+
+
+class TestPasswordHasher(unittest.TestCase):
+
+    def test_busy_when_no_capacity(self):
+        hasher = PasswordHasher(4, pool_workers=0, queue_limit=1)
+        hasher._capacity.acquire() # another request is hashing
+        with self.assertRaises(HashingBusy):
+            hasher.hash('secret')
+        hasher._capacity.release()
+        self.assertTrue(hasher.verify_and_update('secret', hasher.hash('secret'))[0])
+
+    def test_outdated_cost_is_rehashed(self):
+        old = PasswordHasher(4, pool_workers=0).hash('secret')
+        valid, new_hash = PasswordHasher(5, pool_workers=0).verify_and_update('secret', old)
+        self.assertTrue(valid)
+        self.assertTrue(new_hash.startswith('$2b$05$'))
+        self.assertEqual(PasswordHasher(4, pool_workers=0).verify_and_update('secret', old), (True, None))
+
+    def test_sync_callers_hash_inline(self):
+        hasher = PasswordHasher(4, pool_workers=2)
+        self.assertTrue(hasher.verify_and_update('secret', hasher.hash('secret'))[0])
+        self.assertIsNone(hasher._executor) # no pool started for a caller that would wait anyway
+
+
+class TestAsyncPasswordHasher(unittest.IsolatedAsyncioTestCase):
+
+    async def test_pool_round_trip(self):
+        hasher = PasswordHasher(4, pool_workers=1)
+        try:
+            hashed = await hasher.ahash('secret')
+            self.assertEqual(await hasher.averify_and_update('secret', hashed), (True, None))
+            self.assertIsNotNone(hasher._executor)
+        finally:
+            hasher.shutdown()
+
+    async def test_timeout_without_a_pool(self):
+        hasher = PasswordHasher(4, pool_workers=0, queue_limit=1, timeout=0.05)
+        started = time.monotonic()
+        with self.assertRaises(HashingBusy):
+            await hasher._arun(time.sleep, 0.5)
+        self.assertLess(time.monotonic() - started, 0.4)
+        self.assertTrue((await hasher.averify_and_update('secret', hasher.hash('secret')))[0]) # capacity released
+
+    async def test_busy_when_no_capacity(self):
+        hasher = PasswordHasher(4, pool_workers=0, queue_limit=1)
+        slow = asyncio.ensure_future(hasher._arun(time.sleep, 0.2))
+        await asyncio.sleep(0.05)
+        with self.assertRaises(HashingBusy):
+            await hasher.ahash('secret')
+        await slow
+
+
+class TestAuthRoutes(unittest.TestCase):
+
+    def setUp(self):
+        self.app = make_app(HASH_QUEUE_LIMIT=1)
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        close_app(self.app)
+
+    def test_busy_hasher_answers_429(self):
+        self.client.post('/auth/register', json={'username': 'a', 'password': 'secret'})
+        hashing.password_hasher._capacity.acquire() # the only hashing slot is taken
+        try:
+            for route, username in (('/auth/register', 'b'), ('/auth/login', 'a')):
+                response = self.client.post(route, json={'username': username, 'password': 'secret'})
+                self.assertEqual(response.status_code, 429, route)
+                self.assertEqual(response.headers['Retry-After'], '1')
+        finally:
+            hashing.password_hasher._capacity.release()
+        self.assertEqual(self.client.post('/auth/register', json={'username': 'b', 'password': 'secret'}).status_code,
+                         201)
+
+    def test_login_rehashes_an_outdated_hash(self):
+        self.client.post('/auth/register', json={'username': 'a', 'password': 'secret'})
+        hashing.password_hasher.rounds = 5 # BCRYPT_ROUNDS raised since the user registered
+        response = self.client.post('/auth/login', json={'username': 'a', 'password': 'secret'})
+        self.assertEqual(response.status_code, 200)
+        stored = db_session.scalar(select(User.hashed_password).where(User.username == 'a'))
+        self.assertTrue(stored.startswith('$2b$05$'))
+        self.assertEqual(self.client.post('/auth/login', json={'username': 'a', 'password': 'secret'}).status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+
+from flask import Flask, jsonify
+from sqlalchemy import create_engine, text
+
+from app.instrumentation import Metrics, init_instrumentation, phase
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        self.app = Flask(__name__)
+        init_instrumentation(self.app, self.engine)
+
+        @self.app.route("/work")
+        def work():
+            with self.engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+                conn.execute(text("SELECT 2"))
+            with phase("weather"):
+                with phase("weather"):
+                    pass
+            return jsonify({"ok": True})
+
+        self.client = self.app.test_client()
+
+    def test_server_timing_header(self):
+        header = self.client.get("/work").headers["Server-Timing"]
+        self.assertIn('db;dur=', header)
+        self.assertIn('desc="2 queries"', header)
+        self.assertIn('weather;dur=', header)
+        self.assertIn('serialize;dur=', header)
+        self.assertIn('total;dur=', header)
+
+    def test_metrics_endpoint(self):
+        self.client.get("/work")
+        body = self.client.get("/metrics").get_data(as_text=True)
+        self.assertIn('http_requests_total{endpoint="/work",method="GET",status="200"}', body)
+        self.assertIn('http_request_phase_calls_total{endpoint="/work",phase="db"}', body)
+        self.assertIn('http_request_duration_seconds_bucket{endpoint="/work",le="+Inf"}', body)
+
+    def test_phase_outside_request_is_noop(self):
+        with phase("db"):
+            pass
+
+    def test_histogram_buckets(self):
+        metrics = Metrics(buckets=(0.1, 1.0))
+        metrics.observe("latency", 0.5)
+        metrics.observe("latency", 2.0)
+        body = metrics.render()
+        self.assertIn('latency_bucket{le="0.1"} 0', body)
+        self.assertIn('latency_bucket{le="1.0"} 1', body)
+        self.assertIn('latency_bucket{le="+Inf"} 2', body)
+        self.assertIn('latency_count 2', body)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+from datetime import date
+
+from sqlalchemy import create_engine, select, text
+
+from app import migrations
+from app.models import Task
+
+
+class TestSchemaCheck(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+
+    def tearDown(self):
+        self.engine.dispose()
+
+    def test_verify_refuses_pending_migrations(self):
+        with self.assertRaises(RuntimeError):
+            migrations.check_schema(self.engine, 'verify')
+
+    def test_upgrade_then_nothing_pending(self):
+        applied = migrations.check_schema(self.engine, 'upgrade')
+        self.assertEqual(applied, [version for version, _, _ in migrations.MIGRATIONS])
+        self.assertEqual(migrations.pending(self.engine), [])
+        self.assertEqual(migrations.upgrade(self.engine), [])
+        migrations.check_schema(self.engine, 'verify')
+
+    def test_off_touches_nothing(self):
+        self.assertEqual(migrations.check_schema(self.engine, 'off'), [])
+        self.assertEqual(len(migrations.pending(self.engine)), len(migrations.MIGRATIONS))
+
+
+
+class TestDueDateMigration(unittest.TestCase):
+
+    def test_legacy_free_text_due_dates(self):
+        engine = create_engine("sqlite://")
+        migrations.upgrade(engine, target=1)
+        legacy = ['2024-05-12', ' 2024-05-13T10:00:00', '', 'next friday', '12/05/2024', '2024-02-30', None]
+        with engine.begin() as conn:
+            conn.execute(text("INSERT INTO users (id, username) VALUES (1, 'a')"))
+            conn.execute(text("INSERT INTO task_data (id, description, due_date, owner_id) VALUES (:id, 't', :due, 1)"),
+                         [{'id': i, 'due': value} for i, value in enumerate(legacy, 1)])
+        migrations.upgrade(engine)
+        with engine.connect() as conn:
+            # Read through the DATE column type, as the list endpoint does
+            due_dates = conn.execute(select(Task.due_date).order_by(Task.id)).scalars().all()
+        self.assertEqual(due_dates, [date(2024, 5, 12), date(2024, 5, 13), None, None, None, None, None])
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    unittest.main()
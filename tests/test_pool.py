@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+
+from app.database import build_engine, pool_status, worker_pool_size
+from tests.app_client import close_app, make_app
+
+
+class TestWorkerPoolSize(unittest.TestCase):
+
+    def test_even_share_of_the_connection_budget(self):
+        for workers, expected in [(1, 78), (2, 38), (4, 18), (8, 8), (16, 3)]:
+            config = {'DB_MAX_CONNECTIONS': 80, 'WEB_CONCURRENCY': workers, 'DB_MAX_OVERFLOW': 2}
+            size = worker_pool_size(config)
+            self.assertEqual(size, expected, workers)
+            self.assertLessEqual(workers * (size + 2), 80, workers)
+
+    def test_explicit_size_and_floor(self):
+        self.assertEqual(worker_pool_size({'DB_POOL_SIZE': 5, 'WEB_CONCURRENCY': 64}), 5)
+        # Fewer connections than workers still leaves each worker one
+        self.assertEqual(worker_pool_size({'DB_MAX_CONNECTIONS': 10, 'WEB_CONCURRENCY': 40, 'DB_MAX_OVERFLOW': 2}), 1)
+        self.assertEqual(worker_pool_size({'DB_MAX_CONNECTIONS': 10, 'WEB_CONCURRENCY': 0}), 10)
+
+    def test_engine_uses_the_share(self):
+        engine = build_engine({'DB_MAX_CONNECTIONS': 20, 'WEB_CONCURRENCY': 4, 'DB_MAX_OVERFLOW': 1},
+                              "sqlite:///" + os.path.join(tempfile.mkdtemp(), "tasks.db"))
+        try:
+            self.assertEqual(engine.pool.size(), 4)
+            self.assertEqual(engine.pool._max_overflow, 1)
+        finally:
+            engine.dispose()
+
+
+class TestPoolStatus(unittest.TestCase):
+
+    def test_counts_follow_checkouts(self):
+        engine = build_engine({'DB_POOL_SIZE': 2, 'DB_MAX_OVERFLOW': 1},
+                              "sqlite:///" + os.path.join(tempfile.mkdtemp(), "tasks.db"))
+        try:
+            first, second, third = engine.connect(), engine.connect(), engine.connect()
+            status = pool_status(engine)
+            self.assertEqual(status['pool'], 'QueuePool')
+            self.assertEqual((status['size'], status['checked_out'], status['overflow_in_use'], status['max_overflow']),
+                             (2, 3, 1, 1))
+            for conn in (first, second, third):
+                conn.close()
+            status = pool_status(engine)
+            self.assertEqual((status['checked_out'], status['overflow_in_use']), (0, 0))
+            self.assertEqual(status['checked_in'], 2) # the overflow connection was closed, not kept
+        finally:
+            engine.dispose()
+
+    def test_in_memory_pool_has_no_counts(self):
+        engine = build_engine({}, "sqlite://")
+        try:
+            status = pool_status(engine)
+            self.assertNotEqual(status['pool'], 'QueuePool')
+            self.assertNotIn('size', status)
+        finally:
+            engine.dispose()
+
+    def test_endpoint(self):
+        app = make_app(DB_POOL_SIZE=3, DB_MAX_OVERFLOW=1)
+        try:
+            response = app.test_client().get('/pool_status')
+            self.assertEqual(response.status_code, 200)
+            body = response.get_json()
+            self.assertEqual((body['pool'], body['size'], body['max_overflow'], body['checked_out']),
+                             ('QueuePool', 3, 1, 0))
+            self.assertNotIn('replicas', body)
+        finally:
+            close_app(app)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from app.ratelimit import (Admission, MemoryBuckets, RateLimited, RateLimiter, SQLiteBuckets,
+                           build_admission, build_backend, parse_request_start)
+from config import Config
+from app.utils.slots import SlotLock, fcntl
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def test_burst_then_refill(self):
+        limiter = RateLimiter(MemoryBuckets(), {'user': (2.0, 3)})
+        with patch('app.ratelimit.time.time', return_value=1000.0):
+            for _ in range(3):
+                limiter.check('user', 1)
+            with self.assertRaises(RateLimited) as raised:
+                limiter.check('user', 1)
+            self.assertEqual(raised.exception.retry_after, 1)
+            limiter.check('user', 2) # other keys have their own bucket
+        with patch('app.ratelimit.time.time', return_value=1000.5):
+            limiter.check('user', 1) # one token refilled after 0.5s at 2/s
+        self.assertEqual(limiter.stats(), {('user', 'allowed'): 5, ('user', 'limited'): 1})
+
+    def test_unconfigured_rule_never_limits(self):
+        limiter = RateLimiter(MemoryBuckets(), {'user': (0, 1)})
+        for _ in range(10):
+            limiter.check('user', 1)
+            limiter.check('auth_ip', '127.0.0.1')
+        self.assertEqual(limiter.stats(), {})
+
+    def test_sqlite_buckets_are_shared(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'ratelimit.db')
+            first, second = SQLiteBuckets(path), SQLiteBuckets(path)
+            self.assertEqual(first.take('auth_ip:10.0.0.1', 1.0, 2), 0)
+            self.assertEqual(second.take('auth_ip:10.0.0.1', 1.0, 2), 0)
+            self.assertGreater(first.take('auth_ip:10.0.0.1', 1.0, 2), 0)
+
+    def test_memory_is_the_default_backend(self):
+        self.assertEqual(Config.RATE_LIMIT_BACKEND, 'memory')
+        self.assertIsInstance(build_backend({}), MemoryBuckets)
+
+    def test_backend_errors_fail_open(self):
+        class Broken:
+            def take(self, key, rate, burst):
+                raise OSError("store unavailable")
+        limiter = RateLimiter(Broken(), {'user': (1.0, 1)})
+        limiter.check('user', 1)
+        self.assertEqual(limiter.stats(), {('user', 'error'): 1})
+
+
+class TestAdmission(unittest.TestCase):
+
+    def test_in_flight_bound(self):
+        admission = Admission(max_in_flight=1)
+        self.assertIsNone(admission.try_enter())
+        self.assertEqual(admission.try_enter(), 'in_flight')
+        admission.leave()
+        self.assertIsNone(admission.try_enter())
+
+    @unittest.skipIf(fcntl is None, "lock-file slots need fcntl")
+    def test_in_flight_bound_is_shared_by_processes(self):
+        # Two workers on the host: the slot taken by one is not available to the other
+        directory = tempfile.mkdtemp()
+        first = Admission(max_in_flight=1, slots=SlotLock(directory, 1, name='admission-slot'))
+        second = Admission(max_in_flight=1, slots=SlotLock(directory, 1, name='admission-slot'))
+        self.assertIsNone(first.try_enter())
+        self.assertEqual(second.try_enter(), 'in_flight')
+        first.leave()
+        self.assertIsNone(second.try_enter())
+        second.leave()
+
+    @unittest.skipIf(fcntl is None, "lock-file slots need fcntl")
+    def test_slots_live_in_the_app_run_dir(self):
+        directory = os.path.join(tempfile.mkdtemp(), 'run') # created on first use
+        admission = build_admission({'ADMISSION_MAX_IN_FLIGHT': 2, 'RUN_DIR': directory})
+        self.assertEqual([os.path.dirname(path) for path in admission.slots.paths], [directory, directory])
+        self.assertIsNone(admission.try_enter())
+        admission.leave()
+        other = os.path.join(directory, 'admission')
+        admission = build_admission({'ADMISSION_MAX_IN_FLIGHT': 1, 'RUN_DIR': directory, 'ADMISSION_SLOT_DIR': other})
+        self.assertEqual(os.path.dirname(admission.slots.paths[0]), other)
+
+    def test_queue_time_bound(self):
+        admission = Admission(max_queue_seconds=0.2)
+        now = 1700000000.0
+        self.assertEqual(admission.try_enter(parse_request_start('t=1699999999500', now=now)), 'queue_time') # ms
+        self.assertIsNone(admission.try_enter(parse_request_start('t=1699999999.95', now=now)))
+        self.assertIsNone(admission.try_enter(None))
+        self.assertEqual(admission.stats()['current'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from sqlalchemy import Select, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.database import (ReplicaSet, RoutingSession, StickyWrites, build_engine, build_replica_set,
+                          mark_written, replica_reads)
+from app.models import Base, User
+
+
+class TestReplicaRouting(unittest.TestCase):
+    """Primary and replicas are separate SQLite files holding different usernames."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.engines = {}
+        for name in ('primary', 'replica1', 'replica2'):
+            engine = build_engine({}, "sqlite:///" + os.path.join(self.tmp.name, f"{name}.db"))
+            Base.metadata.create_all(engine)
+            with engine.begin() as conn:
+                conn.execute(insert(User), [{"id": 1, "username": name, "hashed_password": "x"}])
+            self.engines[name] = engine
+
+    def tearDown(self):
+        for engine in self.engines.values():
+            engine.dispose()
+        self.tmp.cleanup()
+
+    def make_session(self, replicas):
+        replica_set = ReplicaSet(self.engines['primary'], replicas, StickyWrites(window=60))
+        replica_set.check_all() # what the background checker does first
+        Session = sessionmaker(class_=RoutingSession, bind=self.engines['primary'], info={'replicas': replica_set})
+        return replica_set, Session
+
+    def username(self, session):
+        name = session.scalar(Select(User.username).where(User.id == 1))
+        session.rollback()
+        return name
+
+    def test_reads_in_scope_go_to_replicas_round_robin(self):
+        _, Session = self.make_session([self.engines['replica1'], self.engines['replica2']])
+        session = Session()
+        self.assertEqual(self.username(session), 'primary')
+        with replica_reads(1):
+            seen = [self.username(session) for _ in range(4)]
+        self.assertEqual(seen, ['replica1', 'replica2', 'replica1', 'replica2'])
+        session.close()
+
+    def test_writer_reads_from_primary_after_commit(self):
+        _, Session = self.make_session([self.engines['replica1']])
+        session = Session()
+        session.add(User(id=2, username='new', hashed_password='x'))
+        mark_written(session, 1)
+        session.commit()
+        with self.engines['primary'].connect() as conn:
+            self.assertEqual(conn.scalar(Select(User.username).where(User.id == 2)), 'new')
+        with replica_reads(1):
+            self.assertEqual(self.username(session), 'primary')
+        with replica_reads(2):
+            self.assertEqual(self.username(session), 'replica1')
+        session.close()
+
+    def test_unreachable_replica_falls_back_to_primary(self):
+        broken = build_engine({}, "sqlite:///" + os.path.join(self.tmp.name, "missing", "replica.db"))
+        replica_set, Session = self.make_session([broken])
+        session = Session()
+        with replica_reads(1):
+            self.assertEqual(self.username(session), 'primary')
+        status = replica_set.status()[0]
+        self.assertFalse(status['healthy'])
+        self.assertIsNotNone(status['error'])
+        session.close()
+        broken.dispose()
+
+    def test_unchecked_replicas_are_not_used(self):
+        replica_set = ReplicaSet(self.engines['primary'], [self.engines['replica1']], StickyWrites(window=60))
+        with patch.object(ReplicaSet, '_start_checks'):
+            self.assertIs(replica_set.read_engine(1), self.engines['primary'])
+        replica_set.check_all()
+        self.assertIs(replica_set.read_engine(1), self.engines['replica1'])
+
+    def test_write_marks_are_shared_by_workers(self):
+        path = os.path.join(self.tmp.name, 'sticky.db')
+        StickyWrites(window=60, path=path).mark(1)
+        other_worker = StickyWrites(window=60, path=path)
+        self.assertTrue(other_worker.active(1))
+        self.assertFalse(other_worker.active(2))
+
+    def test_several_workers_need_a_shared_marks_file(self):
+        config = {'DATABASE_REPLICA_URLS': 'sqlite:///' + os.path.join(self.tmp.name, 'replica1.db'),
+                  'WEB_CONCURRENCY': 4, 'READ_YOUR_WRITES_PATH': ''}
+        with self.assertRaises(RuntimeError):
+            build_replica_set(config, self.engines['primary'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+from datetime import date
+
+from sqlalchemy import create_engine, delete, insert, update
+
+from app import migrations
+from app.models import Task, User
+from app.tasks import repository, search
+
+DESCRIPTIONS = ['Call the supplier about order', 'call mom', 'Order pizza tonight',
+                'Café crème meeting', 'order order order', 'ordinary day']
+
+
+def page(limit=10, cursor=None):
+    return {'fields': ['id'], 'cursor': cursor, 'completed': None, 'due_after': None,
+            'due_before': None, 'location': None, 'limit': limit}
+
+
+class TestTaskSearch(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        migrations.upgrade(self.engine)
+        repository.init_statement_cache({})
+        with self.engine.begin() as conn:
+            conn.execute(insert(User), [{'id': 1, 'username': 'a', 'hashed_password': 'x'},
+                                        {'id': 2, 'username': 'b', 'hashed_password': 'x'}])
+            conn.execute(insert(Task), [{'id': i, 'description': text, 'completed': False,
+                                         'due_date': date(2025, 1, 1), 'owner_id': 1}
+                                        for i, text in enumerate(DESCRIPTIONS, 1)])
+            conn.execute(insert(Task), [{'id': 99, 'description': 'order stuff', 'completed': False,
+                                         'due_date': date(2025, 1, 1), 'owner_id': 2}])
+
+    def tearDown(self):
+        self.engine.dispose()
+
+    def ids(self, owner_id, q, params=None):
+        with self.engine.connect() as conn:
+            _, rows = search.search_tasks(conn, owner_id, search.parse_search_terms(q), params or page())
+        return [row.id for row in rows]
+
+    def test_ranking_and_diacritics(self):
+        self.assertEqual(self.ids(1, 'order'), [5, 3, 1])
+        self.assertEqual(self.ids(1, 'cafe'), [4])
+        self.assertEqual(self.ids(1, 'CRÈME'), [4])
+        self.assertEqual(self.ids(1, 'call order'), [1])
+        self.assertEqual(self.ids(1, 'nothing'), [])
+
+    def test_last_word_is_a_prefix_the_others_whole_words(self):
+        self.assertEqual(self.ids(1, 'ord'), [5, 6, 3, 1])
+        self.assertEqual(self.ids(1, 'ord call'), [])
+        self.assertEqual(self.ids(1, 'order ca'), [1])
+
+    def test_owner_isolation_and_paging(self):
+        self.assertEqual(self.ids(2, 'ord'), [99])
+        self.assertEqual(self.ids(1, 'ord', page(limit=2, cursor=2)), [3, 1])
+        self.assertEqual(self.ids(1, 'ord', page(limit=2, cursor=4)), [])
+
+    def test_index_follows_writes(self):
+        with self.engine.begin() as conn:
+            conn.execute(update(Task).where(Task.id == 2).values(description='order a gift'))
+            conn.execute(delete(Task).where(Task.id == 5))
+        self.assertEqual(sorted(self.ids(1, 'order')), [1, 2, 3])
+        self.assertEqual(self.ids(1, 'mom'), [])
+
+    def test_parse_search_terms(self):
+        self.assertEqual(search.parse_search_terms(' Café, crème! '), ['cafe', 'creme'])
+        with self.assertRaises(ValueError):
+            search.parse_search_terms(' !! ')
+        with self.assertRaises(ValueError):
+            search.parse_search_terms(' '.join('w' * 9))
+
+
+if __name__ == '__main__':
+    unittest.main()
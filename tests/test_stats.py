@@ -0,0 +1,96 @@
+import unittest
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, delete, insert, update
+from sqlalchemy.orm import Session
+
+from app import migrations
+from app.models import Task, User
+from app.tasks import repository, stats
+
+MONDAY = date(2025, 3, 3)
+
+
+class TestTaskStats(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        migrations.upgrade(self.engine)
+        repository.init_statement_cache({})
+        with self.engine.begin() as conn:
+            conn.execute(insert(User), [{'id': 1, 'username': 'a', 'hashed_password': 'x'},
+                                        {'id': 2, 'username': 'b', 'hashed_password': 'x'}])
+
+    def tearDown(self):
+        self.engine.dispose()
+
+    def write(self, owner_id, statement, removed=(), added=(), today=MONDAY):
+        # A task write the way the routes make it: the change and its stats in one transaction
+        with Session(self.engine) as session:
+            session.execute(statement)
+            stats.record_task_changes(session, owner_id, removed, added, today=today)
+            session.commit()
+
+    def create(self, task_id, completed, due_date, owner_id=1, today=MONDAY):
+        self.write(owner_id, insert(Task).values(id=task_id, description='t', completed=completed,
+                                                 due_date=due_date, owner_id=owner_id),
+                   added=[stats.task_state(completed, due_date)], today=today)
+
+    def read(self, owner_id=1, today=MONDAY):
+        with self.engine.connect() as conn:
+            return stats.read_stats(conn, owner_id, today)
+
+    def rebuilt(self, owner_id=1, today=MONDAY):
+        with self.engine.begin() as conn:
+            stats.rebuild_owner_stats(conn, today=today)
+        return self.read(owner_id, today)
+
+    def test_counts_follow_writes(self):
+        self.create(1, False, MONDAY - timedelta(days=2))  # overdue
+        self.create(2, False, MONDAY + timedelta(days=6))  # due Sunday
+        self.create(3, True, MONDAY)
+        self.create(4, False, MONDAY + timedelta(days=7))  # next week
+        self.create(5, False, None, owner_id=2)
+        self.assertEqual(self.read(), {'total': 4, 'completed': 1, 'open': 3, 'overdue': 1, 'due_this_week': 1})
+
+        self.write(1, update(Task).where(Task.id == 1).values(completed=True),
+                   [stats.task_state(False, MONDAY - timedelta(days=2))],
+                   [stats.task_state(True, MONDAY - timedelta(days=2))])
+        self.write(1, update(Task).where(Task.id == 4).values(due_date=MONDAY + timedelta(days=1)),
+                   [stats.task_state(False, MONDAY + timedelta(days=7))],
+                   [stats.task_state(False, MONDAY + timedelta(days=1))])
+        self.write(1, delete(Task).where(Task.id == 3), removed=[stats.task_state(True, MONDAY)])
+        expected = {'total': 3, 'completed': 1, 'open': 2, 'overdue': 0, 'due_this_week': 2}
+        self.assertEqual(self.read(), expected)
+        self.assertEqual(self.rebuilt(), expected)
+        self.assertEqual(self.read(2), {'total': 1, 'completed': 0, 'open': 1, 'overdue': 0, 'due_this_week': 0})
+
+    def test_overdue_rolls_forward_with_the_date(self):
+        for task_id, days in enumerate((0, 2, 5, 9), 1):
+            self.create(task_id, False, MONDAY + timedelta(days=days))
+        later = MONDAY + timedelta(days=6)
+        self.assertEqual(self.read(today=later)['overdue'], 3)
+        self.assertEqual(self.read(today=later)['due_this_week'], 0)
+        # A write on a later day rolls the stored counter forward before applying its change
+        self.create(5, False, MONDAY + timedelta(days=1), today=later)
+        self.assertEqual(self.read(today=later)['overdue'], 4)
+        self.assertEqual(self.read(today=MONDAY)['overdue'], 0)
+        self.assertEqual(self.rebuilt(today=later), self.read(today=later))
+
+    def test_unchanged_write_touches_nothing(self):
+        self.create(1, False, MONDAY)
+        self.write(1, update(Task).where(Task.id == 1).values(description='renamed'),
+                   [stats.task_state(False, MONDAY)], [stats.task_state(False, MONDAY)])
+        self.assertEqual(self.read()['total'], 1)
+
+    def test_rebuild_stats_in_batches(self):
+        with self.engine.begin() as conn:
+            conn.execute(insert(Task), [{'id': i, 'description': 't', 'completed': i % 2 == 0,
+                                         'due_date': MONDAY, 'owner_id': 1 + i % 2} for i in range(10)])
+        self.assertEqual(stats.rebuild_stats(self.engine, batch_size=1), 2)
+        self.assertEqual(self.read(1)['completed'], 5)
+        self.assertEqual(self.read(2), {'total': 5, 'completed': 0, 'open': 5, 'overdue': 0, 'due_this_week': 5})
+
+
+if __name__ == '__main__':
+    unittest.main()
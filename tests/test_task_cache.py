@@ -0,0 +1,61 @@
+import os
+import tempfile
+import unittest
+
+from app.jobs import WEATHER_PENDING
+from app.tasks.cache import MemoryResponseStore, ResponseCache, SQLiteResponseStore, clear_shared_store
+
+
+class TestTaskCache(unittest.TestCase):
+
+    def test_lru_eviction_by_bytes(self):
+        cache = ResponseCache(MemoryResponseStore(max_bytes=25))
+        cache.put(1, 'a', 'x' * 10)
+        cache.put(1, 'b', 'y' * 10)
+        self.assertEqual(cache.get('a'), b'x' * 10) # a becomes most recently used
+        cache.put(2, 'c', 'z' * 10) # evicts b
+        self.assertIsNone(cache.get('b'))
+        stats = cache.stats()
+        self.assertEqual((stats['entries'], stats['bytes'], stats['evictions']), (2, 20, 1))
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_rate']), (1, 1, 0.5))
+
+    def test_invalidation_drops_only_that_owner(self):
+        cache = ResponseCache(MemoryResponseStore(max_bytes=1000))
+        cache.put(1, 'a', 'list')
+        cache.put(1, 'b', 'task')
+        cache.put(2, 'c', 'list')
+        cache.invalidate(1)
+        self.assertEqual([cache.get(key) for key in ('a', 'b', 'c')], [None, None, b'list'])
+        self.assertEqual(cache.stats()['bytes'], 4)
+
+    def test_pending_weather_and_large_bodies_are_not_kept(self):
+        cache = ResponseCache(MemoryResponseStore(max_bytes=1000), max_entry_bytes=10)
+        cache.put(1, 'a', 'body', {'Paris': WEATHER_PENDING})
+        cache.put(1, 'b', 'x' * 11)
+        cache.put(1, 'c', 'body', {'Paris': 'Clear'})
+        self.assertEqual([cache.get(key) for key in ('a', 'b', 'c')], [None, None, b'body'])
+        self.assertEqual(cache.stats()['skipped'], 2)
+
+    def test_sqlite_store_is_shared_and_bounded(self):
+        path = os.path.join(tempfile.mkdtemp(), 'cache.db')
+        writer = SQLiteResponseStore(path, max_bytes=100, check_every=1)
+        reader = ResponseCache(SQLiteResponseStore(path, max_bytes=100))
+        writer.set(1, 'a', b'x' * 40)
+        writer.set(2, 'b', b'y' * 40)
+        self.assertEqual(reader.get('a'), b'x' * 40)
+        writer.set(2, 'c', b'z' * 40) # 120 bytes: the oldest entry goes (reads refresh it only every 10 s)
+        self.assertIsNone(reader.get('a'))
+        reader.invalidate(2)
+        self.assertEqual(reader.stats()['entries'], 0)
+
+    def test_sqlite_store_survives_new_workers_until_cleared(self):
+        path = os.path.join(tempfile.mkdtemp(), 'cache.db')
+        SQLiteResponseStore(path, max_bytes=100).set(1, 'a', b'body')
+        # Another worker starting up keeps what the running ones stored
+        self.assertEqual(SQLiteResponseStore(path, max_bytes=100).get('a'), b'body')
+        clear_shared_store({'TASK_CACHE_BACKEND': 'sqlite', 'TASK_CACHE_PATH': path})
+        self.assertIsNone(SQLiteResponseStore(path, max_bytes=100).get('a'))
+
+
+if __name__ == '__main__':
+    unittest.main()
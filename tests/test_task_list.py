@@ -0,0 +1,88 @@
+import unittest
+
+from tests.app_client import close_app, login, make_app
+
+
+class TestTaskList(unittest.TestCase):
+
+    def setUp(self):
+        self.app = make_app(TASKS_PAGE_DEFAULT_LIMIT=4, TASKS_PAGE_MAX_LIMIT=6)
+        self.client = self.app.test_client()
+        self.headers = login(self.client, 'alice')
+        # 15 tasks: every third completed, due 2025-01-01..15, alternating Oslo/Rome
+        response = self.client.post('/tasks/bulk', headers=self.headers, json={'create': [
+            {'description': f'Task {i}', 'completed': i % 3 == 0, 'due_date': f'2025-01-{i:02d}',
+             'location': 'Oslo' if i % 2 else 'Rome'} for i in range(1, 16)]})
+        self.ids = [item['id'] for item in response.get_json()['create']]
+        # Someone else's task never shows up
+        self.client.post('/tasks/bulk', headers=login(self.client, 'bob'), json={'create': [
+            {'description': "Bob's", 'completed': False, 'due_date': '2025-01-05', 'location': 'Oslo'}]})
+
+    def tearDown(self):
+        close_app(self.app)
+
+    def get(self, query):
+        return self.client.get('/tasks/?' + query, headers=self.headers)
+
+    def collect(self, query):
+        # Every page of ``query``, following next_cursor
+        ids, pages, cursor = [], 0, None
+        while True:
+            body = self.get(query + (f'&cursor={cursor}' if cursor else '')).get_json()
+            ids.extend(task['id'] for task in body['tasks'])
+            pages += 1
+            cursor = body['next_cursor']
+            if cursor is None:
+                return ids, pages
+
+    def test_cursor_walks_every_task_once(self):
+        self.assertEqual(self.collect('fields=id'), (self.ids, 4)) # default limit 4
+        self.assertEqual(self.collect('fields=id&limit=5'), (self.ids, 3))
+        self.assertEqual(self.collect('fields=id&limit=100'), (self.ids, 3)) # capped at 6
+        body = self.get('fields=id&limit=5').get_json()
+        self.assertEqual(body['next_cursor'], str(self.ids[4]))
+
+    def test_a_write_between_pages_does_not_skip_or_repeat(self):
+        first = self.get('fields=id&limit=5').get_json()
+        response = self.client.post('/tasks/bulk', headers=self.headers, json={'delete': [self.ids[0]]})
+        self.assertEqual(response.status_code, 200)
+        rest = self.get(f"fields=id&limit=5&cursor={first['next_cursor']}").get_json()
+        self.assertEqual([task['id'] for task in rest['tasks']], self.ids[5:10])
+
+    def test_filters(self):
+        def matching(query):
+            return self.collect('fields=id&' + query)[0]
+        by_index = dict(zip(range(1, 16), self.ids))
+        self.assertEqual(matching('completed=true'), [by_index[i] for i in (3, 6, 9, 12, 15)])
+        self.assertEqual(matching('completed=FALSE'), [by_index[i] for i in range(1, 16) if i % 3])
+        self.assertEqual(matching('due_after=2025-01-13'), [by_index[i] for i in (13, 14, 15)])
+        self.assertEqual(matching('due_before=2025-01-02'), [by_index[i] for i in (1, 2)])
+        self.assertEqual(matching('location=Rome'), [by_index[i] for i in range(2, 16, 2)])
+        self.assertEqual(matching('location=Oslo&completed=true&due_after=2025-01-04&due_before=2025-01-12'),
+                         [by_index[9]])
+        self.assertEqual(matching('location=Lima'), [])
+
+    def test_projection(self):
+        tasks = self.get('fields=id,due_date&limit=2').get_json()['tasks']
+        self.assertEqual(tasks, [{'id': self.ids[0], 'due_date': '2025-01-01'},
+                                 {'id': self.ids[1], 'due_date': '2025-01-02'}])
+        task = self.get('fields=description,location,completed&limit=1').get_json()['tasks'][0]
+        self.assertEqual(task, {'description': 'Task 1', 'location': 'Oslo', 'completed': False})
+        self.assertEqual(self.get('fields=id,weather&limit=1').get_json()['tasks'][0].keys(), {'id', 'weather'})
+
+    def test_invalid_parameters(self):
+        for query, error in [('limit=abc', "'limit' must be an integer."),
+                             ('limit=0', "'limit' must be at least 1."),
+                             ('cursor=xyz', "Invalid 'cursor'."),
+                             ('completed=maybe', "Invalid value for 'completed'. Must be true or false."),
+                             ('due_after=tomorrow', None),
+                             ('due_before=2025-13-01', None),
+                             ('fields=id,secret', "Unknown fields: secret")]:
+            response = self.get(query)
+            self.assertEqual(response.status_code, 400, query)
+            if error is not None:
+                self.assertEqual(response.get_json()['error'], error)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+
+from sqlalchemy import event
+
+from app.models import Task
+from app.tasks import repository
+from tests.app_client import close_app, login, make_app
+
+
+class TestTaskReads(unittest.TestCase):
+
+    def setUp(self):
+        self.app = make_app()
+        self.client = self.app.test_client()
+        self.headers = login(self.client, 'alice')
+        response = self.client.post('/tasks/bulk', headers=self.headers, json={'create': [
+            {'description': f'Order {i}', 'completed': i == 2, 'due_date': f'2025-02-0{i}'} for i in range(1, 4)]})
+        self.ids = [item['id'] for item in response.get_json()['create']]
+        # ORM instances loaded while the test runs; the read path should never build any
+        self.loaded = []
+        self.listener = lambda target, context: self.loaded.append(target)
+        event.listen(Task, 'load', self.listener)
+
+    def tearDown(self):
+        event.remove(Task, 'load', self.listener)
+        close_app(self.app)
+
+    def get(self, path, headers=None):
+        return self.client.get(path, headers=headers or self.headers)
+
+    def test_reads_build_no_orm_instances(self):
+        for path in ('/tasks/', '/tasks/?fields=id&completed=false', f'/tasks/{self.ids[0]}',
+                     '/tasks/search?q=order', '/tasks/export?format=ndjson', '/tasks/stats'):
+            self.assertEqual(self.get(path).status_code, 200, path)
+        self.assertEqual(self.loaded, [])
+
+    def test_single_task(self):
+        response = self.get(f'/tasks/{self.ids[1]}')
+        self.assertEqual(response.get_json(), {'id': self.ids[1], 'description': 'Order 2', 'completed': True,
+                                               'due_date': '2025-02-02'})
+        self.assertEqual(self.get('/tasks/999').status_code, 404)
+        # Someone else's task reads as missing, not forbidden
+        self.assertEqual(self.get(f'/tasks/{self.ids[1]}', headers=login(self.client, 'bob')).status_code, 404)
+
+    def test_statements_are_built_once_per_shape(self):
+        repository.init_statement_cache({'TASKS_STATEMENT_CACHE': True})
+        self.get('/tasks/?fields=id,description&completed=false')
+        built = dict(repository._statements)
+        self.get('/tasks/?fields=id,description&completed=true&limit=1')
+        self.assertEqual(repository._statements, built) # same shape: same statement objects
+        self.get('/tasks/?fields=id')
+        self.assertEqual(len(repository._statements), len(built) + 1)
+
+    def test_same_answers_without_the_statement_cache(self):
+        queries = ('/tasks/?fields=id,completed&limit=2', f'/tasks/?cursor={self.ids[0]}&fields=description',
+                   f'/tasks/{self.ids[2]}', '/tasks/search?q=ord&fields=id')
+        cached = [self.get(query).get_json() for query in queries]
+        repository.init_statement_cache({'TASKS_STATEMENT_CACHE': False})
+        try:
+            self.assertEqual([self.get(query).get_json() for query in queries], cached)
+            self.assertEqual(repository._statements, {})
+        finally:
+            repository.init_statement_cache({})
+
+    def test_read_connection_leaves_no_transaction_open(self):
+        with self.app.app_context(), repository.read_connection() as conn:
+            self.assertEqual(repository.tasks_version(conn, 1), 1)
+            columns, rows = repository.list_tasks(conn, 1, {
+                'fields': ['id', 'due_date'], 'cursor': None, 'completed': None, 'due_after': None,
+                'due_before': None, 'location': None, 'limit': 10})
+            self.assertEqual(columns, ['id', 'due_date'])
+            self.assertEqual([row.id for row in rows], self.ids)
+        self.assertFalse(conn.in_transaction())
+        self.assertTrue(conn.closed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import json
+import unittest
+from datetime import date
+
+from sqlalchemy import Select, create_engine, insert
+
+from app.models import Base, Task
+from app.tasks.services import (add_tasks_new, encode_task_rows, project_task, task_list_json,
+                                TASK_FIELDS, WEATHER_UNAVAILABLE)
+
+
+def reference_dumps(obj):
+    # What Flask's default provider writes for a jsonify() body
+    return json.dumps(obj, sort_keys=True, separators=(',', ':'))
+
+
+class TestTaskRowEncoding(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(insert(Task), [
+                {"id": 1, "description": "plain", "completed": True, "due_date": date(2025, 1, 2),
+                 "location": "Oslo", "owner_id": 1},
+                {"id": 2, "description": 'quotes " and \\ and ünïcode ✓\n', "completed": False,
+                 "due_date": None, "location": None, "owner_id": 1},
+                {"id": 3, "description": None, "completed": None, "due_date": date(2025, 3, 4),
+                 "location": "Unknown Town", "owner_id": 1},
+                {"id": 4, "description": "empty location", "completed": False, "due_date": date(2025, 5, 6),
+                 "location": "", "owner_id": 1},
+            ])
+            result = conn.execute(Select(*[getattr(Task, name) for name in TASK_FIELDS]).order_by(Task.id))
+            cls.columns = list(result.keys())
+            cls.rows = result.all()
+        cls.weather_map = {"Oslo": "clear sky", "Unknown Town": None}
+
+    def test_full_representation_matches_add_tasks_new(self):
+        encoded = encode_task_rows(self.rows, self.columns, None, self.weather_map)
+        expected = [reference_dumps(add_tasks_new(row, self.weather_map)) for row in self.rows]
+        self.assertEqual(encoded, expected)
+
+    def test_missing_weather_is_unavailable(self):
+        encoded = encode_task_rows(self.rows[:1], self.columns, None, {})
+        self.assertEqual(json.loads(encoded[0])["weather"], WEATHER_UNAVAILABLE)
+
+    def test_projection_matches_project_task(self):
+        for fields in (["description", "id"], ["weather", "id"], list(TASK_FIELDS), ["due_date", "completed"]):
+            encoded = encode_task_rows(self.rows, self.columns, fields, self.weather_map)
+            expected = [reference_dumps(project_task(row, fields, self.weather_map)) for row in self.rows]
+            self.assertEqual(encoded, expected, fields)
+
+    def test_list_document(self):
+        body = task_list_json(self.rows, self.columns, None, self.weather_map, "4")
+        expected = reference_dumps({"tasks": [add_tasks_new(row, self.weather_map) for row in self.rows],
+                                    "next_cursor": "4"}) + "\n"
+        self.assertEqual(body, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
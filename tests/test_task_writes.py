@@ -0,0 +1,69 @@
+import unittest
+
+from tests.app_client import close_app, login, make_app
+
+
+class TestTaskWrites(unittest.TestCase):
+
+    def setUp(self):
+        self.app = make_app()
+        self.client = self.app.test_client()
+        self.headers = login(self.client, 'alice')
+
+    def tearDown(self):
+        close_app(self.app)
+
+    def create(self, body, headers=None):
+        return self.client.post('/tasks/tasks/', headers=headers or self.headers, json=body)
+
+    def update(self, task_id, body, headers=None):
+        return self.client.put(f'/tasks/tasks/{task_id}', headers=headers or self.headers, json=body)
+
+    def listed(self):
+        return self.client.get('/tasks/?fields=id,description,completed,due_date,location',
+                               headers=self.headers).get_json()['tasks']
+
+    def test_create(self):
+        self.assertEqual(self.create({'description': 'Call', 'completed': 'false', 'due_date': '2025-03-01',
+                                      'location': 'Oslo'}).status_code, 201)
+        self.assertEqual(self.create({'id': 40, 'description': 'Pay', 'completed': True,
+                                      'due_date': '2025-03-02'}).status_code, 201)
+        tasks = self.listed()
+        self.assertEqual(tasks[1], {'id': 40, 'description': 'Pay', 'completed': True, 'due_date': '2025-03-02',
+                                    'location': None})
+        self.assertEqual(tasks[0]['location'], 'Oslo')
+
+    def test_invalid_create_is_a_400(self):
+        for body, error in [({'description': 'x', 'completed': False}, "Missing fields: due_date"),
+                            ({'description': 'x', 'completed': 'maybe', 'due_date': '2025-03-01'},
+                             "Invalid value for 'completed'. Must be true or false."),
+                            ({'id': 'abc', 'description': 'x', 'completed': False, 'due_date': '2025-03-01'},
+                             "'id' must be an integer."),
+                            ({'description': 'x', 'completed': False, 'due_date': 'soon'}, None)]:
+            response = self.create(body)
+            self.assertEqual(response.status_code, 400, body)
+            if error is not None:
+                self.assertEqual(response.get_json()['error'], error)
+        self.assertEqual(self.listed(), [])
+
+    def test_taken_id_is_a_409(self):
+        body = {'id': 7, 'description': 'x', 'completed': False, 'due_date': '2025-03-01'}
+        self.assertEqual(self.create(body).status_code, 201)
+        self.assertEqual(self.create(body, headers=login(self.client, 'bob')).status_code, 409)
+        self.assertEqual(len(self.listed()), 1)
+
+    def test_update(self):
+        self.create({'id': 3, 'description': 'Call', 'completed': False, 'due_date': '2025-03-01'})
+        response = self.update(3, {'completed': 'TRUE', 'due_date': '2025-04-01'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json(), {'id': 3, 'description': 'Call', 'completed': True,
+                                               'due_date': '2025-04-01'})
+        self.assertEqual(self.update(3, {'completed': 'maybe'}).status_code, 400)
+        self.assertEqual(self.update(3, {'due_date': '2025-02-30'}).status_code, 400)
+        self.assertEqual(self.update(3, {'description': 'Mine'}, headers=login(self.client, 'bob')).status_code, 404)
+        self.assertEqual(self.update(99, {'description': 'Nobody'}).status_code, 404)
+        self.assertEqual(self.listed()[0]['description'], 'Call')
+
+
+if __name__ == '__main__':
+    unittest.main()
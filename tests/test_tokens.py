@@ -0,0 +1,91 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+import jwt
+
+from app.auth import services
+from app.auth.revocations import SQLiteRevocations
+from tests.app_client import close_app, login, make_app
+
+
+class TestTokens(unittest.TestCase):
+
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), 'revoked.db')
+        services.init_tokens({'JWT_SECRET_KEY': 'k' * 32, 'TOKEN_REVOCATION_PATH': self.path})
+
+    def tearDown(self):
+        services.init_tokens({'JWT_SECRET_KEY': 'k' * 32})
+
+    def test_decoded_tokens_are_cached(self):
+        token = services.create_access_token(7)['access_token']
+        self.assertEqual(services.decode_token(token), 7)
+        with patch('app.auth.services.jwt.decode') as decode:
+            self.assertEqual(services.decode_token(token), 7)
+        decode.assert_not_called()
+        with self.assertRaises(jwt.InvalidTokenError):
+            services.decode_token(token + 'x')
+
+    def test_revocation_by_another_worker_beats_the_cache(self):
+        token = services.create_access_token(7)['access_token']
+        other = services.create_access_token(8)['access_token']
+        self.assertEqual(services.decode_token(token), 7) # cached here
+        # Another worker handles the logout: same file, its own store
+        worker = SQLiteRevocations(self.path)
+        worker.revoke_token(services._token_digest(token), 2e9)
+        with patch('app.auth.revocations.time.monotonic', return_value=time.monotonic() + 2):
+            with self.assertRaises(jwt.InvalidTokenError):
+                services.decode_token(token)
+            self.assertEqual(services.decode_token(other), 8)
+
+
+class TestSQLiteRevocations(unittest.TestCase):
+
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), 'revoked.db')
+
+    def test_checks_read_the_file_once_per_interval(self):
+        here, there = SQLiteRevocations(self.path, refresh_seconds=60), SQLiteRevocations(self.path)
+        self.assertFalse(here.is_revoked(b'a'))
+        there.revoke_token(b'a', time.time() + 60)
+        with patch.object(here, '_connection') as connection:
+            self.assertFalse(here.is_revoked(b'a')) # not refreshed yet
+        connection.assert_not_called()
+        here.revoke_token(b'b', time.time() + 60)
+        self.assertTrue(here.is_revoked(b'b')) # revoked here: no wait
+        with patch('app.auth.revocations.time.monotonic', return_value=time.monotonic() + 61):
+            self.assertTrue(here.is_revoked(b'a'))
+
+    def test_expired_revocations_are_dropped(self):
+        here, there = SQLiteRevocations(self.path, refresh_seconds=0), SQLiteRevocations(self.path)
+        there.revoke_token(b'old', time.time() + 0.05)
+        self.assertTrue(here.is_revoked(b'old'))
+        time.sleep(0.1)
+        # Prunes 'old' from the file; the next refresh drops it here too
+        there.revoke_token(b'new', time.time() + 60)
+        self.assertTrue(here.is_revoked(b'new'))
+        self.assertFalse(here.is_revoked(b'old'))
+
+
+class TestLogout(unittest.TestCase):
+
+    def test_logged_out_token_is_refused(self):
+        app = make_app()
+        try:
+            client = app.test_client()
+            headers = login(client, 'a')
+            other_session = login(client, 'a')
+            self.assertNotEqual(other_session, headers)
+            self.assertEqual(client.get('/tasks/', headers=headers).status_code, 200)
+            self.assertEqual(client.post('/auth/logout', headers=headers).status_code, 200)
+            self.assertEqual(client.get('/tasks/', headers=other_session).status_code, 200)
+            self.assertIn('revoked', client.get('/tasks/', headers=headers).get_json()['error'])
+        finally:
+            close_app(app)
+
+
+if __name__ == '__main__':
+    unittest.main()
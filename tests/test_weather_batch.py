@@ -0,0 +1,77 @@
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from app.tasks import services
+from app.tasks.services import WEATHER_UNAVAILABLE, fetch_weather_batch
+from app.utils import api_clients
+from app.utils.api_clients import WeatherCache
+from tests.app_client import close_app, login, make_app
+
+
+class TestFetchWeatherBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.app = make_app(WEATHER_DEADLINE_SECONDS=0.2, WEATHER_MAX_WORKERS=8)
+        self.calls = []
+        self.slow = {'Lima'} # upstream hangs for these until the test ends
+        self.release = threading.Event()
+        cache = patch.object(api_clients, 'weather_cache', WeatherCache(self.fetch, ttl=60))
+        cache.start()
+        self.addCleanup(cache.stop)
+        # A fresh executor sized by this app's WEATHER_MAX_WORKERS
+        services._weather_executor = None
+
+    def tearDown(self):
+        self.release.set()
+        if services._weather_executor is not None:
+            services._weather_executor.shutdown(wait=True)
+            services._weather_executor = None
+        close_app(self.app)
+
+    def fetch(self, location):
+        self.calls.append(location)
+        if location in self.slow:
+            self.release.wait(10)
+        return f"Clear in {location}"
+
+    def test_missed_deadline_is_unavailable(self):
+        with self.app.app_context():
+            started = time.monotonic()
+            weather = fetch_weather_batch(['Oslo', 'Lima'])
+            elapsed = time.monotonic() - started
+        self.assertEqual(weather, {'Oslo': 'Clear in Oslo', 'Lima': WEATHER_UNAVAILABLE})
+        self.assertLess(elapsed, 1.0)
+
+    def test_one_lookup_per_distinct_city(self):
+        with self.app.app_context():
+            weather = fetch_weather_batch(['Oslo', 'Rome', None, 'Oslo', '', 'Rome', 'Oslo'])
+            self.assertEqual(weather, {'Oslo': 'Clear in Oslo', 'Rome': 'Clear in Rome'})
+            self.assertEqual(sorted(self.calls), ['Oslo', 'Rome'])
+            fetch_weather_batch(['Rome', 'Oslo']) # cached now
+        self.assertEqual(len(self.calls), 2)
+
+    def test_list_latency_is_bounded_by_the_deadline(self):
+        self.slow.update({'Cairo', 'Quito', 'Hanoi'})
+        client = self.app.test_client()
+        headers = login(client, 'alice')
+        cities = ['Lima', 'Cairo', 'Quito', 'Hanoi', 'Oslo']
+        client.post('/tasks/bulk', headers=headers, json={'create': [
+            {'description': f'Task {i}', 'completed': False, 'due_date': '2025-03-01',
+             'location': cities[i % len(cities)]} for i in range(20)]})
+        started = time.monotonic()
+        response = client.get('/tasks/?limit=100', headers=headers)
+        elapsed = time.monotonic() - started
+        self.assertEqual(response.status_code, 200)
+        # Four hung lookups run in parallel under one deadline, not one deadline each
+        self.assertLess(elapsed, 1.0)
+        weather = {task['location']: task['weather'] for task in response.get_json()['tasks']}
+        self.assertEqual(weather, {'Lima': WEATHER_UNAVAILABLE, 'Cairo': WEATHER_UNAVAILABLE,
+                                   'Quito': WEATHER_UNAVAILABLE, 'Hanoi': WEATHER_UNAVAILABLE,
+                                   'Oslo': 'Clear in Oslo'})
+        self.assertEqual(sorted(self.calls), sorted(cities))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from app.utils.api_clients import WeatherCache, SQLiteWeatherStore
+
+
+class TestWeatherCache(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = []
+        def fetch(location):
+            self.calls.append(location)
+            return f"Clear in {location}"
+        self.fetch = fetch
+
+    def test_hit_after_miss(self):
+        cache = WeatherCache(self.fetch, ttl=60)
+        self.assertEqual(cache.get("London"), "Clear in London")
+        self.assertEqual(cache.get("London"), "Clear in London")
+        self.assertEqual(self.calls, ["London"])
+        stats = cache.stats()
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hits'], 1)
+
+    def test_lru_eviction(self):
+        cache = WeatherCache(self.fetch, ttl=60, max_entries=2)
+        cache.get("A")
+        cache.get("B")
+        cache.get("A") # A becomes most recently used
+        cache.get("C") # evicts B
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertEqual(cache.lookup("B"), (False, None))
+        self.assertEqual(cache.lookup("A"), (True, "Clear in A"))
+
+    def test_expired_entry_is_refetched(self):
+        cache = WeatherCache(self.fetch, ttl=10, stale_ttl=0)
+        with patch('app.utils.api_clients.time.time', return_value=1000.0):
+            cache.get("Paris")
+        with patch('app.utils.api_clients.time.time', return_value=1011.0):
+            cache.get("Paris")
+        self.assertEqual(self.calls, ["Paris", "Paris"])
+
+    def test_stale_entry_served_while_refreshing(self):
+        cache = WeatherCache(self.fetch, ttl=10, stale_ttl=100)
+        with patch('app.utils.api_clients.time.time', return_value=1000.0):
+            cache.get("Rome")
+        with patch('app.utils.api_clients.time.time', return_value=1020.0):
+            self.assertEqual(cache.lookup("Rome"), (True, "Clear in Rome"))
+        cache._refresh_executor.shutdown(wait=True)
+        self.assertEqual(self.calls, ["Rome", "Rome"])
+        self.assertEqual(cache.stats()['stale_hits'], 1)
+        self.assertEqual(cache.stats()['refreshes'], 1)
+
+    def test_single_flight_for_concurrent_misses(self):
+        release = threading.Event()
+        def slow_fetch(location):
+            self.calls.append(location)
+            release.wait(2)
+            return "Rain"
+        cache = WeatherCache(slow_fetch, ttl=60)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get("Oslo"))) for _ in range(5)]
+        for t in threads:
+            t.start()
+        time.sleep(0.1)
+        release.set()
+        for t in threads:
+            t.join()
+        self.assertEqual(results, ["Rain"] * 5)
+        self.assertEqual(self.calls, ["Oslo"])
+
+    def test_async_single_flight_survives_cancelled_callers(self):
+        async def afetch(location):
+            self.calls.append(location)
+            await asyncio.sleep(0.05)
+            return f"Rain in {location}"
+        cache = WeatherCache(self.fetch, ttl=60, afetch=afetch)
+
+        async def lookups():
+            impatient = asyncio.ensure_future(cache.aget("Oslo"))
+            await asyncio.sleep(0.01)
+            impatient.cancel() # a request deadline passing
+            results = await asyncio.gather(*[cache.aget("Oslo") for _ in range(3)])
+            return impatient.cancelled(), results
+        cancelled, results = asyncio.run(lookups())
+        self.assertTrue(cancelled)
+        self.assertEqual(results, ["Rain in Oslo"] * 3)
+        self.assertEqual(self.calls, ["Oslo"])
+        self.assertEqual(cache.lookup("Oslo"), (True, "Rain in Oslo"))
+
+    def test_async_stale_refresh_stays_on_the_loop(self):
+        async def afetch(location):
+            self.calls.append(('async', location))
+            return f"Rain in {location}"
+        cache = WeatherCache(self.fetch, ttl=10, stale_ttl=100, afetch=afetch)
+        with patch('app.utils.api_clients.time.time', return_value=1000.0):
+            cache.get("Rome")
+
+        async def stale_read():
+            with patch('app.utils.api_clients.time.time', return_value=1020.0):
+                value = await cache.aget("Rome")
+            await asyncio.sleep(0)
+            await asyncio.sleep(0)
+            return value
+        self.assertEqual(asyncio.run(stale_read()), "Clear in Rome")
+        self.assertIsNone(cache._refresh_executor)
+        self.assertEqual(self.calls, ["Rome", ('async', "Rome")])
+        self.assertEqual(cache.lookup("Rome"), (True, "Rain in Rome"))
+
+    def test_shared_store_between_caches(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'weather.db')
+            first = WeatherCache(self.fetch, ttl=60, store=SQLiteWeatherStore(path))
+            second = WeatherCache(self.fetch, ttl=60, store=SQLiteWeatherStore(path))
+            first.get("Berlin")
+            self.assertEqual(second.get("Berlin"), "Clear in Berlin")
+            self.assertEqual(self.calls, ["Berlin"])
+            self.assertEqual(second.stats()['shared_hits'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
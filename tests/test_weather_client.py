@@ -0,0 +1,100 @@
+import asyncio
+import time
+import unittest
+from unittest.mock import patch
+
+from app.utils.api_clients import CircuitBreaker, WeatherClient, WeatherUnavailable
+from tests.fake_weather_provider import FakeWeatherProvider
+
+
+class TestWeatherClient(unittest.TestCase):
+
+    def setUp(self):
+        self.provider = FakeWeatherProvider(unknown_locations={"Atlantis"}).start()
+        self.client = WeatherClient(self.provider.url, "test-key", connect_timeout=0.5, read_timeout=0.2,
+                                    retries=1, retry_backoff=0.01, breaker=CircuitBreaker(2, reset_timeout=60))
+
+    def tearDown(self):
+        self.provider.stop()
+
+    def test_report(self):
+        self.assertEqual(self.client.get_weather_status("London"), "clear sky in London")
+        self.assertIsNone(self.client.get_weather_status("Atlantis"))
+        self.assertEqual(self.client.breaker.state, 'closed')
+
+    def test_retries_then_fails(self):
+        self.provider.fail_rate = 1.0
+        with self.assertRaises(WeatherUnavailable):
+            self.client.get_weather_status("London")
+        self.assertEqual(self.provider.requests, 2)
+
+    def test_read_timeout(self):
+        self.provider.latency = 0.5
+        started = time.perf_counter()
+        with self.assertRaises(WeatherUnavailable):
+            self.client.get_weather_status("London")
+        self.assertLess(time.perf_counter() - started, 1.0)
+
+    def test_circuit_opens(self):
+        self.provider.fail_rate = 1.0
+        for _ in range(2):
+            with self.assertRaises(WeatherUnavailable):
+                self.client.get_weather_status("London")
+        self.assertEqual(self.client.breaker.state, 'open')
+        requests_before = self.provider.requests
+        with self.assertRaises(WeatherUnavailable):
+            self.client.get_weather_status("London")
+        self.assertEqual(self.provider.requests, requests_before)
+
+    def test_half_open_trial_closes(self):
+        self.client.breaker.reset_timeout = 0.05
+        self.provider.fail_rate = 1.0
+        for _ in range(2):
+            with self.assertRaises(WeatherUnavailable):
+                self.client.get_weather_status("London")
+        self.provider.fail_rate = 0.0
+        time.sleep(0.06)
+        self.assertEqual(self.client.get_weather_status("London"), "clear sky in London")
+        self.assertEqual(self.client.breaker.state, 'closed')
+
+    def test_unexpected_error_does_not_wedge_the_breaker(self):
+        self.client.breaker.reset_timeout = 0.05
+        self.provider.fail_rate = 1.0
+        for _ in range(2):
+            with self.assertRaises(WeatherUnavailable):
+                self.client.get_weather_status("London")
+        self.provider.fail_rate = 0.0
+        time.sleep(0.06)
+        # The half-open trial dies on something that isn't a RequestException
+        with patch.object(WeatherClient, 'parse_report', side_effect=KeyError('weather')):
+            with self.assertRaises(KeyError):
+                self.client.get_weather_status("London")
+        self.assertEqual(self.client.breaker.state, 'open')
+        time.sleep(0.06)
+        self.assertEqual(self.client.get_weather_status("London"), "clear sky in London")
+        self.assertEqual(self.client.breaker.state, 'closed')
+
+    def test_async_report(self):
+        async def lookups():
+            try:
+                return (await self.client.aget_weather_status("London"),
+                        await self.client.aget_weather_status("Atlantis"))
+            finally:
+                await self.client.aclose()
+        self.assertEqual(asyncio.run(lookups()), ("clear sky in London", None))
+
+    def test_async_retries_then_opens(self):
+        self.provider.fail_rate = 1.0
+        async def lookup():
+            try:
+                await self.client.aget_weather_status("London")
+            finally:
+                await self.client.aclose()
+        for _ in range(2):
+            with self.assertRaises(WeatherUnavailable):
+                asyncio.run(lookup())
+        self.assertEqual(self.provider.requests, 4)
+        self.assertEqual(self.client.breaker.state, 'open')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import os
+import tempfile
+import time
+import unittest
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import insert, select
+
+from app import migrations
+from app.database import build_engine
+from app.jobs import WeatherJobs
+from app.models import Task, User, WeatherReport
+from app.utils.api_clients import WeatherCache
+from app.utils.slots import SlotLock
+
+
+class TestWeatherJobs(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.engine = build_engine({'DATABASE_URL': "sqlite:///" + os.path.join(self.directory, "tasks.db")})
+        migrations.upgrade(self.engine)
+        today = date.today()
+        with self.engine.begin() as conn:
+            conn.execute(insert(User).values(id=1, username="alice", hashed_password="x"))
+            conn.execute(insert(Task), [
+                {"id": 1, "description": "Soon", "completed": False, "due_date": today, "location": "Oslo", "owner_id": 1},
+                {"id": 2, "description": "Soon", "completed": False, "due_date": today, "location": "Rome", "owner_id": 1},
+                {"id": 3, "description": "Done", "completed": True, "due_date": today, "location": "Lima", "owner_id": 1},
+                {"id": 4, "description": "Later", "completed": False, "due_date": today + timedelta(days=30),
+                 "location": "Cairo", "owner_id": 1},
+            ])
+        self.calls = []
+
+    def tearDown(self):
+        self.engine.dispose()
+
+    def fetch(self, location):
+        self.calls.append(location)
+        if location == "Oslo":
+            raise RuntimeError("provider down")
+        return f"Clear in {location}"
+
+    def stored(self):
+        with self.engine.connect() as conn:
+            return dict(conn.execute(select(WeatherReport.location, WeatherReport.report)).all())
+
+    def test_prefetch_stores_and_primes_the_cache(self):
+        cache = WeatherCache(self.fetch, ttl=60)
+        jobs = WeatherJobs(self.engine, self.fetch, cache=cache)
+        self.assertTrue(jobs.prefetch("Rome"))
+        self.assertEqual(self.stored(), {"Rome": "Clear in Rome"})
+        self.assertEqual(cache.lookup("Rome"), (True, "Clear in Rome"))
+
+    def test_prefetch_errors_are_logged_not_raised(self):
+        jobs = WeatherJobs(self.engine, self.fetch)
+        with self.assertLogs('app.jobs', 'WARNING'):
+            self.assertFalse(jobs.prefetch("Oslo"))
+        with self.engine.begin() as conn:
+            conn.exec_driver_sql("DROP TABLE weather_reports")
+        with self.assertLogs('app.jobs', 'ERROR'):
+            self.assertFalse(jobs.prefetch("Rome"))
+
+    def test_refresh_covers_open_tasks_due_soon_past_failures(self):
+        jobs = WeatherJobs(self.engine, self.fetch, max_age=60)
+        with self.engine.begin() as conn:
+            conn.execute(insert(WeatherReport), [
+                {"location": "Rome", "report": "Old", "fetched_at": datetime.utcnow() - timedelta(hours=1)}])
+        with self.assertLogs('app.jobs', 'WARNING'):
+            self.assertEqual(jobs.refresh(), 1)
+        self.assertEqual(sorted(self.calls), ["Oslo", "Rome"])
+        self.assertEqual(self.stored(), {"Rome": "Clear in Rome"})
+        self.calls.clear()
+        with self.assertLogs('app.jobs', 'WARNING'):
+            jobs.refresh()
+        self.assertEqual(self.calls, ["Oslo"]) # Rome is fresh now
+
+    def test_thread_survives_failed_prefetches(self):
+        jobs = WeatherJobs(self.engine, self.fetch, refresh_interval=3600,
+                           refresh_slot=SlotLock(self.directory, 1, name='weather-refresh'))
+        with self.assertLogs('app.jobs', 'WARNING'):
+            jobs.enqueue("Oslo")
+            jobs.enqueue("Cairo")
+            deadline = time.monotonic() + 5
+            while "Cairo" not in self.stored() and time.monotonic() < deadline:
+                time.sleep(0.02)
+        jobs.stop()
+        # Cairo was queued behind the failing Oslo prefetch
+        self.assertEqual(self.stored().get("Cairo"), "Clear in Cairo")
+
+    def test_one_refresher_per_host(self):
+        first = WeatherJobs(self.engine, self.fetch, refresh_slot=SlotLock(self.directory, 1, name='weather-refresh'))
+        second = WeatherJobs(self.engine, self.fetch, refresh_slot=SlotLock(self.directory, 1, name='weather-refresh'))
+        self.assertTrue(first.is_refresher())
+        self.assertFalse(second.is_refresher())
+        self.assertTrue(first.is_refresher()) # kept, not re-acquired
+        first.refresh_slot.release()
+        self.assertTrue(second.is_refresher())
+
+
+if __name__ == '__main__':
+    unittest.main()
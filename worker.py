@@ -0,0 +1,16 @@
+# worker.py (in your project root)
+# Background weather worker for WEATHER_JOBS=worker: prefetches weather for new task
+# locations and refreshes reports for tasks due soon, writing to weather_reports.
+import logging
+import os
+
+from app import create_app
+from app import jobs
+
+app = create_app()
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    if jobs.weather_jobs is None:
+        raise SystemExit("Set WEATHER_JOBS=worker to run the weather worker.")
+    jobs.weather_jobs.run_forever(poll_interval=float(os.getenv('WEATHER_WORKER_POLL_SECONDS', '5')))